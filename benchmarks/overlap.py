@@ -0,0 +1,124 @@
+# overlap lookups on a large Event table
+# run with `poetry run python -m benchmarks.overlap [--rows 1000000]`
+# a throwaway test database is created and destroyed around the run
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookme.settings")
+django.setup()
+
+import pytz  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from scheduler.models import Event  # noqa: E402
+
+EPOCH = datetime(2022, 1, 1, tzinfo=pytz.utc)
+BATCH_SIZE = 10000
+
+
+def populate(rows, days):
+    random.seed(0)
+    durations = Event.Duration.values
+    for offset in range(0, rows, BATCH_SIZE):
+        events = []
+        for _ in range(min(BATCH_SIZE, rows - offset)):
+            start = EPOCH + timedelta(minutes=random.randrange(days * 1440))
+            duration = random.choice(durations)
+            # `bulk_create` skips `save`, so set the end time here
+            events.append(
+                Event(
+                    location_type=Event.LocationType.GOOGLE_MEET,
+                    duration=duration,
+                    start_time=start,
+                    end_time=start + timedelta(minutes=duration),
+                )
+            )
+        Event.objects.bulk_create(events)
+
+
+def windows(count, days):
+    random.seed(1)
+    for _ in range(count):
+        start = EPOCH + timedelta(days=random.randrange(days))
+        yield start, start + timedelta(days=1)
+
+
+def measure(label, lookup, queries, days):
+    found = 0
+    began = time.perf_counter()
+    for start, end in windows(queries, days):
+        found += len(lookup(start, end))
+    elapsed = time.perf_counter() - began
+    print(
+        f"{label:<28} {elapsed / queries * 1000:8.3f} ms/query "
+        f"({found} rows)"
+    )
+    return found
+
+
+def bounded(start, end):
+    return list(
+        Event.objects.overlapping(start, end).values_list(
+            "start_time", "end_time"
+        )
+    )
+
+
+def unbounded(start, end):
+    return list(
+        Event.objects.filter(
+            start_time__lt=end, end_time__gt=start
+        ).values_list("start_time", "end_time")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        began = time.perf_counter()
+        populate(args.rows, args.days)
+        print(
+            f"{args.rows} events over {args.days} days inserted in "
+            f"{time.perf_counter() - began:.1f}s"
+        )
+        print(
+            Event.objects.overlapping(EPOCH, EPOCH + timedelta(days=1))
+            .values_list("start_time", "end_time")
+            .explain()
+        )
+
+        expected = measure(
+            "overlapping() with index", bounded, args.queries, args.days
+        )
+        found = measure(
+            "unbounded filter with index", unbounded, args.queries, args.days
+        )
+        assert found == expected
+
+        index = next(
+            index
+            for index in Event._meta.indexes
+            if index.name == "event_range_idx"
+        )
+        with connection.schema_editor() as editor:
+            editor.remove_index(Event, index)
+        found = measure("without index", bounded, args.queries, args.days)
+        assert found == expected
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
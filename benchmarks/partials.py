@@ -0,0 +1,67 @@
+# render time and payload size of the htmx picker partials
+# run with `poetry run python -m benchmarks.partials [--renders 500]`
+import argparse
+import calendar
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookme.settings")
+django.setup()
+
+import pytz  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+
+USER_TZ = "Europe/Paris"
+
+
+def contexts():
+    day = date(2022, 1, 10)
+    tz = pytz.timezone(USER_TZ)
+    common = {
+        "event": "google-meet-30-min",
+        "user_tz": USER_TZ,
+    }
+    month = calendar.Calendar(firstweekday=6).monthdatescalendar(2022, 1)
+    yield "calendar", {
+        **common,
+        "calendar": month,
+        "bookable_days": [
+            d for week in month for d in week if d.weekday() < 5
+        ],
+        "month_proxy": day,
+        "previous": day - timedelta(days=31),
+        "next": day + timedelta(days=31),
+        "weekdays": ["Su", "Mo", "Tu", "We", "Th", "Fr", "Sa"],
+    }
+    yield "time_picker", {
+        **common,
+        "selected_date": day,
+        "previous": day - timedelta(days=1),
+        "next": day + timedelta(days=1),
+        "available_times": [
+            tz.localize(datetime(2022, 1, 10, 9)) + timedelta(minutes=30 * n)
+            for n in range(16)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=500)
+    args = parser.parse_args()
+
+    for name, context in contexts():
+        template = f"scheduler/partials/{name}.html"
+        size = len(render_to_string(template, context).encode())
+        began = time.perf_counter()
+        for _ in range(args.renders):
+            render_to_string(template, context)
+        elapsed = (time.perf_counter() - began) / args.renders
+        print(f"{name}: {size} bytes, {elapsed * 1000:.2f} ms/render")
+
+
+if __name__ == "__main__":
+    main()
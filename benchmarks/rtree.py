@@ -0,0 +1,78 @@
+# busy-time overlap lookups through the SQLite R*Tree against the B-tree
+# index; busy intervals have no maximum length, unlike events
+# run with `poetry run python -m benchmarks.rtree [--rows 1000000]`
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.overlap import EPOCH, measure  # noqa: I001
+from django.db import connection
+from django.test import override_settings
+
+from scheduler.lib import rtree
+from scheduler.models import BusyInterval
+
+BATCH_SIZE = 10000
+# busy time ranges from short meetings to multi-day trips
+BUSY_MINUTES = (15, 30, 60, 120, 480, 1440, 4320)
+
+
+def populate_busy(rows, days):
+    random.seed(2)
+    for offset in range(0, rows, BATCH_SIZE):
+        intervals = []
+        for index in range(offset, min(offset + BATCH_SIZE, rows)):
+            start = EPOCH + timedelta(minutes=random.randrange(days * 1440))
+            intervals.append(
+                BusyInterval(
+                    event_id=str(index),
+                    start_time=start,
+                    end_time=start
+                    + timedelta(minutes=random.choice(BUSY_MINUTES)),
+                )
+            )
+        BusyInterval.objects.bulk_create(intervals)
+
+
+def busy(start, end):
+    return list(
+        BusyInterval.objects.filter(calendar_id="primary")
+        .overlapping(start, end)
+        .values_list("start_time", "end_time")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if connection.vendor != "sqlite":
+        parser.error("the R*Tree index only exists on SQLite")
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        began = time.perf_counter()
+        populate_busy(args.rows, args.days)
+        print(
+            f"{args.rows} busy intervals over {args.days} days inserted in "
+            f"{time.perf_counter() - began:.1f}s (with triggers)"
+        )
+
+        rtree.reset()
+        rtree.analyze("default", BusyInterval._meta.db_table)
+
+        expected = measure("through R*Tree", busy, args.queries, args.days)
+        with override_settings(SQLITE_RTREE=False):
+            found = measure("through B-tree", busy, args.queries, args.days)
+        assert found == expected
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
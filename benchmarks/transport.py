@@ -0,0 +1,104 @@
+# Calendar API calls through a fresh httplib2 transport per request, as
+# every `build(...)` used to get, against the shared pooled transport
+# both run against a local HTTPS stub, so the difference is the TCP and
+# TLS setup; a self-signed certificate is made with the `openssl` CLI
+# run with `poetry run python -m benchmarks.transport [--requests 200]`
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookme.settings")
+django.setup()
+
+import httplib2  # noqa: E402
+import httpx  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+
+from scheduler.lib import metrics  # noqa: E402
+from scheduler.lib.transport import PooledHttp  # noqa: E402
+from scheduler.tests.stubs import CalendarStubServer  # noqa: E402
+
+
+def make_certificate(directory):
+    path = os.path.join(directory, "stub.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            path,
+            "-out",
+            path,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return path
+
+
+def measure(label, request, requests):
+    began = time.perf_counter()
+    for _ in range(requests):
+        request()
+    elapsed = (time.perf_counter() - began) / requests
+    print(f"{label}: {elapsed * 1000:.2f} ms/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = make_certificate(directory)
+        stub = CalendarStubServer(certfile=certificate).start()
+        stub.route(
+            "GET",
+            "/calendars/primary/events",
+            lambda query, body: (200, {"items": []}),
+        )
+        service = stub.build_service()
+        request = service.events().list(calendarId="primary")
+        try:
+            measure(
+                "fresh httplib2 transport",
+                lambda: request.execute(
+                    http=httplib2.Http(ca_certs=certificate)
+                ),
+                args.requests,
+            )
+
+            cache.clear()
+            pooled = PooledHttp(client=httpx.Client(verify=certificate))
+            measure(
+                "pooled transport",
+                lambda: request.execute(http=pooled),
+                args.requests,
+            )
+            values = metrics.snapshot()
+            print(
+                f"pooled: {values['calendar_http_requests']} requests, "
+                f"{values['calendar_http_connections']} connection(s), "
+                f"{values['calendar_http_tls_handshakes']} TLS handshake(s)"
+            )
+            pooled.close()
+        finally:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
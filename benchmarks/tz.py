@@ -0,0 +1,56 @@
+# per-request timezone work of the day picker: resolving the user's zone and
+# the bounds of every day of a month, with pytz as the views used to and
+# through the cached zoneinfo layer in `scheduler.lib.tz`
+# run with `poetry run python -m benchmarks.tz [--requests 2000]`
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookme.settings")
+django.setup()
+
+import pytz  # noqa: E402
+
+from scheduler.lib import tz  # noqa: E402
+
+FIRST_DAY = date(2022, 3, 1)
+DAYS = [FIRST_DAY + timedelta(days=n) for n in range(31)]
+
+
+def with_pytz(name):
+    user_tz = pytz.timezone(name)
+    windows = []
+    for day in DAYS:
+        time_min = user_tz.localize(datetime.combine(day, datetime.min.time()))
+        windows.append((time_min, time_min + timedelta(days=1)))
+    return windows
+
+
+def with_zoneinfo(name):
+    user_tz = tz.get_zone(name)
+    return [tz.day_window(user_tz, day) for day in DAYS]
+
+
+def measure(label, build, requests, zones):
+    began = time.perf_counter()
+    for n in range(requests):
+        build(zones[n % len(zones)])
+    elapsed = (time.perf_counter() - began) / requests
+    print(f"{label}: {elapsed * 1e6:.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    zones = ["Europe/Paris", "America/New_York", "Asia/Tokyo", "UTC"]
+    measure("pytz", with_pytz, args.requests, zones)
+    measure("zoneinfo", with_zoneinfo, args.requests, zones)
+
+
+if __name__ == "__main__":
+    main()
@@ -98,9 +98,27 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # the in-memory test database uses shared-cache table locks, which
+        # fail concurrent writers instead of making them wait
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# on SQLite, look up mirrored busy time through an R*Tree index kept in
+# sync by triggers (see `scheduler.lib.rtree`)
+SQLITE_RTREE = True
+
+# use PostgreSQL when it is configured (requires `poetry install -E postgres`)
+if os.getenv("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB"),
+        "USER": os.getenv("POSTGRES_USER", ""),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+        "HOST": os.getenv("POSTGRES_HOST", ""),
+        "PORT": os.getenv("POSTGRES_PORT", ""),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -154,3 +172,100 @@ INTERNAL_IPS = ("127.0.0.1",)
 
 # django-tailwind
 TAILWIND_APP_NAME = "theme"
+
+# Cache
+# shared by every web worker and management command (availability buckets,
+# their version, counters and locks): Redis when it is configured (requires
+# `poetry install -E redis`), the database otherwise (run
+# `python manage.py createcachetable` once)
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "scheduler_cache",
+        }
+    }
+
+# Availability cache
+# busy intervals are cached per UTC day in the Django cache below, and in
+# an in-process LRU (short TTL) that is dropped whenever any worker or
+# command invalidates busy time
+AVAILABILITY_CACHE_ALIAS = "default"
+AVAILABILITY_CACHE_TTL = int(os.getenv("AVAILABILITY_CACHE_TTL", "300"))
+AVAILABILITY_LOCAL_TTL = int(os.getenv("AVAILABILITY_LOCAL_TTL", "30"))
+AVAILABILITY_LOCAL_MAXSIZE = 256
+# last known busy time per day, served (and flagged as stale) while Google
+# Calendar is failing or too slow
+AVAILABILITY_STALE_TTL = int(os.getenv("AVAILABILITY_STALE_TTL", "21600"))
+# identical busy time fetches share one Calendar API call within a worker;
+# with shared flights they also wait on each other across workers through
+# a lock in the cache
+AVAILABILITY_SHARED_FLIGHTS = bool(
+    int(os.getenv("AVAILABILITY_SHARED_FLIGHTS", "0"))
+)
+# the time picker prefetches the days around the selected one (and the rest
+# of its week) on a small thread pool, 0 workers disables prefetching
+AVAILABILITY_PREFETCH_WORKERS = int(
+    os.getenv("AVAILABILITY_PREFETCH_WORKERS", "2")
+)
+AVAILABILITY_PREFETCH_MAX_PENDING = 32
+AVAILABILITY_PREFETCH_BEHIND = 1
+AVAILABILITY_PREFETCH_AHEAD = 1
+AVAILABILITY_PREFETCH_WEEK = True
+# workers count in memory and add their counts to the counters shared
+# through the cache every this many seconds
+METRICS_FLUSH_INTERVAL = 10
+
+# timezone of the weekly schedule windows
+SCHEDULE_TIME_ZONE = os.getenv("SCHEDULE_TIME_ZONE", "UTC")
+
+# picker partials carry an ETag; browsers and proxies may reuse them for
+# this many seconds before revalidating
+PICKER_CACHE_MAX_AGE = 0
+# the timezone list behind the pickers' timezone selector is cached by
+# browsers for this many seconds
+TIMEZONE_LIST_MAX_AGE = 86400
+
+# Calendar API
+# refresh OAuth credentials when they expire within this many seconds
+CALENDAR_TOKEN_REFRESH_MARGIN = 300
+# set when `calendartoken daemon` keeps token.json fresh: workers then reload
+# the token when the file changes instead of refreshing it themselves,
+# unless it has already expired; the daemon refreshes this many seconds
+# before expiry
+CALENDAR_TOKEN_DAEMON = bool(int(os.getenv("CALENDAR_TOKEN_DAEMON", "0")))
+CALENDAR_TOKEN_DAEMON_MARGIN = 600
+# connection pool size and timeout (in seconds) for Calendar API calls
+CALENDAR_HTTP_POOL_SIZE = int(os.getenv("CALENDAR_HTTP_POOL_SIZE", "10"))
+CALENDAR_HTTP_TIMEOUT = float(os.getenv("CALENDAR_HTTP_TIMEOUT", "10"))
+# deadline (in seconds) of a busy time fetch from the pickers, and the
+# circuit breaker: after N consecutive failures calls fail fast for a while
+CALENDAR_FETCH_DEADLINE = float(os.getenv("CALENDAR_FETCH_DEADLINE", "5"))
+CALENDAR_BREAKER_FAILURES = 5
+CALENDAR_BREAKER_RESET = 30
+# where busy time comes from: "freebusy" (freebusy.query), "events"
+# (events.list with a fields mask) or "mirror" (local copy kept by the
+# `syncbusy` command)
+CALENDAR_AVAILABILITY_PROVIDER = os.getenv(
+    "CALENDAR_AVAILABILITY_PROVIDER", "freebusy"
+)
+# public HTTPS URL of the push notification endpoint, used by the
+# `calendarwatch` command
+CALENDAR_WEBHOOK_URL = os.getenv("CALENDAR_WEBHOOK_URL", "")
+
+# Outbox
+# booked events are inserted into Google Calendar by the `processoutbox`
+# command, retrying failures with exponential backoff (in seconds)
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY = 30
+OUTBOX_MAX_RETRY_DELAY = 3600
+# time a claimed message stays hidden from other workers
+OUTBOX_LEASE = 300
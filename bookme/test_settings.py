@@ -0,0 +1,16 @@
+from bookme.settings import *  # noqa: F401,F403
+
+# the cache the project ships with, for the tests that must exercise it
+SHIPPED_CACHES = CACHES  # noqa: F405
+
+# the test process stands for a single worker: an in-memory cache keeps
+# query counts exact, and other workers or commands are played by separate
+# `AvailabilityCache` objects sharing it
+# (the shipped one stays configured, so that its table is created with the
+# test database)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shipped": SHIPPED_CACHES["default"],
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.conf import settings
-from .models import Profile, Schedule, Event
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
+from .models import Profile, Schedule, ScheduleWindow, Event, EventType
 
 
 @admin.register(Profile)
@@ -39,18 +41,48 @@ class ProfileAdmin(UserAdmin):
         return False
 
 
+class ScheduleWindowFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+
+        # windows of the same weekday must not overlap
+        windows = sorted(
+            (
+                form.cleaned_data["weekday"],
+                form.cleaned_data["start_time"],
+                form.cleaned_data["end_time"],
+            )
+            for form in self.forms
+            if form.cleaned_data and not form.cleaned_data.get("DELETE")
+            # rows with an invalid field already carry its error
+            and form.cleaned_data.get("weekday") is not None
+            and form.cleaned_data.get("start_time")
+            and form.cleaned_data.get("end_time")
+        )
+        for previous, current in zip(windows, windows[1:]):
+            if previous[0] == current[0] and current[1] < previous[2]:
+                raise ValidationError(
+                    "Availability windows of the same day must not overlap"
+                )
+
+
+class ScheduleWindowInline(admin.TabularInline):
+    model = ScheduleWindow
+    formset = ScheduleWindowFormSet
+    extra = 0
+
+
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
     list_display = (
         "id",
-        "sun_off",
-        "mon_off",
-        "tue_off",
-        "wed_off",
-        "thu_off",
-        "fri_off",
-        "sat_off",
+        "summary",
     )
+    inlines = (ScheduleWindowInline,)
+
+    @admin.display(description="windows")
+    def summary(self, obj):
+        return ", ".join(str(window) for window in obj.windows.all())
 
     def has_add_permission(self, request):
         # don't allow if there's already an instance
@@ -68,31 +100,18 @@ class ScheduleAdmin(admin.ModelAdmin):
         }
         return super().add_view(request, form_url, extra_context)
 
-    def change_view(self, request, object_id, form_url="", extra_context=None):
-        self.fieldsets = (
-            (
-                None,
-                {
-                    "fields": (
-                        "sun_off",
-                        ("sun_start", "sun_end"),
-                        "mon_off",
-                        ("mon_start", "mon_end"),
-                        "tue_off",
-                        ("tue_start", "tue_end"),
-                        "wed_off",
-                        ("wed_start", "wed_end"),
-                        "thu_off",
-                        ("thu_start", "thu_end"),
-                        "fri_off",
-                        ("fri_start", "fri_end"),
-                        "sat_off",
-                        ("sat_start", "sat_end"),
-                    )
-                },
-            ),
-        )
-        return super().change_view(request, object_id, form_url, extra_context)
+
+@admin.register(EventType)
+class EventTypeAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "slug",
+        "duration",
+        "buffer_before",
+        "buffer_after",
+        "is_active",
+    )
+    prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Event)
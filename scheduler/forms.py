@@ -0,0 +1,35 @@
+from django import forms
+from django.core.exceptions import NON_FIELD_ERRORS
+
+from .models import Event
+
+
+class BookingForm(forms.ModelForm):
+    start_time = forms.DateTimeField(
+        widget=forms.HiddenInput,
+    )
+
+    class Meta:
+        model = Event
+        fields = [
+            "start_time",
+            "booker_name",
+            "booker_email",
+            "description",
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["booker_name"].required = True
+        self.fields["booker_email"].required = True
+
+    def _update_errors(self, errors):
+        # the event is also validated on fields the booker does not fill in
+        # (e.g. the owner's phone number), those errors concern the form
+        if hasattr(errors, "error_dict"):
+            for field in list(errors.error_dict):
+                if field != NON_FIELD_ERRORS and field not in self.fields:
+                    errors.error_dict.setdefault(NON_FIELD_ERRORS, []).extend(
+                        errors.error_dict.pop(field)
+                    )
+        super()._update_errors(errors)
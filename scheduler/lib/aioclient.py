@@ -0,0 +1,139 @@
+import asyncio
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from scheduler.lib.providers import (
+    EVENTS_FIELDS,
+    EVENTS_PAGE_SIZE,
+    CalendarProviderError,
+    EventListProvider,
+    FreeBusyProvider,
+    get_provider,
+)
+from scheduler.lib.service import calendar_service
+
+API_ROOT = "https://www.googleapis.com/calendar/v3"
+
+
+# asyncio-native Calendar API client
+# connections are pooled and kept alive by one `httpx.AsyncClient`, so a
+# single process can wait on many Google round-trips at once
+class AsyncCalendarClient:
+    def __init__(self, api_root=API_ROOT, calendar_id="primary", **kwargs):
+        self.calendar_id = calendar_id
+        pool_size = getattr(settings, "CALENDAR_HTTP_POOL_SIZE", 10)
+        kwargs.setdefault(
+            "timeout",
+            httpx.Timeout(getattr(settings, "CALENDAR_HTTP_TIMEOUT", 10)),
+        )
+        kwargs.setdefault(
+            "limits",
+            httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+        self._client = httpx.AsyncClient(base_url=api_root, **kwargs)
+
+    async def _headers(self):
+        # refreshing credentials may block, so do it in a worker thread
+        creds = await sync_to_async(
+            calendar_service.credentials, thread_sensitive=False
+        )()
+        return {"Authorization": f"Bearer {creds.token}"}
+
+    async def _request(self, method, url, **kwargs):
+        response = await self._client.request(
+            method, url, headers=await self._headers(), **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def freebusy(self, time_lower, time_upper):
+        # https://developers.google.com/calendar/api/v3/reference/freebusy/query
+        response = await self._request(
+            "POST",
+            "/freeBusy",
+            json={
+                "timeMin": time_lower,
+                "timeMax": time_upper,
+                "items": [{"id": self.calendar_id}],
+            },
+        )
+        calendar = response["calendars"][self.calendar_id]
+        if calendar.get("errors"):
+            raise CalendarProviderError(calendar["errors"])
+
+        return [
+            {
+                "start": {"dateTime": busy["start"]},
+                "end": {"dateTime": busy["end"]},
+            }
+            for busy in calendar.get("busy", [])
+        ]
+
+    async def list_events(self, time_lower, time_upper):
+        # https://developers.google.com/calendar/api/v3/reference/events/list
+        results = []
+        params = {
+            "timeMin": time_lower,
+            "timeMax": time_upper,
+            "singleEvents": "true",
+            "maxResults": EVENTS_PAGE_SIZE,
+            "fields": EVENTS_FIELDS,
+        }
+        while True:
+            events = await self._request(
+                "GET", f"/calendars/{self.calendar_id}/events", params=params
+            )
+            for event in events.get("items", []):
+                results.append({"start": event["start"], "end": event["end"]})
+            if not events.get("nextPageToken"):
+                break
+            params["pageToken"] = events["nextPageToken"]
+
+        return results
+
+    async def fetch(self, time_lower, time_upper):
+        # the configured provider, through its native request when there is
+        # one (e.g. the mirror is read in a worker thread)
+        provider = get_provider(calendar_id=self.calendar_id)
+        if type(provider) is FreeBusyProvider:
+            return await self.freebusy(time_lower, time_upper)
+        if type(provider) is EventListProvider:
+            return await self.list_events(time_lower, time_upper)
+        return await sync_to_async(provider.fetch)(time_lower, time_upper)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+# httpx clients are bound to the event loop they are used on: each loop
+# gets its own, closed when the loop shuts down (e.g. at the end of every
+# `async_to_sync` call under WSGI, or with the ASGI server)
+_clients = weakref.WeakKeyDictionary()
+
+
+async def _close_on_shutdown(client):
+    # `asyncio.run` cancels the tasks left before closing its loop
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        client = AsyncCalendarClient()
+        # the loop only keeps a weak reference to its tasks
+        _clients[loop] = client, loop.create_task(_close_on_shutdown(client))
+    client, _ = _clients[loop]
+    return client
+
+
+async def afetch_events(time_lower, time_upper):
+    return await get_async_client().fetch(time_lower, time_upper)
@@ -0,0 +1,518 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import httplib2
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+
+from .aioclient import afetch_events
+from .breaker import CircuitOpen, calendar_breaker
+from .intervals import IntervalSet
+from .metrics import Counter
+from .providers import CalendarProviderError, get_provider
+from .singleflight import SingleFlight
+from .tz import UTC, day_window
+
+CACHE_PREFIX = "scheduler:busy"
+GENERATION_KEY = f"{CACHE_PREFIX}:generation"
+VERSION_KEY = f"{CACHE_PREFIX}:version"
+# how often a worker checks for buckets fetched by another one
+FLIGHT_POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+stale_days = Counter("availability_stale", "days served from stale busy time")
+unavailable_days = Counter(
+    "availability_unavailable", "days without any busy time to serve"
+)
+fetches = Counter("availability_fetches", "busy time fetches sent upstream")
+collapsed_shared = Counter(
+    "availability_collapsed_shared", "fetches left to another worker"
+)
+
+
+# failures of Google Calendar or of the way to it, as opposed to bugs:
+# they count against the circuit breaker and fall back to stale busy time
+CALENDAR_ERRORS = (
+    CalendarProviderError,
+    CircuitOpen,
+    HttpError,
+    TransportError,
+    httplib2.HttpLib2Error,
+    httpx.HTTPError,
+    # including `ConnectionError` and `TimeoutError`
+    OSError,
+    asyncio.TimeoutError,
+)
+
+
+class CalendarUnavailable(Exception):
+    pass
+
+
+def utc_days(time_min, time_max):
+    # canonical UTC days touched by the half-open window `[time_min, time_max)`
+    first = time_min.astimezone(UTC).date()
+    last = (time_max - timedelta(microseconds=1)).astimezone(UTC).date()
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+def day_bounds(day):
+    return day_window(UTC, day)
+
+
+def span_bounds(days):
+    # from the midnight starting the first day to the one ending the last
+    return day_bounds(days[0])[0], day_bounds(days[-1])[1]
+
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# busy time of a window, `stale_since` is set (to the oldest fetch time)
+# when Google could not be reached and last known buckets were served
+class BusyLookup:
+    __slots__ = ("busy", "stale_since")
+
+    def __init__(self, busy, stale_since=None):
+        self.busy = busy
+        self.stale_since = stale_since
+
+    @property
+    def stale(self):
+        return self.stale_since is not None
+
+
+# busy intervals are stored per canonical UTC day, first in an in-process
+# LRU and then in the shared Django cache, so any user-timezone window can
+# be assembled from buckets without going back to Google
+class AvailabilityCache:
+    def __init__(
+        self, fetch, afetch=None, cache_alias=None, calendar_id="primary"
+    ):
+        self.fetch = fetch
+        self.afetch = afetch
+        self.calendar_id = calendar_id
+        self._cache_alias = cache_alias
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    @property
+    def shared(self):
+        return caches[
+            self._cache_alias
+            or getattr(settings, "AVAILABILITY_CACHE_ALIAS", "default")
+        ]
+
+    @property
+    def ttl(self):
+        return getattr(settings, "AVAILABILITY_CACHE_TTL", 300)
+
+    @property
+    def stale_ttl(self):
+        return getattr(settings, "AVAILABILITY_STALE_TTL", 6 * 60 * 60)
+
+    @property
+    def deadline(self):
+        return getattr(settings, "CALENDAR_FETCH_DEADLINE", 5)
+
+    @property
+    def shared_flights(self):
+        return getattr(settings, "AVAILABILITY_SHARED_FLIGHTS", False)
+
+    @property
+    def local(self):
+        with self._local_lock:
+            if self._local is None:
+                self._local = LRUCache(
+                    getattr(settings, "AVAILABILITY_LOCAL_MAXSIZE", 256),
+                    getattr(settings, "AVAILABILITY_LOCAL_TTL", 30),
+                )
+            return self._local
+
+    def _generation(self):
+        # bumped by `clear` to drop every shared bucket at once
+        return self.shared.get_or_set(GENERATION_KEY, 0, None)
+
+    def _state(self):
+        # generation of the shared buckets and version of the busy time, in
+        # one round trip; local buckets are only valid for the version they
+        # were read at, so a bump by any worker or command drops them all
+        found = self.shared.get_many([GENERATION_KEY, VERSION_KEY])
+        return found.get(GENERATION_KEY, 0), found.get(VERSION_KEY, 0)
+
+    async def _astate(self):
+        found = await self.shared.aget_many([GENERATION_KEY, VERSION_KEY])
+        return found.get(GENERATION_KEY, 0), found.get(VERSION_KEY, 0)
+
+    def _key(self, generation, day):
+        return f"{CACHE_PREFIX}:{generation}:{day.isoformat()}"
+
+    def _local_key(self, state, day):
+        generation, version = state
+        return f"{self._key(generation, day)}@{version}"
+
+    def _stale_key(self, day):
+        # last known busy time, kept across generations for `stale_ttl`
+        return f"{CACHE_PREFIX}:stale:{day.isoformat()}"
+
+    def _local_buckets(self, state, days):
+        # tier 1: in-process LRU
+        buckets = {}
+        for day in days:
+            busy = self.local.get(self._local_key(state, day))
+            if busy is not None:
+                buckets[day] = busy
+        return buckets
+
+    def _shared_keys(self, state, days, buckets):
+        generation, _ = state
+        return {
+            self._key(generation, day): day
+            for day in days
+            if day not in buckets
+        }
+
+    def _add_shared_buckets(self, state, keys, found, buckets):
+        # tier 2: shared Django cache
+        for key, intervals in found.items():
+            day = keys[key]
+            buckets[day] = IntervalSet(intervals)
+            self.local.set(self._local_key(state, day), buckets[day])
+
+    def _assemble(self, days, buckets, time_min, time_max):
+        busy = IntervalSet()
+        for day in days:
+            busy = busy.union(buckets[day])
+        return busy.clip(time_min, time_max)
+
+    def _fetch(self, span_start, span_end):
+        # calls fail fast while the circuit is open; the call itself is
+        # bounded by the transport timeout (CALENDAR_HTTP_TIMEOUT)
+        calendar_breaker.check()
+        fetches.incr()
+        try:
+            events = self.fetch(span_start.isoformat(), span_end.isoformat())
+        except CALENDAR_ERRORS:
+            calendar_breaker.failure()
+            raise
+        calendar_breaker.success()
+        return events
+
+    async def _afetch(self, span_start, span_end):
+        calendar_breaker.check()
+        fetches.incr()
+        afetch = self.afetch or sync_to_async(
+            self.fetch, thread_sensitive=False
+        )
+        try:
+            events = await asyncio.wait_for(
+                afetch(span_start.isoformat(), span_end.isoformat()),
+                self.deadline,
+            )
+        except CALENDAR_ERRORS:
+            calendar_breaker.failure()
+            raise
+        calendar_breaker.success()
+        return events
+
+    def _flight_key(self, generation, days):
+        # identical fetches: same calendar and UTC window
+        start, end = span_bounds(days)
+        return (
+            f"{CACHE_PREFIX}:flight:{self.calendar_id}:{generation}:"
+            f"{start:%Y%m%d}-{end:%Y%m%d}"
+        )
+
+    def _flight_timeout(self):
+        # a worker that died mid-fetch holds the lock no longer than this
+        return math.ceil(self.deadline)
+
+    def _fill(self, days, state):
+        # tier 3: fetch and store the missing days, at most once at a time
+        # per process (and per deployment with `shared_flights`)
+        generation, _ = state
+        key = self._flight_key(generation, days)
+        return self._flights.do(key, self._fill_once, key, days, state)
+
+    def _fill_once(self, key, days, state):
+        locked = False
+        if self.shared_flights:
+            locked = self.shared.add(key, True, self._flight_timeout())
+            if not locked:
+                buckets = self._wait_for_flight(key, days, state)
+                if buckets is not None:
+                    return buckets
+        try:
+            busy = IntervalSet.from_events(self._fetch(*span_bounds(days)))
+            return self.store(busy, days, state=state)
+        finally:
+            if locked:
+                self.shared.delete(key)
+
+    def _wait_for_flight(self, key, days, state):
+        # another worker is fetching the same window: wait for its buckets,
+        # or fetch them ourselves if it gave up without storing them
+        keys = self._shared_keys(state, days, {})
+        waited = 0
+        while waited < self._flight_timeout():
+            time.sleep(FLIGHT_POLL_INTERVAL)
+            waited += FLIGHT_POLL_INTERVAL
+            in_flight = self.shared.get(key)
+            found = self.shared.get_many(keys)
+            if len(found) == len(keys):
+                collapsed_shared.incr()
+                buckets = {}
+                self._add_shared_buckets(state, keys, found, buckets)
+                return buckets
+            if not in_flight:
+                return None
+        raise TimeoutError("Busy time fetch by another worker timed out")
+
+    async def _afill(self, days, state):
+        generation, _ = state
+        key = self._flight_key(generation, days)
+        return await self._flights.ado(key, self._afill_once, key, days, state)
+
+    async def _afill_once(self, key, days, state):
+        locked = False
+        if self.shared_flights:
+            locked = await self.shared.aadd(key, True, self._flight_timeout())
+            if not locked:
+                buckets = await self._await_flight(key, days, state)
+                if buckets is not None:
+                    return buckets
+        try:
+            busy = IntervalSet.from_events(
+                await self._afetch(*span_bounds(days))
+            )
+            return await sync_to_async(self.store, thread_sensitive=False)(
+                busy, days, state=state
+            )
+        finally:
+            if locked:
+                await self.shared.adelete(key)
+
+    async def _await_flight(self, key, days, state):
+        keys = self._shared_keys(state, days, {})
+        waited = 0
+        while waited < self._flight_timeout():
+            await asyncio.sleep(FLIGHT_POLL_INTERVAL)
+            waited += FLIGHT_POLL_INTERVAL
+            in_flight = await self.shared.aget(key)
+            found = await self.shared.aget_many(keys)
+            if len(found) == len(keys):
+                collapsed_shared.incr()
+                buckets = {}
+                self._add_shared_buckets(state, keys, found, buckets)
+                return buckets
+            if not in_flight:
+                return None
+        raise TimeoutError("Busy time fetch by another worker timed out")
+
+    def _add_stale_buckets(self, error, missing, found, buckets):
+        # Google failed, timed out or the circuit is open: serve the last
+        # known busy time of every missing day, or nothing at all
+        keys = {self._stale_key(day): day for day in missing}
+        if len(found) < len(keys):
+            unavailable_days.incr(len(keys))
+            raise CalendarUnavailable(
+                "Calendar availability cannot be loaded right now."
+            ) from error
+
+        logger.warning("Serving stale availability: %r", error)
+        stale_days.incr(len(keys))
+        for key, (fetched_at, intervals) in found.items():
+            buckets[keys[key]] = IntervalSet(intervals)
+        return datetime.fromtimestamp(
+            min(fetched_at for fetched_at, _ in found.values()), UTC
+        )
+
+    def lookup(self, time_min, time_max, allow_stale=True):
+        days = utc_days(time_min, time_max)
+        state = self._state()
+        buckets = self._local_buckets(state, days)
+
+        keys = self._shared_keys(state, days, buckets)
+        if keys:
+            self._add_shared_buckets(
+                state, keys, self.shared.get_many(keys), buckets
+            )
+
+        # tier 3: a single fetch spanning every remaining day
+        stale_since = None
+        missing = [day for day in days if day not in buckets]
+        if missing:
+            try:
+                buckets.update(self._fill(missing, state))
+            except CALENDAR_ERRORS as error:
+                found = {}
+                if allow_stale:
+                    found = self.shared.get_many(
+                        [self._stale_key(day) for day in missing]
+                    )
+                stale_since = self._add_stale_buckets(
+                    error, missing, found, buckets
+                )
+
+        return BusyLookup(
+            self._assemble(days, buckets, time_min, time_max), stale_since
+        )
+
+    async def alookup(self, time_min, time_max, allow_stale=True):
+        # same lookup as `lookup`, without blocking the event loop
+        days = utc_days(time_min, time_max)
+        state = await self._astate()
+        buckets = self._local_buckets(state, days)
+
+        keys = self._shared_keys(state, days, buckets)
+        if keys:
+            self._add_shared_buckets(
+                state, keys, await self.shared.aget_many(keys), buckets
+            )
+
+        stale_since = None
+        missing = [day for day in days if day not in buckets]
+        if missing:
+            try:
+                buckets.update(await self._afill(missing, state))
+            except CALENDAR_ERRORS as error:
+                found = {}
+                if allow_stale:
+                    found = await self.shared.aget_many(
+                        [self._stale_key(day) for day in missing]
+                    )
+                stale_since = self._add_stale_buckets(
+                    error, missing, found, buckets
+                )
+
+        return BusyLookup(
+            self._assemble(days, buckets, time_min, time_max), stale_since
+        )
+
+    def get_busy(self, time_min, time_max, allow_stale=True):
+        return self.lookup(time_min, time_max, allow_stale).busy
+
+    async def aget_busy(self, time_min, time_max, allow_stale=True):
+        return (await self.alookup(time_min, time_max, allow_stale)).busy
+
+    def cached_days(self, days):
+        # days already held by either tier, without fetching the others
+        state = self._state()
+        buckets = self._local_buckets(state, days)
+        keys = self._shared_keys(state, days, buckets)
+        if keys:
+            self._add_shared_buckets(
+                state, keys, self.shared.get_many(keys), buckets
+            )
+        return set(buckets)
+
+    def store(self, busy, days, state=None):
+        buckets = {day: busy.clip(*day_bounds(day)) for day in days}
+        current = self._state()
+        if state is None:
+            state = current
+        elif state != current:
+            # busy time was invalidated (e.g. on a push notification) while
+            # it was being fetched: the fetched buckets may predate the
+            # change, so they are served once but not cached
+            return buckets
+        generation, _ = state
+
+        for day, bucket in buckets.items():
+            self.local.set(self._local_key(state, day), bucket)
+
+        self.shared.set_many(
+            {
+                self._key(generation, day): list(bucket)
+                for day, bucket in buckets.items()
+            },
+            self.ttl,
+        )
+        # fallback copy for when Google is unreachable
+        fetched_at = timezone.now().timestamp()
+        self.shared.set_many(
+            {
+                self._stale_key(day): (fetched_at, list(bucket))
+                for day, bucket in buckets.items()
+            },
+            self.stale_ttl,
+        )
+        return buckets
+
+    def version(self):
+        # changes whenever busy time may have changed, for HTTP validators
+        # and the local buckets of every worker
+        return self.shared.get_or_set(VERSION_KEY, 0, None)
+
+    def touch(self):
+        # a single write: concurrent bumps cannot fail or be lost
+        self.shared.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    def invalidate(self, *days):
+        # other workers drop their local buckets on the version bump
+        generation = self._generation()
+        self.shared.delete_many([self._key(generation, day) for day in days])
+        self.touch()
+
+    def invalidate_range(self, time_min, time_max):
+        self.invalidate(*utc_days(time_min, time_max))
+
+    def clear(self):
+        self.shared.set(GENERATION_KEY, uuid.uuid4().hex, None)
+        self.local.clear()
+        self.touch()
+
+
+def fetch_events(time_lower, time_upper):
+    return get_provider().fetch(time_lower, time_upper)
+
+
+availability = AvailabilityCache(fetch_events, afetch_events)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from scheduler.lib.availability import availability, utc_days
+from scheduler.lib.intervals import IntervalSet
+from scheduler.lib.weekly import weekly_schedule
+from scheduler.models import BookingLock, Event, OutboxMessage
+
+NO_BUFFER = timedelta(0)
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def booked_between(time_min, time_max):
+    # locally booked events, busy right away even before the outbox has
+    # inserted them into Google Calendar
+    return IntervalSet(
+        Event.objects.overlapping(time_min, time_max).values_list(
+            "start_time", "end_time"
+        )
+    )
+
+
+def check_availability(start, end, before=NO_BUFFER, after=NO_BUFFER):
+    # re-validate the slot against the schedule and the cached calendar
+    # busy time, outside of any transaction since it may call Google
+    # the buffers around the slot must be free of events too, but may fall
+    # outside of the schedule
+    # slots are never confirmed against stale busy time, `book` answers
+    # `CalendarUnavailable` with a 503 instead
+    if start <= timezone.now():
+        raise SlotUnavailable("This time is in the past.")
+
+    busy = (
+        availability.get_busy(start - before, end + after, allow_stale=False)
+        .union(booked_between(start - before, end + after))
+        .pad(after, before)
+        .union(weekly_schedule().busy_during(start, end))
+    )
+    if busy.overlaps(start, end):
+        raise SlotUnavailable("This time is no longer available.")
+
+
+def lock_days(days):
+    # must be the first statement of the transaction: SQLite has no row
+    # locks, so the UPDATE takes the database write lock up front and other
+    # bookers wait for it instead of failing to upgrade a read lock
+    locks = BookingLock.objects.filter(day__in=days)
+    if connection.features.has_select_for_update:
+        # lock in a fixed order so bookings spanning two days cannot deadlock
+        list(locks.select_for_update().order_by("day"))
+    else:
+        locks.update(locked_at=timezone.now())
+
+
+def reserve(event, before=NO_BUFFER, after=NO_BUFFER):
+    start = event.start_time - before
+    end = event.start_time + timedelta(minutes=event.duration) + after
+    days = utc_days(start, end)
+
+    # lock rows are created once per day, outside of the transaction
+    BookingLock.objects.bulk_create(
+        [BookingLock(day=day) for day in days], ignore_conflicts=True
+    )
+
+    with transaction.atomic():
+        lock_days(days)
+        if Event.objects.overlapping(start, end).exists():
+            raise SlotUnavailable("This time has just been booked.")
+        event.save()
+        # the Google insert is queued in the same transaction and sent by
+        # the `processoutbox` worker, off the request path
+        OutboxMessage.objects.create(event=event)
+    return event
+
+
+def book_event(event, before=NO_BUFFER, after=NO_BUFFER):
+    check_availability(
+        event.start_time,
+        event.start_time + timedelta(minutes=event.duration),
+        before,
+        after,
+    )
+    return reserve(event, before, after)
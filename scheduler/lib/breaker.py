@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.conf import settings
+
+from scheduler.lib.metrics import Counter
+
+opened = Counter("breaker_opened", "times the calendar circuit opened")
+rejected = Counter("breaker_rejected", "calls failed fast by the circuit")
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# per-process circuit breaker around calls to an unhealthy upstream
+# after `CALENDAR_BREAKER_FAILURES` consecutive failures calls fail fast
+# for `CALENDAR_BREAKER_RESET` seconds, then a single trial call decides
+# whether the circuit closes again or stays open for another period
+class CircuitBreaker:
+    def __init__(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def threshold(self):
+        return getattr(settings, "CALENDAR_BREAKER_FAILURES", 5)
+
+    @property
+    def reset_timeout(self):
+        return getattr(settings, "CALENDAR_BREAKER_RESET", 30)
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def check(self):
+        # raises `CircuitOpen` instead of letting the call through
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self._trial or waited < self.reset_timeout:
+                rejected.incr()
+                raise CircuitOpen("Calendar API calls are failing")
+            self._trial = True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or (
+                self._opened_at is None and self._failures >= self.threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                opened.incr()
+
+    def reset(self):
+        self.success()
+
+
+calendar_breaker = CircuitBreaker()
@@ -3,6 +3,8 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+from scheduler.lib import tokenstore
+
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
 
@@ -29,7 +31,9 @@ class CalendarAuth:
 
     def refresh_token(self):
         if self.creds and self.creds.refresh_token:
-            self.creds.refresh(Request())
+            with tokenstore.locked(self._token_file):
+                self.creds.refresh(Request())
+                self._save()
             return self.creds
         raise ValueError("Unable to refresh token")
 
@@ -40,5 +44,8 @@ class CalendarAuth:
         self.creds = flow.run_console()
 
         # persist token
-        with open(self._token_file, "w") as token:
-            token.write(self.creds.to_json())
+        with tokenstore.locked(self._token_file):
+            self._save()
+
+    def _save(self):
+        tokenstore.write_atomic(self._token_file, self.creds.to_json())
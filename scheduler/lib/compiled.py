@@ -0,0 +1,33 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+CACHE_PREFIX = "scheduler:compiled"
+
+
+# keeps a value compiled from the database in process memory
+# the value is recompiled when its version key in the shared cache changes,
+# so `invalidate` in one worker is seen by every other worker
+class CompiledCache:
+    def __init__(self, name, compile):
+        self.compile = compile
+        self.version_key = f"{CACHE_PREFIX}:{name}:version"
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def version(self):
+        return cache.get_or_set(self.version_key, uuid.uuid4().hex, None)
+
+    def get(self):
+        version = self.version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._value = self.compile()
+                    self._version = version
+        return self._value
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
@@ -0,0 +1,67 @@
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+from scheduler.lib.availability import availability
+from scheduler.lib.eventtypes import compiled_event_types
+from scheduler.lib.weekly import compiled_schedule
+
+# seconds between the start times slots can have
+SLOT_STEP = 15 * 60
+
+
+def data_epoch():
+    # busy time silently changes on Google's side until the cache expires,
+    # so validators also expire with the availability cache TTL
+    ttl = getattr(settings, "AVAILABILITY_CACHE_TTL", 300)
+    return int(timezone.now().timestamp()) // ttl
+
+
+def slot_step():
+    # past slots are not offered; every slot starts a multiple of 15 minutes
+    # (the shortest event) after a local midnight, which falls on a quarter
+    # hour in UTC, so the offered slots only change on this grid over time
+    return int(timezone.now().timestamp()) // SLOT_STEP
+
+
+def picker_etag(*inputs):
+    # keyed on the view inputs, on everything the busy time comes from and
+    # on the slots that are already past
+    parts = (
+        *inputs,
+        availability.version(),
+        compiled_schedule.version(),
+        compiled_event_types.version(),
+        data_epoch(),
+        slot_step(),
+    )
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def add_validators(response, etag):
+    response["ETag"] = etag
+    patch_cache_control(
+        response,
+        max_age=getattr(settings, "PICKER_CACHE_MAX_AGE", 0),
+        must_revalidate=True,
+    )
+    if response.cookies:
+        # a changed timezone cookie must not be replayed to other users
+        patch_cache_control(response, private=True)
+    patch_vary_headers(response, ("Cookie", "HX-Request"))
+    return response
+
+
+def not_modified(request, etag):
+    # a 304 response when the client already has this version
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return add_validators(response, etag)
+    return None
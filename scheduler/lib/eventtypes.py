@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from scheduler.lib.compiled import CompiledCache
+from scheduler.models import EventType
+
+
+# immutable, compiled view of an `EventType` row
+class EventTypeInfo:
+    __slots__ = (
+        "slug",
+        "name",
+        "location_type",
+        "duration",
+        "buffer_before",
+        "buffer_after",
+    )
+
+    def __init__(
+        self,
+        slug,
+        name,
+        location_type,
+        duration,
+        buffer_before=timedelta(0),
+        buffer_after=timedelta(0),
+    ):
+        self.slug = slug
+        self.name = name
+        self.location_type = location_type
+        self.duration = duration
+        self.buffer_before = buffer_before
+        self.buffer_after = buffer_after
+
+    @classmethod
+    def from_event_type(cls, event_type):
+        return cls(
+            event_type.slug,
+            event_type.name,
+            event_type.location_type,
+            event_type.duration,
+            timedelta(minutes=event_type.buffer_before),
+            timedelta(minutes=event_type.buffer_after),
+        )
+
+    def __repr__(self):
+        return f"EventTypeInfo({self.slug!r})"
+
+    def buffered(self, busy):
+        # a slot needs `buffer_before` free before its start and
+        # `buffer_after` free after its end, so busy time is padded the
+        # other way round
+        if not (self.buffer_before or self.buffer_after):
+            return busy
+        return busy.pad(self.buffer_after, self.buffer_before)
+
+
+def compile_event_types():
+    return {
+        event_type.slug: EventTypeInfo.from_event_type(event_type)
+        for event_type in EventType.objects.filter(is_active=True)
+    }
+
+
+compiled_event_types = CompiledCache("event_types", compile_event_types)
+
+
+def event_types():
+    # slug -> `EventTypeInfo`, in display order
+    return compiled_event_types.get()
+
+
+def get_event_type(slug):
+    return event_types().get(slug)
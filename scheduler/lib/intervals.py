@@ -0,0 +1,157 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+def parse_datetime(value):
+    # google may return a trailing `Z` for UTC, which `fromisoformat`
+    # only understands from python 3.11 onwards
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+# sorted, non-overlapping set of half-open `[start, end)` intervals
+# overlapping and touching intervals are merged on construction, so the
+# boundaries can be searched with `bisect` instead of scanning every interval
+class IntervalSet:
+    __slots__ = ("_starts", "_ends")
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+
+        for start, end in sorted(intervals):
+            if start >= end:
+                continue
+            if self._ends and start <= self._ends[-1]:
+                # merge with the previous interval
+                if end > self._ends[-1]:
+                    self._ends[-1] = end
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    @classmethod
+    def from_events(cls, events):
+        # parse the ISO strings of calendar events exactly once
+        # all-day events (a `date` instead of a `dateTime`) do not block
+        # time, as in the mirror kept by `syncbusy`
+        return cls(
+            (
+                parse_datetime(event["start"]["dateTime"]),
+                parse_datetime(event["end"]["dateTime"]),
+            )
+            for event in events
+            if "dateTime" in event["start"]
+        )
+
+    def __iter__(self):
+        return zip(self._starts, self._ends)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def __eq__(self, other):
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return self._starts == other._starts and self._ends == other._ends
+
+    def __repr__(self):
+        return f"IntervalSet({list(self)!r})"
+
+    @property
+    def starts(self):
+        return tuple(self._starts)
+
+    @property
+    def ends(self):
+        return tuple(self._ends)
+
+    def union(self, other):
+        return IntervalSet([*self, *other])
+
+    def intersect(self, other):
+        results = []
+        i = j = 0
+        other_starts, other_ends = other._starts, other._ends
+        while i < len(self._starts) and j < len(other_starts):
+            start = max(self._starts[i], other_starts[j])
+            end = min(self._ends[i], other_ends[j])
+            if start < end:
+                results.append((start, end))
+            # advance whichever interval finishes first
+            if self._ends[i] < other_ends[j]:
+                i += 1
+            else:
+                j += 1
+        return IntervalSet(results)
+
+    def subtract(self, other):
+        results = []
+        j = 0
+        other_starts, other_ends = other._starts, other._ends
+        for start, end in self:
+            # skip intervals of `other` that end before this one starts
+            while j < len(other_starts) and other_ends[j] <= start:
+                j += 1
+            k = j
+            while k < len(other_starts) and other_starts[k] < end:
+                if other_starts[k] > start:
+                    results.append((start, other_starts[k]))
+                start = max(start, other_ends[k])
+                k += 1
+            if start < end:
+                results.append((start, end))
+        return IntervalSet(results)
+
+    def pad(self, before, after):
+        # every interval starting `before` earlier and ending `after` later
+        return IntervalSet(
+            (start - before, end + after) for start, end in self
+        )
+
+    def clip(self, start, end):
+        return self.intersect(IntervalSet([(start, end)]))
+
+    def covers_start(self, moment):
+        # `moment` lies in some `[start, end)`
+        idx = bisect_right(self._starts, moment) - 1
+        return idx >= 0 and moment < self._ends[idx]
+
+    def covers_end(self, moment):
+        # `moment` lies in some `(start, end]`
+        idx = bisect_left(self._starts, moment) - 1
+        return idx >= 0 and moment <= self._ends[idx]
+
+    def overlaps(self, start, end):
+        # first interval that ends after `start`
+        idx = bisect_right(self._ends, start)
+        return idx < len(self._starts) and self._starts[idx] < end
+
+
+def iter_available_slots(start, end, duration, busy, now=None):
+    # a slot is free when it does not overlap any busy interval, the same
+    # test `overlaps` applies when a slot is booked
+    # slots and busy intervals are both sorted, so a single forward pointer
+    # sweeps them in linear time
+    step = timedelta(minutes=duration)
+    starts, ends = busy._starts, busy._ends
+    count = len(starts)
+    idx = 0
+
+    current_start = start
+    current_end = current_start + step
+    while current_end <= end:
+        if now is None or current_start > now:
+            # drop busy intervals that finish before the slot starts
+            while idx < count and ends[idx] <= current_start:
+                idx += 1
+
+            if idx == count or starts[idx] >= current_end:
+                yield current_start
+
+        current_start = current_start + step
+        current_end = current_start + step
@@ -0,0 +1,132 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+
+CACHE_PREFIX = "scheduler:metrics"
+
+REGISTRY = {}
+
+logger = logging.getLogger(__name__)
+
+# increments not yet added to the shared counters, by counter name
+_pending = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flusher = None
+
+
+# counter counted in process memory and added up across workers in the
+# Django cache by `flush`, which runs every METRICS_FLUSH_INTERVAL seconds
+# on a background thread: counting costs no cache round trip on the
+# request path and never blocks the event loop
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.key = f"{CACHE_PREFIX}:{name}"
+        REGISTRY[name] = self
+
+    def incr(self, delta=1):
+        with _lock:
+            _pending[self.name] = _pending.get(self.name, 0) + delta
+        if _flusher is None:
+            _start_flusher()
+
+    def value(self):
+        flush()
+        return cache.get(self.key, 0)
+
+    def reset(self):
+        with _lock:
+            _pending.pop(self.name, None)
+        cache.delete(self.key)
+
+
+def _add(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # the counter does not exist yet
+        cache.add(key, 0, None)
+        cache.incr(key, delta)
+
+
+def flush():
+    with _flush_lock:
+        with _lock:
+            pending = dict(_pending)
+            _pending.clear()
+        for name, delta in pending.items():
+            try:
+                _add(REGISTRY[name].key, delta)
+            except Exception:
+                # best effort: the counts are kept for the next flush
+                logger.exception("Could not flush the %s counter", name)
+                with _lock:
+                    _pending[name] = _pending.get(name, 0) + delta
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(getattr(settings, "METRICS_FLUSH_INTERVAL", 10))
+        try:
+            flush()
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_periodically, name="metrics-flush", daemon=True
+            )
+            _flusher.start()
+
+
+def _forget_parent():
+    # a forked worker starts its own flusher, and must not count the
+    # increments of its parent again
+    global _lock, _flush_lock, _flusher
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _flusher = None
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_forget_parent)
+# commands exit before the next periodic flush
+atexit.register(flush)
+
+
+def snapshot():
+    flush()
+    values = cache.get_many([counter.key for counter in REGISTRY.values()])
+    return {
+        name: values.get(counter.key, 0) for name, counter in REGISTRY.items()
+    }
+
+
+def reset():
+    with _lock:
+        _pending.clear()
+    cache.delete_many([counter.key for counter in REGISTRY.values()])
+
+
+def is_shared():
+    # counters only add up across workers and commands in a cache they all
+    # use, a process-local one only ever shows the reading process
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else 0.0
@@ -0,0 +1,171 @@
+import logging
+import secrets
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytz
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from googleapiclient.errors import HttpError
+
+from scheduler.lib.availability import availability
+from scheduler.lib.service import calendar_service
+from scheduler.lib.sync import CalendarSync, invalidate_availability
+from scheduler.models import NotificationChannel
+
+logger = logging.getLogger(__name__)
+
+# https://developers.google.com/calendar/api/guides/push
+CHANNEL_TTL = timedelta(days=7)
+
+
+class InvalidNotification(Exception):
+    pass
+
+
+def find_channel(headers):
+    # check the channel id, resource id and token Google echoes back
+    try:
+        channel = NotificationChannel.objects.get(
+            channel_id=headers.get("X-Goog-Channel-Id", "")
+        )
+    except NotificationChannel.DoesNotExist:
+        raise InvalidNotification("Unknown channel")
+
+    if not constant_time_compare(
+        headers.get("X-Goog-Channel-Token", ""), channel.token
+    ):
+        raise InvalidNotification("Invalid channel token")
+    if headers.get("X-Goog-Resource-Id") != channel.resource_id:
+        raise InvalidNotification("Unexpected resource")
+    return channel
+
+
+# runs the syncs behind push notifications on a background thread, so
+# Google gets its acknowledgement right away
+# a notification for a calendar whose sync is still queued is folded into
+# that sync, which will see its changes too
+class NotificationSyncs:
+    def __init__(self, executor=None):
+        self._executor = executor
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="calendarsync"
+                )
+            return self._executor
+
+    def schedule(self, calendar_id):
+        with self._lock:
+            if calendar_id in self._pending:
+                return None
+            self._pending.add(calendar_id)
+        return self.executor.submit(self._run, calendar_id)
+
+    def _run(self, calendar_id):
+        # notifications from now on may be missed by this sync
+        with self._lock:
+            self._pending.discard(calendar_id)
+
+        # notifications do not say what changed, so an incremental sync
+        # finds the touched events and only their day buckets are
+        # invalidated
+        try:
+            result = CalendarSync(calendar_id=calendar_id).run()
+        except Exception:
+            logger.exception("Sync after calendar notification failed")
+            availability.clear()
+            return None
+        else:
+            invalidate_availability(result)
+            return result
+        finally:
+            close_old_connections()
+
+
+notification_syncs = NotificationSyncs()
+
+
+def handle_notification(headers):
+    channel = find_channel(headers)
+
+    # the first message only confirms that the channel is set up
+    if headers.get("X-Goog-Resource-State") == "sync":
+        return None
+
+    return notification_syncs.schedule(channel.calendar_id)
+
+
+class ChannelManager:
+    def __init__(self, service=None, calendar_id="primary"):
+        self._service = service
+        self.calendar_id = calendar_id
+
+    @property
+    def service(self):
+        return self._service or calendar_service.get()
+
+    def register(self, address, ttl=CHANNEL_TTL):
+        body = {
+            "id": str(uuid.uuid4()),
+            "type": "web_hook",
+            "address": address,
+            "token": secrets.token_urlsafe(32),
+            "params": {"ttl": str(int(ttl.total_seconds()))},
+        }
+        response = (
+            self.service.events()
+            .watch(calendarId=self.calendar_id, body=body)
+            .execute()
+        )
+        return NotificationChannel.objects.create(
+            channel_id=body["id"],
+            resource_id=response["resourceId"],
+            calendar_id=self.calendar_id,
+            token=body["token"],
+            # expiration is given in milliseconds since the epoch
+            expiration=datetime.fromtimestamp(
+                int(response["expiration"]) / 1000, tz=pytz.utc
+            ),
+        )
+
+    def stop(self, channel):
+        try:
+            self.service.channels().stop(
+                body={
+                    "id": channel.channel_id,
+                    "resourceId": channel.resource_id,
+                }
+            ).execute()
+        except HttpError as error:
+            # the channel already expired on Google's side
+            if error.resp.status != 404:
+                raise
+        channel.delete()
+
+    def renew(self, address, margin=timedelta(days=1)):
+        # channels cannot be extended, so replace the ones about to expire
+        expiring = NotificationChannel.objects.filter(
+            calendar_id=self.calendar_id,
+            expiration__lte=timezone.now() + margin,
+        )
+        renewed = []
+        for channel in list(expiring):
+            renewed.append(self.register(address))
+            self.stop(channel)
+        if (
+            not renewed
+            and not NotificationChannel.objects.filter(
+                calendar_id=self.calendar_id
+            ).exists()
+        ):
+            renewed.append(self.register(address))
+        return renewed
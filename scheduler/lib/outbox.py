@@ -0,0 +1,130 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from scheduler.lib.availability import availability
+from scheduler.lib.planner import EventPlanner
+from scheduler.models import OutboxMessage, Profile
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    # exponential backoff: 30s, 1m, 2m, 4m, ... capped at an hour
+    base = getattr(settings, "OUTBOX_RETRY_DELAY", 30)
+    cap = getattr(settings, "OUTBOX_MAX_RETRY_DELAY", 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def event_name(event):
+    return f"{event.get_location_type_display()} with {event.booker_name}"
+
+
+class OutboxResult:
+    def __init__(self, sent, failed):
+        self.sent = sent
+        self.failed = failed
+
+    def __repr__(self):
+        return f"<OutboxResult sent={self.sent} failed={self.failed}>"
+
+
+# delivers pending outbox messages to Google Calendar in batches
+# messages are claimed with a conditional UPDATE, so several workers can
+# drain the outbox at once without sending anything twice
+class OutboxWorker:
+    def __init__(self, planner=None, batch_size=None):
+        self.planner = planner or EventPlanner()
+        self.batch_size = batch_size or getattr(
+            settings, "OUTBOX_BATCH_SIZE", 20
+        )
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+
+    @property
+    def lease(self):
+        # time a claimed message stays hidden from other workers
+        return timedelta(seconds=getattr(settings, "OUTBOX_LEASE", 300))
+
+    def pending(self, now):
+        return OutboxMessage.objects.filter(
+            sent_at__isnull=True,
+            available_at__lte=now,
+            attempts__lt=self.max_attempts,
+        )
+
+    def claim(self, now):
+        candidates = (
+            self.pending(now)
+            .order_by("available_at")
+            .values_list("pk", "available_at")[: self.batch_size]
+        )
+        claimed = [
+            pk
+            for pk, available_at in candidates
+            if OutboxMessage.objects.filter(
+                pk=pk, available_at=available_at, sent_at__isnull=True
+            ).update(available_at=now + self.lease)
+        ]
+        return (
+            OutboxMessage.objects.filter(pk__in=claimed)
+            .select_related("event")
+            .order_by("pk")
+        )
+
+    def deliver(self, message, owner):
+        event = message.event
+        # first guest in the list should always be the app owner
+        guests = [owner.email] if owner else []
+        if event.booker_email:
+            guests.append(event.booker_email)
+        try:
+            self.planner.plan_event(guests, event, event_name(event))
+        except HttpError as error:
+            # inserted by an earlier attempt whose response was lost
+            if error.resp.status != 409:
+                raise
+
+    def run_once(self):
+        now = timezone.now()
+        owner = Profile.objects.first()
+        sent = failed = 0
+        for message in self.claim(now):
+            try:
+                self.deliver(message, owner)
+            except Exception as error:
+                failed += 1
+                message.attempts += 1
+                message.last_error = repr(error)
+                message.available_at = timezone.now() + retry_delay(
+                    message.attempts
+                )
+                if message.attempts >= self.max_attempts:
+                    logger.error(
+                        "Giving up on outbox message %s: %r",
+                        message.pk,
+                        error,
+                    )
+                else:
+                    logger.warning(
+                        "Outbox message %s failed: %r", message.pk, error
+                    )
+                message.save(
+                    update_fields=["attempts", "last_error", "available_at"]
+                )
+                continue
+
+            sent += 1
+            message.sent_at = timezone.now()
+            message.save(update_fields=["sent_at"])
+            # the booked time is now busy on the calendar as well
+            availability.invalidate_range(
+                message.event.start_time, message.event.end_time
+            )
+
+        return OutboxResult(sent, failed)
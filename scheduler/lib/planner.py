@@ -1,40 +1,15 @@
-from django.conf import settings
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from scheduler.lib.providers import EventListProvider, get_provider
+from scheduler.lib.service import calendar_service
 from scheduler.models import Event
 
-SCOPES = ["https://www.googleapis.com/auth/calendar"]
-
 
 class EventPlanner:
-    def __init__(self):
-        self.token_file = settings.SECRETS_PATH / "token.json"
-        self.credentials_file = settings.SECRETS_PATH / "credentials.json"
+    def __init__(self, service=None):
+        self._service = service
 
     def _authorize(self):
-        creds = None
-
-        if self.token_file.exists():
-            creds = Credentials.from_authorized_user_file(
-                self.token_file, SCOPES
-            )
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_file, SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-            # save credentials for next run
-            with open(self.token_file, "w") as token:
-                token.write(creds.to_json())
-
-        calendar_service = build("calendar", "v3", credentials=creds)
-
-        return calendar_service
+        # reuse the process-wide service and in-memory credentials
+        return self._service or calendar_service.get()
 
     def plan_event(self, guests, event, event_name):
         # first guest in the list should always be the app owner
@@ -47,9 +22,12 @@ class EventPlanner:
         ]
 
         service_body = {
+            # the event's own id makes retried inserts idempotent, Google
+            # answers 409 when the event already exists
+            "id": event.id.hex,
             "summary": event_name,
-            "start": {"dateTime": event.start_time},
-            "end": {"dateTime": event.end_time},
+            "start": {"dateTime": event.start_time.isoformat()},
+            "end": {"dateTime": event.end_time.isoformat()},
             "description": event.description,
             "attendees": guests,
             "reminders": {"useDefault": True},
@@ -58,7 +36,7 @@ class EventPlanner:
         if event.location_type == Event.LocationType.GOOGLE_MEET:
             service_body["conferenceData"] = {
                 "createRequest": {
-                    "requestId": event.id,
+                    "requestId": str(event.id),
                     "conferenceSolutionKey": {"type": "hangoutsMeet"},
                 }
             }
@@ -77,26 +55,10 @@ class EventPlanner:
         )
 
     def get_events(self, time_lower, time_upper):
-        service = self._authorize()
-        results = []
-        page_token = None
-
-        # https://developers.google.com/calendar/api/v3/reference/events/list
-        while True:
-            events = (
-                service.events()
-                .list(
-                    calendarId="primary",
-                    pageToken=page_token,
-                    timeMin=time_lower,
-                    timeMax=time_upper,
-                )
-                .execute()
-            )
-            for event in events["items"]:
-                results.append({"start": event["start"], "end": event["end"]})
-            page_token = events.get("nextPageToken")
-            if not page_token:
-                break
+        provider = EventListProvider(service=self._authorize())
+        return provider.fetch(time_lower, time_upper)
 
-        return results
+    def get_busy(self, time_lower, time_upper):
+        # busy time from the configured availability provider
+        provider = get_provider(service=self._authorize())
+        return provider.fetch(time_lower, time_upper)
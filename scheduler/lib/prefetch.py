@@ -0,0 +1,133 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from scheduler.lib.availability import availability, span_bounds, utc_days
+from scheduler.lib.metrics import Counter
+from scheduler.lib.weekly import weekday_of
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "scheduler:prefetched"
+
+scheduled = Counter("prefetch_scheduled", "days queued for prefetching")
+skipped = Counter("prefetch_skipped", "days already cached or queued")
+dropped = Counter("prefetch_dropped", "days dropped on a full queue")
+completed = Counter("prefetch_completed", "days warmed by a prefetch")
+failed = Counter("prefetch_failed", "days whose prefetch raised")
+hits = Counter("prefetch_hits", "prefetched days requested afterwards")
+
+
+def neighbour_days(day):
+    # days likely to be opened after `day`: the adjacent ones and the rest
+    # of its calendar week (weeks start on Sunday)
+    first = day - timedelta(
+        days=getattr(settings, "AVAILABILITY_PREFETCH_BEHIND", 1)
+    )
+    last = day + timedelta(
+        days=getattr(settings, "AVAILABILITY_PREFETCH_AHEAD", 1)
+    )
+    if getattr(settings, "AVAILABILITY_PREFETCH_WEEK", True):
+        week_start = day - timedelta(days=weekday_of(day))
+        first = min(first, week_start)
+        last = max(last, week_start + timedelta(days=6))
+    return first, last
+
+
+# warms UTC-day buckets of the availability cache in background threads
+# the pool and its queue are bounded, so prefetching can never pile up
+# behind a slow calendar
+class Prefetcher:
+    def __init__(self, availability, executor=None):
+        self.availability = availability
+        self._executor = executor
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        return getattr(settings, "AVAILABILITY_PREFETCH_WORKERS", 2)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, "AVAILABILITY_PREFETCH_MAX_PENDING", 32)
+
+    @property
+    def enabled(self):
+        return self._executor is not None or self.max_workers > 0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="prefetch",
+                )
+            return self._executor
+
+    def _marker(self, generation, day):
+        return f"{CACHE_PREFIX}:{generation}:{day.isoformat()}"
+
+    def schedule(self, time_min, time_max):
+        if not self.enabled:
+            return None
+
+        days = utc_days(time_min, time_max)
+        cached = self.availability.cached_days(days)
+        with self._lock:
+            queued = [
+                day
+                for day in days
+                if day not in cached and day not in self._pending
+            ]
+            if len(self._pending) + len(queued) > self.max_pending:
+                dropped.incr(len(queued))
+                queued = []
+            self._pending.update(queued)
+
+        if len(queued) < len(days):
+            skipped.incr(len(days) - len(queued))
+        if not queued:
+            return None
+
+        scheduled.incr(len(queued))
+        return self.executor.submit(self._run, queued)
+
+    def _run(self, days):
+        try:
+            generation = self.availability._generation()
+            # a single fetch for the whole span, cached days are not
+            # fetched again, and stale days are not counted as warmed
+            self.availability.get_busy(*span_bounds(days), allow_stale=False)
+            self.availability.shared.set_many(
+                {self._marker(generation, day): True for day in days},
+                self.availability.ttl,
+            )
+            completed.incr(len(days))
+        except Exception:
+            logger.exception("Availability prefetch failed")
+            failed.incr(len(days))
+        finally:
+            with self._lock:
+                self._pending.difference_update(days)
+            close_old_connections()
+
+    def record_hits(self, time_min, time_max):
+        # count requested days that were warmed by a prefetch, once each
+        generation = self.availability._generation()
+        markers = [
+            self._marker(generation, day)
+            for day in utc_days(time_min, time_max)
+        ]
+        found = self.availability.shared.get_many(markers)
+        if found:
+            hits.incr(len(found))
+            self.availability.shared.delete_many(list(found))
+
+
+prefetcher = Prefetcher(availability)
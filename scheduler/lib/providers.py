@@ -0,0 +1,124 @@
+from django.conf import settings
+
+from scheduler.lib.intervals import parse_datetime
+from scheduler.lib.service import calendar_service
+from scheduler.models import BusyInterval
+
+# https://developers.google.com/calendar/api/v3/reference/events/list
+EVENTS_FIELDS = "nextPageToken,items(start,end)"
+EVENTS_PAGE_SIZE = 2500
+
+
+class CalendarProviderError(Exception):
+    pass
+
+
+# providers return busy time as a list of `{"start": ..., "end": ...}`
+# dictionaries, in the same shape as calendar event resources
+class EventListProvider:
+    def __init__(self, service=None, calendar_id="primary"):
+        self._service = service
+        self.calendar_id = calendar_id
+
+    @property
+    def service(self):
+        return self._service or calendar_service.get()
+
+    def fetch(self, time_lower, time_upper):
+        service = self.service
+        results = []
+        page_token = None
+
+        # only ask for what is needed: expanded recurring events, the
+        # largest page size, and just the `start`/`end` of each item
+        while True:
+            events = (
+                service.events()
+                .list(
+                    calendarId=self.calendar_id,
+                    pageToken=page_token,
+                    timeMin=time_lower,
+                    timeMax=time_upper,
+                    singleEvents=True,
+                    maxResults=EVENTS_PAGE_SIZE,
+                    fields=EVENTS_FIELDS,
+                )
+                .execute()
+            )
+            for event in events.get("items", []):
+                results.append({"start": event["start"], "end": event["end"]})
+            page_token = events.get("nextPageToken")
+            if not page_token:
+                break
+
+        return results
+
+
+class FreeBusyProvider(EventListProvider):
+    # https://developers.google.com/calendar/api/v3/reference/freebusy/query
+    def fetch(self, time_lower, time_upper):
+        response = (
+            self.service.freebusy()
+            .query(
+                body={
+                    "timeMin": time_lower,
+                    "timeMax": time_upper,
+                    "items": [{"id": self.calendar_id}],
+                }
+            )
+            .execute()
+        )
+
+        calendar = response["calendars"][self.calendar_id]
+        if calendar.get("errors"):
+            raise CalendarProviderError(calendar["errors"])
+
+        return [
+            {
+                "start": {"dateTime": busy["start"]},
+                "end": {"dateTime": busy["end"]},
+            }
+            for busy in calendar.get("busy", [])
+        ]
+
+
+class MirrorProvider:
+    # reads the local copy of busy time kept by the `syncbusy` command,
+    # so no request ever goes to Google
+    def __init__(self, service=None, calendar_id="primary"):
+        self.calendar_id = calendar_id
+
+    def fetch(self, time_lower, time_upper):
+        intervals = (
+            BusyInterval.objects.filter(calendar_id=self.calendar_id)
+            .overlapping(
+                parse_datetime(time_lower), parse_datetime(time_upper)
+            )
+            .values_list("start_time", "end_time")
+        )
+
+        return [
+            {
+                "start": {"dateTime": start.isoformat()},
+                "end": {"dateTime": end.isoformat()},
+            }
+            for start, end in intervals
+        ]
+
+
+PROVIDERS = {
+    "events": EventListProvider,
+    "freebusy": FreeBusyProvider,
+    "mirror": MirrorProvider,
+}
+
+
+def get_provider(name=None, **kwargs):
+    name = name or getattr(
+        settings, "CALENDAR_AVAILABILITY_PROVIDER", "events"
+    )
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown availability provider: {name}")
+    return provider_class(**kwargs)
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db import connections
+
+# SQLite R*Tree index over the `start_time`/`end_time` columns of a table
+# https://www.sqlite.org/rtree.html
+# the virtual table is keyed by the rowid of the indexed table and holds
+# whole minutes since the epoch, widened so that every interval fits in
+# its box; candidates found through it are filtered on the exact times
+# triggers keep it in sync with every insert, update and delete
+
+_enabled = {}
+
+
+def rtree_table(table):
+    return f"{table}_rtree"
+
+
+def _minute(column):
+    # fractional seconds are dropped, rounding down
+    return f"CAST(strftime('%s', substr({column}, 1, 19)) AS INTEGER) / 60"
+
+
+def create_statements(table):
+    rtree = rtree_table(table)
+    has_range = "NEW.start_time IS NOT NULL AND NEW.end_time IS NOT NULL"
+    row = (
+        f"NEW.rowid, {_minute('NEW.start_time')}, "
+        f"{_minute('NEW.end_time')} + 1"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE {rtree} "
+        f"USING rtree_i32(id, start_minute, end_minute)",
+        f"CREATE TRIGGER {rtree}_insert AFTER INSERT ON {table} "
+        f"WHEN {has_range} "
+        f"BEGIN INSERT INTO {rtree} VALUES ({row}); END",
+        f"CREATE TRIGGER {rtree}_update "
+        f"AFTER UPDATE OF start_time, end_time ON {table} "
+        f"BEGIN DELETE FROM {rtree} WHERE id = OLD.rowid; "
+        f"INSERT INTO {rtree} SELECT {row} WHERE {has_range}; END",
+        f"CREATE TRIGGER {rtree}_delete AFTER DELETE ON {table} "
+        f"BEGIN DELETE FROM {rtree} WHERE id = OLD.rowid; END",
+        f"INSERT INTO {rtree} "
+        f"SELECT {row.replace('NEW.', '')} FROM {table} "
+        f"WHERE {has_range.replace('NEW.', '')}",
+    ]
+
+
+def drop_statements(table):
+    rtree = rtree_table(table)
+    return [
+        f"DROP TRIGGER IF EXISTS {rtree}_insert",
+        f"DROP TRIGGER IF EXISTS {rtree}_update",
+        f"DROP TRIGGER IF EXISTS {rtree}_delete",
+        f"DROP TABLE IF EXISTS {rtree}",
+    ]
+
+
+def compile_options(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return {option for option, in cursor.fetchall()}
+
+
+def supported(connection):
+    # SQLite builds without the R*Tree module cannot create the table
+    return (
+        connection.vendor == "sqlite"
+        and getattr(settings, "SQLITE_RTREE", True)
+        and "ENABLE_RTREE" in compile_options(connection)
+    )
+
+
+def create(schema_editor, table):
+    # no-op on other databases, on SQLite builds without the R*Tree module
+    # and with SQLITE_RTREE off; lookups then use the regular indexes
+    # migrations that rebuild `table` on SQLite drop its triggers and may
+    # renumber its rows, so they must `drop` and `create` it again
+    if not supported(schema_editor.connection):
+        return
+    for statement in drop_statements(table) + create_statements(table):
+        # no parameters, so the `%s` of strftime is passed through as is
+        schema_editor.execute(statement, None)
+
+
+def drop(schema_editor, table):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in drop_statements(table):
+        schema_editor.execute(statement, None)
+
+
+def rtree_enabled(alias, table):
+    connection = connections[alias]
+    if connection.vendor != "sqlite" or not getattr(
+        settings, "SQLITE_RTREE", True
+    ):
+        return False
+
+    # the triggers are what keeps the index trustworthy
+    key = (alias, table)
+    if key not in _enabled:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND name LIKE %s",
+                [f"{rtree_table(table)}_%"],
+            )
+            _enabled[key] = cursor.fetchone()[0] == 3
+    return _enabled[key]
+
+
+def analyze(alias, table):
+    # without statistics SQLite assumes an equality on an indexed column
+    # (e.g. `calendar_id`) is more selective than the R*Tree lookup
+    if not rtree_enabled(alias, table):
+        return
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"ANALYZE {table}")
+
+
+def minute_bounds(start, end):
+    # minutes whose box overlaps every interval sharing time with
+    # `[start, end)`
+    return int(start.timestamp()) // 60, int(end.timestamp()) // 60 + 1
+
+
+def reset():
+    _enabled.clear()
@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+
+from scheduler.lib import tokenstore
+from scheduler.lib.transport import pooled_http
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+
+def utcnow():
+    # google-auth keeps `expiry` as a naive UTC datetime
+    return datetime.utcnow()
+
+
+# per-process holder for the Calendar API service
+# credentials are loaded once and shared by every thread, and only refreshed
+# (under a lock) when they are close to expiry
+# a token rewritten by another process, e.g. `calendartoken daemon`, is
+# picked up from the file's mtime; with CALENDAR_TOKEN_DAEMON set, workers
+# leave the refresh to the daemon for as long as their token is valid
+# each thread builds its own service object from the bundled static
+# discovery document, and every service sends its requests through the
+# shared pooled transport
+class CalendarService:
+    def __init__(self):
+        self._creds = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def token_file(self):
+        return settings.SECRETS_PATH / "token.json"
+
+    @property
+    def credentials_file(self):
+        return settings.SECRETS_PATH / "credentials.json"
+
+    @property
+    def refresh_margin(self):
+        return timedelta(
+            seconds=getattr(settings, "CALENDAR_TOKEN_REFRESH_MARGIN", 300)
+        )
+
+    @property
+    def daemon_refreshes(self):
+        return getattr(settings, "CALENDAR_TOKEN_DAEMON", False)
+
+    def _token_changed(self):
+        return tokenstore.mtime(self.token_file) != self._mtime
+
+    def _needs_refresh(self, creds):
+        if not creds.valid:
+            return True
+        return (
+            creds.expiry is not None
+            and creds.expiry - utcnow() < self.refresh_margin
+        )
+
+    def _load_credentials(self):
+        creds = None
+        if self.token_file.exists():
+            creds = Credentials.from_authorized_user_file(
+                self.token_file, SCOPES
+            )
+        if not creds or not creds.refresh_token:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.credentials_file, SCOPES
+            )
+            creds = flow.run_local_server(port=0)
+            with tokenstore.locked(self.token_file):
+                self._save(creds)
+        return creds
+
+    def _save(self, creds):
+        # callers hold `tokenstore.locked`
+        tokenstore.write_atomic(self.token_file, creds.to_json())
+        self._mtime = tokenstore.mtime(self.token_file)
+
+    def _reload(self):
+        # stat before reading, so a write in between is seen next time
+        self._mtime = tokenstore.mtime(self.token_file)
+        self._creds = self._load_credentials()
+        return self._creds
+
+    def _refresh(self, creds):
+        with tokenstore.locked(self.token_file):
+            # another process may have refreshed the token meanwhile
+            if self._token_changed():
+                creds = self._reload()
+            if self._needs_refresh(creds):
+                creds.refresh(Request())
+                self._save(creds)
+        return creds
+
+    def credentials(self):
+        creds = self._creds
+        if (
+            creds is None
+            or self._token_changed()
+            or (self._needs_refresh(creds) and not self._left_to_daemon(creds))
+        ):
+            with self._lock:
+                # another thread may have loaded or refreshed meanwhile
+                creds = self._creds
+                if creds is None or self._token_changed():
+                    creds = self._reload()
+                if self._needs_refresh(creds) and not self._left_to_daemon(
+                    creds
+                ):
+                    creds = self._refresh(creds)
+                self._creds = creds
+        return creds
+
+    def _left_to_daemon(self, creds):
+        # a valid token close to expiry is about to be replaced by the
+        # daemon; an expired one means the daemon is not running
+        return self.daemon_refreshes and creds.valid
+
+    def refresh_stored(self, margin):
+        # `calendartoken daemon`: refresh the stored token when it expires
+        # within `margin` (or its expiry is unknown), and return its expiry
+        with tokenstore.locked(self.token_file):
+            creds = Credentials.from_authorized_user_file(
+                self.token_file, SCOPES
+            )
+            if (
+                not creds.valid
+                or creds.expiry is None
+                or creds.expiry - utcnow() < margin
+            ):
+                creds.refresh(Request())
+                tokenstore.write_atomic(self.token_file, creds.to_json())
+        return creds.expiry
+
+    def get(self):
+        creds = self.credentials()
+        service = getattr(self._local, "service", None)
+        # services keep the credentials they were built with
+        if service is None or self._local.creds is not creds:
+            service = build(
+                "calendar",
+                "v3",
+                http=AuthorizedHttp(creds, http=pooled_http()),
+                static_discovery=True,
+                cache_discovery=False,
+            )
+            self._local.service = service
+            self._local.creds = creds
+        return service
+
+    def reset(self):
+        with self._lock:
+            self._creds = None
+            self._mtime = None
+            self._local = threading.local()
+
+
+calendar_service = CalendarService()
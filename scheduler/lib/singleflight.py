@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import weakref
+
+from scheduler.lib.metrics import Counter
+
+collapsed = Counter("singleflight_collapsed", "calls joined to one in flight")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# concurrent calls with the same key share a single execution: the first
+# caller runs it and the others wait for its result (or its exception)
+# threads and each event loop have their own calls in flight
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._tasks = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            collapsed.incr()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, fn, *args):
+        # the call runs as its own task, so a caller giving up (e.g. on a
+        # deadline) does not cancel it for the others
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = tasks[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda task: self._forget(tasks, key, task))
+        else:
+            collapsed.incr()
+        return await asyncio.shield(task)
+
+    def _forget(self, tasks, key, task):
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled():
+            # retrieved here in case every caller gave up on it
+            task.exception()
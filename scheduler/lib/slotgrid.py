@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from .intervals import iter_available_slots
+from .tz import UTC
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch(moment):
+    # exact integer microseconds, unlike the float from `timestamp()`
+    return (moment - EPOCH) // MICROSECOND
+
+
+def encode_intervals(busy):
+    starts = np.fromiter(map(to_epoch, busy.starts), np.int64, len(busy))
+    ends = np.fromiter(map(to_epoch, busy.ends), np.int64, len(busy))
+    return starts, ends
+
+
+def free_slot_mask(slot_starts, slot_ends, busy_starts, busy_ends):
+    # vectorized version of the overlap test in `iter_available_slots`:
+    # a slot is busy when the first busy interval ending after its start
+    # also starts before its end
+    if not len(busy_starts):
+        return np.ones(len(slot_starts), dtype=bool)
+
+    idx = np.searchsorted(busy_ends, slot_starts, side="right")
+    later = idx < len(busy_starts)
+    overlap = later & (
+        busy_starts[np.minimum(idx, len(busy_starts) - 1)] < slot_ends
+    )
+    return ~overlap
+
+
+def find_available_slots(start, end, duration, busy, now=None):
+    # same contract as `iter_available_slots`, but evaluates every
+    # candidate slot of the window at once when numpy is installed
+    if np is None:
+        return list(iter_available_slots(start, end, duration, busy, now))
+
+    step = timedelta(minutes=duration)
+    count = (end - start - step) // step + 1 if end - start >= step else 0
+    if count <= 0:
+        return []
+
+    step_micros = step // MICROSECOND
+    slot_starts = to_epoch(start) + np.arange(count, dtype=np.int64) * (
+        step_micros
+    )
+    slot_ends = slot_starts + step_micros
+
+    mask = free_slot_mask(slot_starts, slot_ends, *encode_intervals(busy))
+    if now is not None:
+        mask &= slot_starts > to_epoch(now)
+
+    return [start + step * int(k) for k in np.flatnonzero(mask)]
+
+
+def has_available_slots(windows, duration, busy, now=None):
+    # whether each `(start, end)` window has at least one slot of
+    # `find_available_slots`; the busy time is encoded once and the slots
+    # of every window are evaluated together
+    if np is None:
+        return [
+            next(iter_available_slots(start, end, duration, busy, now), None)
+            is not None
+            for start, end in windows
+        ]
+
+    step = timedelta(minutes=duration)
+    step_micros = step // MICROSECOND
+    window_starts = np.fromiter(
+        (to_epoch(start) for start, _ in windows), np.int64, len(windows)
+    )
+    counts = np.fromiter(
+        (
+            (end - start - step) // step + 1 if end - start >= step else 0
+            for start, end in windows
+        ),
+        np.int64,
+        len(windows),
+    )
+
+    # slot `k` of window `w` starts at `window_starts[w] + k * step`
+    owners = np.repeat(np.arange(len(windows)), counts)
+    firsts = np.cumsum(counts) - counts
+    indexes = np.arange(counts.sum()) - np.repeat(firsts, counts)
+    slot_starts = window_starts[owners] + indexes * step_micros
+    slot_ends = slot_starts + step_micros
+
+    mask = free_slot_mask(slot_starts, slot_ends, *encode_intervals(busy))
+    if now is not None:
+        mask &= slot_starts > to_epoch(now)
+
+    free = np.bincount(owners[mask], minlength=len(windows)) > 0
+    return free.tolist()
@@ -0,0 +1,188 @@
+from django.db import transaction
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from scheduler.lib import rtree
+from scheduler.lib.availability import availability
+from scheduler.lib.intervals import parse_datetime
+from scheduler.lib.providers import EVENTS_PAGE_SIZE
+from scheduler.lib.service import calendar_service
+from scheduler.models import BusyInterval, CalendarSyncState
+
+# https://developers.google.com/calendar/api/guides/sync
+SYNC_FIELDS = (
+    "nextPageToken,nextSyncToken,items(id,status,transparency,start,end)"
+)
+
+
+class SyncResult:
+    def __init__(self, full, changed):
+        # `changed` holds the old and new `(start, end)` of every touched
+        # interval; after a full resync the whole cache is dropped anyway
+        self.full = full
+        self.changed = changed
+
+    def __repr__(self):
+        kind = "full" if self.full else "incremental"
+        return f"<SyncResult {kind} changed={len(self.changed)}>"
+
+
+def busy_interval(item):
+    # cancelled, free (transparent) and all-day events do not block time
+    if item.get("status") == "cancelled":
+        return None
+    if item.get("transparency") == "transparent":
+        return None
+    if "dateTime" not in item.get("start", {}):
+        return None
+    return (
+        parse_datetime(item["start"]["dateTime"]),
+        parse_datetime(item["end"]["dateTime"]),
+    )
+
+
+class CalendarSync:
+    def __init__(self, service=None, calendar_id="primary"):
+        self._service = service
+        self.calendar_id = calendar_id
+
+    @property
+    def service(self):
+        return self._service or calendar_service.get()
+
+    def _pages(self, **params):
+        service = self.service
+        page_token = None
+        while True:
+            page = (
+                service.events()
+                .list(
+                    calendarId=self.calendar_id,
+                    pageToken=page_token,
+                    singleEvents=True,
+                    maxResults=EVENTS_PAGE_SIZE,
+                    fields=SYNC_FIELDS,
+                    **params,
+                )
+                .execute()
+            )
+            yield page
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+    def run(self, full=False):
+        state, _ = CalendarSyncState.objects.get_or_create(
+            calendar_id=self.calendar_id
+        )
+        while True:
+            # Google is paged through outside of any transaction, so that
+            # other writers are not held up meanwhile (SQLite locks the
+            # whole database for the length of a write transaction)
+            full_sync, changes, sync_token = self._fetch(state, full)
+            with transaction.atomic():
+                # the changes only apply on top of the sync token they were
+                # fetched from; the update locks the state row (the
+                # database on SQLite) until they are written
+                claimed = CalendarSyncState.objects.filter(
+                    pk=state.pk, sync_token=state.sync_token
+                ).update(sync_token=sync_token, synced_at=timezone.now())
+                if claimed:
+                    if full_sync:
+                        result = self._replace_mirror(changes)
+                    else:
+                        result = self._apply_changes(changes)
+                    break
+            # another sync (in a web worker or `syncbusy`) got there first,
+            # continue from the sync token it saved
+            state.refresh_from_db()
+
+        if result.full:
+            # the mirror was rebuilt, refresh the query planner statistics
+            rtree.analyze(BusyInterval.objects.db, BusyInterval._meta.db_table)
+        return result
+
+    def _fetch(self, state, full):
+        if full or not state.sync_token:
+            return (True, *self._fetch_all())
+
+        try:
+            return (False, *self._fetch_changes(state.sync_token))
+        except HttpError as error:
+            # the sync token was invalidated by Google, start over
+            if error.resp.status == 410:
+                return (True, *self._fetch_all())
+            raise
+
+    def _fetch_all(self):
+        intervals = {}
+        sync_token = ""
+        for page in self._pages():
+            for item in page.get("items", []):
+                interval = busy_interval(item)
+                if interval:
+                    intervals[item["id"]] = interval
+            sync_token = page.get("nextSyncToken", sync_token)
+        return intervals, sync_token
+
+    def _fetch_changes(self, sync_token):
+        items = []
+        for page in self._pages(syncToken=sync_token):
+            items.extend(page.get("items", []))
+            sync_token = page.get("nextSyncToken", sync_token)
+        return items, sync_token
+
+    def _replace_mirror(self, intervals):
+        mirror = BusyInterval.objects.filter(calendar_id=self.calendar_id)
+        changed = list(mirror.values_list("start_time", "end_time"))
+        mirror.delete()
+        BusyInterval.objects.bulk_create(
+            BusyInterval(
+                calendar_id=self.calendar_id,
+                event_id=event_id,
+                start_time=start,
+                end_time=end,
+            )
+            for event_id, (start, end) in intervals.items()
+        )
+        return SyncResult(True, changed + list(intervals.values()))
+
+    def _apply_changes(self, items):
+        changed = []
+        mirror = BusyInterval.objects.filter(calendar_id=self.calendar_id)
+        existing = {
+            row.event_id: row
+            for row in mirror.filter(
+                event_id__in=[item["id"] for item in items]
+            )
+        }
+        for item in items:
+            row = existing.get(item["id"])
+            if row:
+                changed.append((row.start_time, row.end_time))
+
+            interval = busy_interval(item)
+            if interval is None:
+                if row:
+                    row.delete()
+                continue
+
+            changed.append(interval)
+            BusyInterval.objects.update_or_create(
+                calendar_id=self.calendar_id,
+                event_id=item["id"],
+                defaults={
+                    "start_time": interval[0],
+                    "end_time": interval[1],
+                },
+            )
+        return SyncResult(False, changed)
+
+
+def invalidate_availability(result):
+    # drop the cached day buckets touched by a sync
+    if result.full:
+        availability.clear()
+        return
+    for start, end in result.changed:
+        availability.invalidate_range(start, end)
@@ -0,0 +1,48 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+# `token.json` is shared by every web worker and the `calendartoken`
+# command; writers hold an exclusive lock on a sibling `.lock` file and
+# replace the token in a single rename, so readers never need the lock
+@contextmanager
+def locked(path):
+    # without `fcntl` (Windows) writes are only atomic, not serialized
+    if fcntl is None:  # pragma: no cover
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(path, data):
+    # readers see either the old or the new token, never a partial write
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".token-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,99 @@
+import threading
+
+import httplib2
+import httpx
+from django.conf import settings
+
+from scheduler.lib.metrics import Counter
+
+requests_sent = Counter("calendar_http_requests", "Calendar API requests sent")
+connections_opened = Counter(
+    "calendar_http_connections", "Calendar API connections opened"
+)
+tls_handshakes = Counter(
+    "calendar_http_tls_handshakes", "Calendar API TLS handshakes"
+)
+
+
+# `httplib2.Http` look-alike on top of a pooled `httpx.Client`, for
+# `googleapiclient` and `google_auth_httplib2.AuthorizedHttp`
+# the client is thread-safe and keeps connections alive, so every thread
+# and service object reuses the same few connections to googleapis.com
+# instead of paying TCP and TLS setup on each transport
+class PooledHttp:
+    def __init__(self, client=None, pool_size=None, timeout=None):
+        if pool_size is None:
+            pool_size = getattr(settings, "CALENDAR_HTTP_POOL_SIZE", 10)
+        if timeout is None:
+            timeout = getattr(settings, "CALENDAR_HTTP_TIMEOUT", 10)
+        self.timeout = timeout
+        self.client = client or httpx.Client(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+
+    def _trace(self, event, info):
+        # httpcore reports every new connection and handshake
+        if event == "connection.connect_tcp.complete":
+            connections_opened.incr()
+        elif event == "connection.start_tls.complete":
+            tls_handshakes.incr()
+
+    def request(
+        self,
+        uri,
+        method="GET",
+        body=None,
+        headers=None,
+        redirections=httplib2.DEFAULT_MAX_REDIRECTS,
+        connection_type=None,
+    ):
+        requests_sent.incr()
+        try:
+            response = self.client.request(
+                method,
+                uri,
+                content=body,
+                headers=headers,
+                follow_redirects=bool(redirections),
+                extensions={"trace": self._trace},
+            )
+        except httpx.TimeoutException as error:
+            # the exceptions `googleapiclient` knows how to retry
+            raise TimeoutError(str(error)) from error
+        except httpx.TransportError as error:
+            raise ConnectionError(str(error)) from error
+
+        info = dict(response.headers)
+        info["status"] = str(response.status_code)
+        if "content-encoding" in info:
+            # the content is already decoded, as httplib2 does
+            info["-content-encoding"] = info.pop("content-encoding")
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        self.client.close()
+
+
+_lock = threading.Lock()
+_pooled_http = None
+
+
+def pooled_http():
+    # created lazily, so that forked workers do not share sockets
+    global _pooled_http
+    with _lock:
+        if _pooled_http is None:
+            _pooled_http = PooledHttp()
+        return _pooled_http
+
+
+def reset():
+    global _pooled_http
+    with _lock:
+        if _pooled_http is not None:
+            _pooled_http.close()
+        _pooled_http = None
@@ -0,0 +1,62 @@
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import pytz
+from django.conf import settings
+from django.utils import timezone as django_timezone
+
+UTC = timezone.utc
+ONE_DAY = timedelta(days=1)
+
+# zones offered by the timezone selector, and the release they come from
+COMMON_TIMEZONES = tuple(pytz.common_timezones)
+COMMON_TIMEZONES_VERSION = pytz.__version__
+
+
+class UnknownTimeZone(ValueError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        # `ValueError` for keys that are not zone names at all
+        raise UnknownTimeZone(name) from None
+
+
+def schedule_zone():
+    # schedule windows are wall-clock times in this zone
+    return get_zone(getattr(settings, "SCHEDULE_TIME_ZONE", "UTC"))
+
+
+@lru_cache(maxsize=4096)
+def _midnight(tz, day):
+    # fold 0 picks the earlier instant when midnight is repeated, and a
+    # midnight skipped by DST resolves to the first instant of the day
+    return datetime.combine(day, time(), tzinfo=tz).astimezone(UTC)
+
+
+def local_time(tz, day, seconds):
+    # `seconds` of wall-clock time after midnight on `day`, as UTC
+    local = datetime.combine(day, time(), tzinfo=tz) + timedelta(
+        seconds=seconds
+    )
+    return local.astimezone(UTC)
+
+
+def day_window(tz, day):
+    # `[start, end)` in UTC of the local calendar day, 23 or 25 hours long
+    # on DST transitions
+    return _midnight(tz, day), _midnight(tz, day + ONE_DAY)
+
+
+def days_window(tz, first_day, last_day):
+    # the local days between `first_day` and `last_day` (inclusive)
+    return _midnight(tz, first_day), _midnight(tz, last_day + ONE_DAY)
+
+
+def local_today(tz):
+    return django_timezone.now().astimezone(tz).date()
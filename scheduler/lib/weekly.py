@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from scheduler.lib import tz
+from scheduler.lib.compiled import CompiledCache
+from scheduler.lib.intervals import IntervalSet
+from scheduler.models import Schedule
+
+# same order as `strftime("%w")`: 0=Sun, 1=Mon, ..., 6=Sat
+WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")
+ONE_DAY = timedelta(days=1)
+
+
+def seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def weekday_of(day):
+    return (day.weekday() + 1) % 7
+
+
+# immutable weekly availability, as sorted `(start, end)` second offsets
+# from local midnight in `zone` for every weekday, with any number of
+# windows per day
+class WeeklySchedule:
+    __slots__ = ("windows", "zone")
+
+    def __init__(self, windows, zone=tz.UTC):
+        self.windows = tuple(tuple(day) for day in windows)
+        self.zone = zone
+
+    @classmethod
+    def from_schedule(cls, schedule, zone=tz.UTC):
+        # no schedule means no availability at all
+        windows = [[] for _ in WEEKDAYS]
+        if schedule is not None:
+            for window in schedule.windows.all():
+                windows[window.weekday].append(
+                    (
+                        seconds_of_day(window.start_time),
+                        seconds_of_day(window.end_time),
+                    )
+                )
+        return cls((sorted(day) for day in windows), zone)
+
+    def __eq__(self, other):
+        if not isinstance(other, WeeklySchedule):
+            return NotImplemented
+        return self.windows == other.windows and self.zone == other.zone
+
+    def __repr__(self):
+        return f"WeeklySchedule({self.windows!r}, {self.zone!r})"
+
+    def available_between(self, first_day, last_day):
+        # wall-clock windows of the schedule's zone, as UTC intervals
+        intervals = []
+        day = first_day
+        while day <= last_day:
+            for start, end in self.windows[weekday_of(day)]:
+                intervals.append(
+                    (
+                        tz.local_time(self.zone, day, start),
+                        tz.local_time(self.zone, day, end),
+                    )
+                )
+            day += ONE_DAY
+        return IntervalSet(intervals)
+
+    def busy_between(self, first_day, last_day):
+        # everything outside of the schedule, from the midnight starting
+        # `first_day` to the midnight ending `last_day`
+        return IntervalSet(
+            [tz.days_window(self.zone, first_day, last_day)]
+        ).subtract(self.available_between(first_day, last_day))
+
+    def busy_during(self, time_min, time_max):
+        # the same, over the local days of the schedule's zone touched by
+        # the half-open window `[time_min, time_max)`
+        return self.busy_between(
+            time_min.astimezone(self.zone).date(),
+            (time_max - timedelta(microseconds=1))
+            .astimezone(self.zone)
+            .date(),
+        )
+
+
+def compile_schedule():
+    return WeeklySchedule.from_schedule(
+        Schedule.objects.prefetch_related("windows").first(),
+        tz.schedule_zone(),
+    )
+
+
+compiled_schedule = CompiledCache("schedule", compile_schedule)
+
+
+def weekly_schedule():
+    return compiled_schedule.get()
@@ -1,5 +1,11 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from google.auth.exceptions import RefreshError, TransportError
 from scheduler.lib.calendarauth import CalendarAuth
+from scheduler.lib.service import calendar_service
 
 
 class Command(BaseCommand):
@@ -7,8 +13,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("command", help="management command")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="daemon: check the token every N seconds",
+        )
 
     def handle(self, *args, **options):
+        if options["command"] == "daemon":
+            self.run_daemon(options["interval"])
+            return
+
         auth = CalendarAuth()
 
         if options["command"] == "checktoken":
@@ -23,3 +39,27 @@ class Command(BaseCommand):
         if options["command"] == "generatetoken":
             auth.generate_token()
             self.stdout.write("Token saved!")
+
+    def run_daemon(self, interval):
+        # refresh the stored token ahead of the web workers, which pick it
+        # up by mtime (see CALENDAR_TOKEN_DAEMON)
+        margin = timedelta(
+            seconds=getattr(settings, "CALENDAR_TOKEN_DAEMON_MARGIN", 600)
+        )
+        while True:
+            try:
+                expiry = calendar_service.refresh_stored(margin)
+            except (RefreshError, TransportError) as error:
+                # retried on the next check, workers refresh an expired
+                # token themselves meanwhile
+                self.stderr.write(f"Token refresh failed: {error}")
+            except FileNotFoundError as error:
+                self.stderr.write(
+                    f"Token not found at {error.filename}, generate it with "
+                    "`calendartoken generatetoken`."
+                )
+            else:
+                self.stdout.write(
+                    f"Token valid until {expiry:%Y-%m-%d %H:%M:%S} UTC."
+                )
+            time.sleep(interval)
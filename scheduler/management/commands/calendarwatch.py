@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from scheduler.lib.notifications import ChannelManager
+from scheduler.models import NotificationChannel
+
+
+class Command(BaseCommand):
+    help = "Manage push notification channels for the Google calendar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("command", help="management command")
+        parser.add_argument(
+            "--address",
+            default=getattr(settings, "CALENDAR_WEBHOOK_URL", ""),
+            help="public HTTPS URL of the notification endpoint",
+        )
+        parser.add_argument(
+            "--calendar",
+            default="primary",
+            help="calendar to watch",
+        )
+
+    def handle(self, *args, **options):
+        manager = ChannelManager(calendar_id=options["calendar"])
+
+        if options["command"] in ("register", "renew"):
+            if not options["address"]:
+                raise CommandError("A notification address is required.")
+        if options["command"] == "register":
+            channel = manager.register(options["address"])
+            self.stdout.write(
+                f"Channel {channel.channel_id} registered until "
+                f"{channel.expiration}."
+            )
+        if options["command"] == "renew":
+            renewed = manager.renew(options["address"])
+            self.stdout.write(f"{len(renewed)} channel(s) renewed.")
+        if options["command"] == "stop":
+            channels = NotificationChannel.objects.filter(
+                calendar_id=options["calendar"]
+            )
+            for channel in channels:
+                manager.stop(channel)
+            self.stdout.write("Channels stopped.")
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from scheduler.lib.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Insert booked events into the Google calendar."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="messages claimed per batch",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="keep draining the outbox every N seconds",
+        )
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options["batch_size"])
+
+        while True:
+            # drain full batches right away
+            result = worker.run_once()
+            while result.sent + result.failed == worker.batch_size:
+                self.stdout.write(
+                    f"{result.sent} event(s) sent, {result.failed} failed."
+                )
+                result = worker.run_once()
+            self.stdout.write(
+                f"{result.sent} event(s) sent, {result.failed} failed."
+            )
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from scheduler.lib import metrics
+
+# modules registering counters
+from scheduler.lib import availability, breaker  # noqa: F401
+from scheduler.lib import prefetch, singleflight, transport  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = "Show the scheduler counters shared by every worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="reset every counter after printing it",
+        )
+
+    def handle(self, *args, **options):
+        if not metrics.is_shared():
+            self.stderr.write(
+                "Warning: the cache is local to this process, so the counters "
+                "of the web workers are not visible here. Configure a shared "
+                "cache (see CACHES)."
+            )
+
+        values = metrics.snapshot()
+        for name, value in values.items():
+            self.stdout.write(
+                f"{name:<28} {value:>10}  "
+                f"{metrics.REGISTRY[name].description}"
+            )
+
+        # share of warmed days that were actually requested afterwards
+        hit_rate = metrics.ratio(
+            values["prefetch_hits"], values["prefetch_completed"]
+        )
+        self.stdout.write(f"prefetch hit rate: {hit_rate:.1%}")
+
+        # share of Calendar API requests sent on an open connection
+        sent = values["calendar_http_requests"]
+        reuse_rate = metrics.ratio(
+            sent - values["calendar_http_connections"], sent
+        )
+        self.stdout.write(f"connection reuse rate: {reuse_rate:.1%}")
+
+        # share of busy time fetches answered by another one in flight
+        collapsed = (
+            values["singleflight_collapsed"]
+            + values["availability_collapsed_shared"]
+        )
+        collapse_rate = metrics.ratio(
+            collapsed, collapsed + values["availability_fetches"]
+        )
+        self.stdout.write(f"collapsed fetch rate: {collapse_rate:.1%}")
+
+        if options["reset"]:
+            metrics.reset()
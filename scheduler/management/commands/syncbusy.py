@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from scheduler.lib.sync import CalendarSync, invalidate_availability
+
+
+class Command(BaseCommand):
+    help = "Mirror busy time of the Google calendar into the local database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--calendar",
+            default="primary",
+            help="calendar to mirror",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="discard the sync token and resync everything",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="keep syncing every N seconds",
+        )
+
+    def handle(self, *args, **options):
+        sync = CalendarSync(calendar_id=options["calendar"])
+        full = options["full"]
+
+        while True:
+            result = sync.run(full=full)
+            invalidate_availability(result)
+            self.stdout.write(
+                f"{'Full' if result.full else 'Incremental'} sync done, "
+                f"{len(result.changed)} interval(s) changed."
+            )
+
+            if not options["interval"]:
+                break
+            full = False
+            time.sleep(options["interval"])
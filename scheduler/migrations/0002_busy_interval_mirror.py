@@ -0,0 +1,40 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendar_id', models.CharField(default='primary', max_length=255)),
+                ('event_id', models.CharField(max_length=1024)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendar_id', models.CharField(max_length=255, unique=True)),
+                ('sync_token', models.CharField(blank=True, max_length=1024)),
+                ('synced_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='busyinterval',
+            index=models.Index(fields=['calendar_id', 'start_time', 'end_time'], name='busy_interval_range_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='busyinterval',
+            constraint=models.UniqueConstraint(fields=('calendar_id', 'event_id'), name='unique_busy_interval_event'),
+        ),
+    ]
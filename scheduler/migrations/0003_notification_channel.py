@@ -0,0 +1,24 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0002_busy_interval_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationChannel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.CharField(max_length=64, unique=True)),
+                ('resource_id', models.CharField(max_length=255)),
+                ('calendar_id', models.CharField(default='primary', max_length=255)),
+                ('token', models.CharField(max_length=256)),
+                ('expiration', models.DateTimeField()),
+            ],
+        ),
+    ]
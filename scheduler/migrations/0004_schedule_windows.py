@@ -0,0 +1,156 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")
+
+
+def copy_columns_to_windows(apps, schema_editor):
+    Schedule = apps.get_model("scheduler", "Schedule")
+    ScheduleWindow = apps.get_model("scheduler", "ScheduleWindow")
+
+    windows = []
+    for schedule in Schedule.objects.all():
+        for weekday, day in enumerate(WEEKDAYS):
+            start = getattr(schedule, f"{day}_start")
+            end = getattr(schedule, f"{day}_end")
+            if getattr(schedule, f"{day}_off") or not (start and end):
+                continue
+            if start >= end:
+                continue
+            windows.append(
+                ScheduleWindow(
+                    schedule=schedule,
+                    weekday=weekday,
+                    start_time=start,
+                    end_time=end,
+                )
+            )
+    ScheduleWindow.objects.bulk_create(windows)
+
+
+def copy_windows_to_columns(apps, schema_editor):
+    # only the first window of each day fits into the old columns
+    Schedule = apps.get_model("scheduler", "Schedule")
+
+    for schedule in Schedule.objects.all():
+        for weekday, day in enumerate(WEEKDAYS):
+            window = (
+                schedule.windows.filter(weekday=weekday)
+                .order_by("start_time")
+                .first()
+            )
+            setattr(schedule, f"{day}_off", window is None)
+            setattr(schedule, f"{day}_start", window and window.start_time)
+            setattr(schedule, f"{day}_end", window and window.end_time)
+        schedule.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0003_notification_channel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Sunday'), (1, 'Monday'), (2, 'Tuesday'), (3, 'Wednesday'), (4, 'Thursday'), (5, 'Friday'), (6, 'Saturday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='windows', to='scheduler.schedule')),
+            ],
+            options={
+                'verbose_name': 'availability window',
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.RunPython(copy_columns_to_windows, copy_windows_to_columns),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='fri_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='fri_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='fri_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='mon_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='mon_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='mon_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sat_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sat_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sat_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sun_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sun_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='sun_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='thu_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='thu_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='thu_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='tue_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='tue_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='tue_start',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='wed_end',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='wed_off',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='wed_start',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0.10 on 2026-10-18 20:05
+
+from django.db import migrations
+
+from scheduler.lib import rtree
+
+
+def create_rtree(apps, schema_editor):
+    rtree.create(schema_editor, "scheduler_busyinterval")
+
+
+def drop_rtree(apps, schema_editor):
+    rtree.drop(schema_editor, "scheduler_busyinterval")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0007_event_range_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_rtree, drop_rtree),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0.10 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+# the event types that used to be derived from every location type and
+# duration, under the same URLs
+LOCATIONS = (("PHONE", "phone-call", "Phone call"), ("GMEET", "google-meet", "Google Meet"))
+DURATIONS = (15, 30, 45, 60)
+
+
+def create_default_event_types(apps, schema_editor):
+    EventType = apps.get_model("scheduler", "EventType")
+    EventType.objects.bulk_create(
+        [
+            EventType(
+                slug=f"{slug}-{duration}-min",
+                name=f"{label} ({duration} min)",
+                location_type=location_type,
+                duration=duration,
+            )
+            for location_type, slug, label in LOCATIONS
+            for duration in DURATIONS
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0008_interval_rtree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=64)),
+                ('location_type', models.CharField(choices=[('PHONE', 'Phone Call'), ('GMEET', 'Google Meet')], default='PHONE', max_length=8)),
+                ('duration', models.IntegerField(choices=[(15, '15 min'), (30, '30 min'), (45, '45 min'), (60, '60 min')], default=15, help_text='Duration of event in minutes')),
+                ('buffer_before', models.PositiveSmallIntegerField(default=0, help_text='Free minutes required before the event')),
+                ('buffer_after', models.PositiveSmallIntegerField(default=0, help_text='Free minutes required after the event')),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['location_type', 'duration'],
+            },
+        ),
+        migrations.RunPython(create_default_event_types, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
 import uuid
 from datetime import timedelta
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError, PermissionDenied
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .lib import rtree
+
 
 class Profile(AbstractUser):
     first_name = models.CharField(
@@ -41,219 +45,91 @@ class Profile(AbstractUser):
 
 
 class Schedule(models.Model):
+    class Meta:
+        verbose_name = "availability schedule"
+        verbose_name_plural = "availability schedule"
+
+    def __str__(self):
+        return "Availability schedule"
+
+    def save(self, *args, **kwargs):
+        # only 1 instance allowed
+        if self._state.adding and Schedule.objects.exists():
+            raise ValidationError("Only one instance allowed")
+
+        self.full_clean()
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise PermissionDenied("Cannot delete instance")
+
+
+class ScheduleWindow(models.Model):
     LOW_BOUND = "Must be a low bounded value"
     HIGH_BOUND = "Must be a high bounded value"
-    IS_REQUIRED = "This field is required"
 
-    sun_off = models.BooleanField(
-        default=True,
-    )
-    sun_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    sun_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    mon_off = models.BooleanField(
-        default=False,
-    )
-    mon_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    mon_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    tue_off = models.BooleanField(
-        default=False,
-    )
-    tue_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    tue_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    wed_off = models.BooleanField(
-        default=False,
-    )
-    wed_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    wed_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    thu_off = models.BooleanField(
-        default=False,
-    )
-    thu_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    thu_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    fri_off = models.BooleanField(
-        default=False,
-    )
-    fri_start = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    fri_end = models.TimeField(
-        null=True,
-        blank=True,
-    )
-    sat_off = models.BooleanField(
-        default=True,
-    )
-    sat_start = models.TimeField(
-        null=True,
-        blank=True,
+    # same numbering as `strftime("%w")`
+    class Weekday(models.IntegerChoices):
+        SUNDAY = 0
+        MONDAY = 1
+        TUESDAY = 2
+        WEDNESDAY = 3
+        THURSDAY = 4
+        FRIDAY = 5
+        SATURDAY = 6
+
+    schedule = models.ForeignKey(
+        Schedule,
+        on_delete=models.CASCADE,
+        related_name="windows",
     )
-    sat_end = models.TimeField(
-        null=True,
-        blank=True,
+    weekday = models.PositiveSmallIntegerField(
+        choices=Weekday.choices,
     )
+    start_time = models.TimeField()
+    end_time = models.TimeField()
 
     class Meta:
-        verbose_name = "availability schedule"
-        verbose_name_plural = "availability schedule"
+        ordering = ["weekday", "start_time"]
+        verbose_name = "availability window"
+
+    def __str__(self):
+        return (
+            f"{self.get_weekday_display()} "
+            f"{self.start_time:%H:%M} - {self.end_time:%H:%M}"
+        )
 
     def clean(self):
         # ensure time ranges respect min and max
-        if self.sun_start and self.sun_end and self.sun_start > self.sun_end:
-            raise ValidationError(
-                {
-                    "sun_start": self.LOW_BOUND,
-                    "sun_end": self.HIGH_BOUND,
-                }
-            )
-        if self.mon_start and self.mon_end and self.mon_start > self.mon_end:
-            raise ValidationError(
-                {
-                    "mon_start": self.LOW_BOUND,
-                    "mon_end": self.HIGH_BOUND,
-                }
-            )
-        if self.tue_start and self.tue_end and self.tue_start > self.tue_end:
-            raise ValidationError(
-                {
-                    "tue_start": self.LOW_BOUND,
-                    "tue_end": self.HIGH_BOUND,
-                }
-            )
-        if self.wed_start and self.wed_end and self.wed_start > self.wed_end:
-            raise ValidationError(
-                {
-                    "wed_start": self.LOW_BOUND,
-                    "wed_end": self.HIGH_BOUND,
-                }
-            )
-        if self.thu_start and self.thu_end and self.thu_start > self.thu_end:
-            raise ValidationError(
-                {
-                    "thu_start": self.LOW_BOUND,
-                    "thu_end": self.HIGH_BOUND,
-                }
-            )
-        if self.fri_start and self.fri_end and self.fri_start > self.fri_end:
+        if (
+            self.start_time
+            and self.end_time
+            and self.start_time >= self.end_time
+        ):
             raise ValidationError(
                 {
-                    "fri_start": self.LOW_BOUND,
-                    "fri_end": self.HIGH_BOUND,
-                }
-            )
-        if self.sat_start and self.sat_end and self.sat_start > self.sat_end:
-            raise ValidationError(
-                {
-                    "sat_start": self.LOW_BOUND,
-                    "sat_end": self.HIGH_BOUND,
+                    "start_time": self.LOW_BOUND,
+                    "end_time": self.HIGH_BOUND,
                 }
             )
 
-        # ensure times are filled if days are on
-        if not self.sun_off:
-            if not self.sun_start:
-                raise ValidationError(
-                    {"sun_start": self.IS_REQUIRED},
-                )
-            if not self.sun_end:
-                raise ValidationError(
-                    {"sun_end": self.IS_REQUIRED},
-                )
-        if not self.mon_off:
-            if not self.mon_start:
-                raise ValidationError(
-                    {"mon_start": self.IS_REQUIRED},
-                )
-            if not self.mon_end:
-                raise ValidationError(
-                    {"mon_end": self.IS_REQUIRED},
-                )
-        if not self.tue_off:
-            if not self.tue_start:
-                raise ValidationError(
-                    {"tue_start": self.IS_REQUIRED},
-                )
-            if not self.tue_end:
-                raise ValidationError(
-                    {"tue_end": self.IS_REQUIRED},
-                )
-        if not self.wed_off:
-            if not self.wed_start:
-                raise ValidationError(
-                    {"wed_start": self.IS_REQUIRED},
-                )
-            if not self.wed_end:
-                raise ValidationError(
-                    {"wed_end": self.IS_REQUIRED},
-                )
-        if not self.thu_off:
-            if not self.thu_start:
-                raise ValidationError(
-                    {"thu_start": self.IS_REQUIRED},
-                )
-            if not self.thu_end:
-                raise ValidationError(
-                    {"thu_end": self.IS_REQUIRED},
-                )
-        if not self.fri_off:
-            if not self.fri_start:
-                raise ValidationError(
-                    {"fri_start": self.IS_REQUIRED},
-                )
-            if not self.fri_end:
-                raise ValidationError(
-                    {"fri_end": self.IS_REQUIRED},
-                )
-        if not self.sat_off:
-            if not self.sat_start:
-                raise ValidationError(
-                    {"sat_start": self.IS_REQUIRED},
-                )
-            if not self.sat_end:
-                raise ValidationError(
-                    {"sat_end": self.IS_REQUIRED},
-                )
-
     def save(self, *args, **kwargs):
-        # only 1 instance allowed
-        if self._state.adding and Schedule.objects.exists():
-            raise ValidationError("Only one instance allowed")
-
         self.full_clean()
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        raise PermissionDenied("Cannot delete instance")
+
+class EventQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        # events sharing time with `[start, end)`
+        # no event lasts longer than the longest duration, so the lower
+        # bound on `start_time` turns this into a range scan of the
+        # `(start_time, end_time)` index, faster than the R*Tree
+        longest = timedelta(minutes=max(Event.Duration.values))
+        return self.filter(
+            start_time__gte=start - longest,
+            start_time__lt=end,
+            end_time__gt=start,
+        )
 
 
 class Event(models.Model):
@@ -305,6 +181,16 @@ class Event(models.Model):
         blank=True,
     )
 
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["start_time", "end_time"],
+                name="event_range_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.booker_name} {self.start_time} - {self.end_time}"
 
@@ -321,3 +207,190 @@ class Event(models.Model):
 
         self.full_clean()
         super().save(*args, **kwargs)
+
+
+class EventType(models.Model):
+    # bookable kind of event, reached at `/<slug>/`
+    slug = models.SlugField(
+        unique=True,
+    )
+    name = models.CharField(
+        max_length=64,
+    )
+    location_type = models.CharField(
+        max_length=8,
+        choices=Event.LocationType.choices,
+        default=Event.LocationType.PHONE_CALL,
+    )
+    duration = models.IntegerField(
+        choices=Event.Duration.choices,
+        default=Event.Duration.MIN_15,
+        help_text="Duration of event in minutes",
+    )
+    buffer_before = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Free minutes required before the event",
+    )
+    buffer_after = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Free minutes required after the event",
+    )
+    is_active = models.BooleanField(
+        default=True,
+    )
+
+    class Meta:
+        ordering = ["location_type", "duration"]
+
+    def __str__(self):
+        return self.name
+
+
+class BookingLock(models.Model):
+    # one row per UTC day, locked while a booking on that day is checked
+    # against existing events and saved
+    day = models.DateField(
+        unique=True,
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+    )
+
+    def __str__(self):
+        return f"{self.day}"
+
+
+class OutboxMessage(models.Model):
+    # Google Calendar insert of a booked event, written in the same
+    # transaction as the event and delivered by the `processoutbox` command
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="outbox",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+    )
+    # not picked up by a worker before this time
+    available_at = models.DateTimeField(
+        default=timezone.now,
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["sent_at", "available_at"],
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.attempts} attempt(s))"
+
+
+class IntervalQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        # rows sharing time with `[start, end)`, for intervals of any length
+        table = self.model._meta.db_table
+        if not rtree.rtree_enabled(self.db, table):
+            return self.indexed_overlapping(start, end)
+
+        # candidates from the SQLite R*Tree, then the exact comparison
+        return self.alias(
+            rowid=RawSQL(
+                f'"{table}".rowid', (), output_field=models.IntegerField()
+            )
+        ).filter(
+            rowid__in=RawSQL(
+                f"SELECT id FROM {rtree.rtree_table(table)} "
+                "WHERE start_minute < %s AND end_minute > %s",
+                tuple(reversed(rtree.minute_bounds(start, end))),
+            ),
+            start_time__lt=end,
+            end_time__gt=start,
+        )
+
+    def indexed_overlapping(self, start, end):
+        return self.filter(start_time__lt=end, end_time__gt=start)
+
+
+class BusyInterval(models.Model):
+    # local mirror of busy time on a Google calendar, kept up to date by the
+    # `syncbusy` management command
+    calendar_id = models.CharField(
+        max_length=255,
+        default="primary",
+    )
+    event_id = models.CharField(
+        max_length=1024,
+    )
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    objects = IntervalQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["calendar_id", "event_id"],
+                name="unique_busy_interval_event",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["calendar_id", "start_time", "end_time"],
+                name="busy_interval_range_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.calendar_id} {self.start_time} - {self.end_time}"
+
+
+class CalendarSyncState(models.Model):
+    calendar_id = models.CharField(
+        max_length=255,
+        unique=True,
+    )
+    sync_token = models.CharField(
+        max_length=1024,
+        blank=True,
+    )
+    synced_at = models.DateTimeField(
+        null=True,
+    )
+
+    def __str__(self):
+        return self.calendar_id
+
+
+class NotificationChannel(models.Model):
+    # push notification channel registered with `events.watch`
+    channel_id = models.CharField(
+        max_length=64,
+        unique=True,
+    )
+    resource_id = models.CharField(
+        max_length=255,
+    )
+    calendar_id = models.CharField(
+        max_length=255,
+        default="primary",
+    )
+    token = models.CharField(
+        max_length=256,
+    )
+    expiration = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.calendar_id} {self.channel_id}"
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .lib.availability import availability
+from .lib.eventtypes import compiled_event_types
+from .lib.weekly import compiled_schedule
+from .models import Event, EventType, Schedule, ScheduleWindow
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=ScheduleWindow)
+@receiver(post_delete, sender=ScheduleWindow)
+def invalidate_compiled_schedule(sender, **kwargs):
+    # once committed, or other workers could recompile the old rows under
+    # the new version
+    transaction.on_commit(compiled_schedule.invalidate)
+
+
+@receiver(post_save, sender=EventType)
+@receiver(post_delete, sender=EventType)
+def invalidate_compiled_event_types(sender, **kwargs):
+    transaction.on_commit(compiled_event_types.invalidate)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def touch_availability(sender, **kwargs):
+    # local bookings are part of the busy time served by the pickers
+    transaction.on_commit(availability.touch)
@@ -0,0 +1,21 @@
+from ..models import Schedule, ScheduleWindow
+
+WORKWEEK = (
+    ScheduleWindow.Weekday.MONDAY,
+    ScheduleWindow.Weekday.TUESDAY,
+    ScheduleWindow.Weekday.WEDNESDAY,
+    ScheduleWindow.Weekday.THURSDAY,
+    ScheduleWindow.Weekday.FRIDAY,
+)
+
+
+def create_schedule(weekdays=WORKWEEK, start="9:00:00", end="17:00:00"):
+    schedule = Schedule.objects.create()
+    for weekday in weekdays:
+        ScheduleWindow.objects.create(
+            schedule=schedule,
+            weekday=weekday,
+            start_time=start,
+            end_time=end,
+        )
+    return schedule
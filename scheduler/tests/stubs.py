@@ -0,0 +1,100 @@
+import json
+import ssl
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
+
+
+# minimal local stand-in for the Calendar API
+# routes map `(method, path)` to a callable receiving the query string and
+# JSON body, and returning `(status, payload)`
+# with a `certfile` (certificate and key) it is served over HTTPS
+class CalendarStubServer:
+    def __init__(self, certfile=None):
+        self.routes = {}
+        self.requests = []
+        self.scheme = "https" if certfile else "http"
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        if certfile:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile)
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"{self.scheme}://{host}:{port}"
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    def build_service(self, http=None):
+        return build(
+            "calendar",
+            "v3",
+            http=http or httplib2.Http(),
+            static_discovery=True,
+            client_options={"api_endpoint": self.url},
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, which would stall
+            # kept-alive connections on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                stub.requests.append((self.command, parsed.path, query, body))
+
+                handler = stub.routes.get((self.command, parsed.path))
+                if handler is None:
+                    status, payload = 404, {"error": {"code": 404}}
+                else:
+                    status, payload = handler(query, body)
+
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# runs submitted calls (e.g. prefetches) in the calling thread
+class ImmediateExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
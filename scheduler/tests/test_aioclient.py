@@ -0,0 +1,109 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from ..lib.aioclient import AsyncCalendarClient, get_async_client
+from ..lib.service import calendar_service
+from .stubs import CalendarStubServer
+
+TIME_MIN = "2022-01-10T00:00:00+00:00"
+TIME_MAX = "2022-01-11T00:00:00+00:00"
+
+
+class AsyncCalendarClientTest(SimpleTestCase):
+    def setUp(self):
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        patcher = mock.patch.object(
+            calendar_service,
+            "credentials",
+            return_value=mock.Mock(token="access-token"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, *args):
+        async def run():
+            client = AsyncCalendarClient(api_root=self.stub.url)
+            try:
+                return await client.fetch(*args)
+            finally:
+                await client.aclose()
+
+        return async_to_sync(run)()
+
+    @override_settings(CALENDAR_AVAILABILITY_PROVIDER="freebusy")
+    def test_freebusy(self):
+        self.stub.route(
+            "POST",
+            "/freeBusy",
+            lambda query, body: (
+                200,
+                {
+                    "calendars": {
+                        "primary": {
+                            "busy": [
+                                {
+                                    "start": "2022-01-10T09:00:00Z",
+                                    "end": "2022-01-10T10:00:00Z",
+                                }
+                            ]
+                        }
+                    }
+                },
+            ),
+        )
+        self.assertEqual(
+            self.fetch(TIME_MIN, TIME_MAX),
+            [
+                {
+                    "start": {"dateTime": "2022-01-10T09:00:00Z"},
+                    "end": {"dateTime": "2022-01-10T10:00:00Z"},
+                }
+            ],
+        )
+        _, _, _, body = self.stub.requests[0]
+        self.assertEqual(body["timeMax"], TIME_MAX)
+
+    @override_settings(CALENDAR_AVAILABILITY_PROVIDER="events")
+    def test_events_are_paged_with_lean_requests(self):
+        event = {
+            "start": {"dateTime": "2022-01-10T09:00:00Z"},
+            "end": {"dateTime": "2022-01-10T10:00:00Z"},
+        }
+        self.stub.route(
+            "GET",
+            "/calendars/primary/events",
+            lambda query, body: (
+                200,
+                (
+                    {"items": [event]}
+                    if query.get("pageToken")
+                    else {"items": [event], "nextPageToken": "page-2"}
+                ),
+            ),
+        )
+        self.assertEqual(len(self.fetch(TIME_MIN, TIME_MAX)), 2)
+        self.assertEqual(len(self.stub.requests), 2)
+        _, _, query, _ = self.stub.requests[1]
+        self.assertEqual(query["pageToken"], "page-2")
+        self.assertEqual(query["singleEvents"], "true")
+
+    @override_settings(CALENDAR_AVAILABILITY_PROVIDER="carrier-pigeon")
+    def test_unknown_provider_is_an_error(self):
+        with self.assertRaises(ValueError):
+            self.fetch(TIME_MIN, TIME_MAX)
+        self.assertEqual(self.stub.requests, [])
+
+    def test_client_is_closed_with_its_event_loop(self):
+        async def client():
+            return get_async_client(), get_async_client()
+
+        first, again = async_to_sync(client)()
+        self.assertIs(first, again)
+        self.assertTrue(first._client.is_closed)
+
+        # the next loop gets a client of its own
+        second, _ = async_to_sync(client)()
+        self.assertIsNot(second, first)
@@ -0,0 +1,259 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytz
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from ..lib import metrics
+from ..lib.availability import (
+    AvailabilityCache,
+    CalendarUnavailable,
+    stale_days,
+    unavailable_days,
+    utc_days,
+)
+from ..lib.breaker import calendar_breaker
+
+
+def busy_event(start, end):
+    return {
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    }
+
+
+class FakeCalendar:
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def __call__(self, time_lower, time_upper):
+        self.calls.append((time_lower, time_upper))
+        return self.events
+
+
+class AvailabilityCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.meeting_start = datetime(2022, 1, 10, 23, tzinfo=pytz.utc)
+        self.meeting_end = self.meeting_start + timedelta(hours=2)
+        self.calendar = FakeCalendar(
+            [busy_event(self.meeting_start, self.meeting_end)]
+        )
+        self.availability = AvailabilityCache(self.calendar)
+
+    def window(self, tz_name, day=10):
+        time_min = pytz.timezone(tz_name).localize(datetime(2022, 1, day))
+        return time_min, time_min + timedelta(days=1)
+
+    def test_utc_days_of_a_user_timezone_window(self):
+        self.assertEqual(
+            utc_days(*self.window("America/New_York")),
+            [date(2022, 1, 10), date(2022, 1, 11)],
+        )
+        self.assertEqual(utc_days(*self.window("UTC")), [date(2022, 1, 10)])
+
+    def test_missing_days_are_fetched_in_a_single_call(self):
+        busy = self.availability.get_busy(*self.window("America/New_York"))
+        self.assertEqual(len(self.calendar.calls), 1)
+        self.assertEqual(
+            self.calendar.calls[0],
+            ("2022-01-10T00:00:00+00:00", "2022-01-12T00:00:00+00:00"),
+        )
+        self.assertEqual(list(busy), [(self.meeting_start, self.meeting_end)])
+
+    def test_revisiting_and_switching_timezones_uses_cached_buckets(self):
+        self.availability.get_busy(*self.window("America/New_York"))
+        self.availability.get_busy(*self.window("America/New_York"))
+        busy = self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(self.calendar.calls), 1)
+        self.assertEqual(
+            list(busy),
+            [(self.meeting_start, datetime(2022, 1, 11, tzinfo=pytz.utc))],
+        )
+
+    def test_shared_tier_is_used_when_local_tier_is_cold(self):
+        self.availability.get_busy(*self.window("UTC"))
+        self.availability.local.clear()
+        self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(self.calendar.calls), 1)
+
+    def test_invalidated_days_are_fetched_again(self):
+        self.availability.get_busy(*self.window("UTC"))
+        self.availability.invalidate(date(2022, 1, 10))
+        self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(self.calendar.calls), 2)
+
+    def test_invalidation_by_another_worker_drops_local_buckets(self):
+        self.availability.get_busy(*self.window("UTC"))
+        # a second worker, with its own local tier
+        other = AvailabilityCache(FakeCalendar([]))
+        other.invalidate(date(2022, 1, 10))
+        busy = self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(self.calendar.calls), 2)
+        self.assertEqual(len(busy), 1)
+
+    def test_buckets_invalidated_during_their_fetch_are_not_cached(self):
+        def fetch_during_a_change(time_lower, time_upper):
+            # a push notification is handled while the fetch is in flight
+            AvailabilityCache(FakeCalendar([])).invalidate(date(2022, 1, 10))
+            return self.calendar(time_lower, time_upper)
+
+        self.availability.fetch = fetch_during_a_change
+        busy = self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(busy), 1)
+        self.availability.fetch = self.calendar
+        self.availability.get_busy(*self.window("UTC"))
+        self.availability.get_busy(*self.window("UTC"))
+        self.assertEqual(len(self.calendar.calls), 2)
+
+    def test_clear_drops_every_bucket(self):
+        self.availability.get_busy(*self.window("UTC"))
+        self.availability.get_busy(*self.window("UTC", day=11))
+        self.availability.clear()
+        self.availability.get_busy(*self.window("UTC", day=11))
+        self.assertEqual(len(self.calendar.calls), 3)
+
+
+# the same, on the cache the project ships with
+@override_settings(CACHES=settings.SHIPPED_CACHES)
+class SharedAvailabilityCacheTest(AvailabilityCacheTest, TransactionTestCase):
+    pass
+
+
+class FailingCalendar:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, time_lower, time_upper):
+        self.calls += 1
+        raise TimeoutError("Calendar API timed out")
+
+
+class StaleAvailabilityTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        calendar_breaker.reset()
+        self.addCleanup(calendar_breaker.reset)
+        self.meeting_start = datetime(2022, 1, 10, 9, tzinfo=pytz.utc)
+        self.calendar = FakeCalendar(
+            [
+                busy_event(
+                    self.meeting_start, self.meeting_start + timedelta(hours=1)
+                )
+            ]
+        )
+        self.availability = AvailabilityCache(self.calendar)
+        self.window = (
+            datetime(2022, 1, 10, tzinfo=pytz.utc),
+            datetime(2022, 1, 11, tzinfo=pytz.utc),
+        )
+
+    def expire(self):
+        # fresh buckets are gone, only the stale copies are left
+        self.availability.clear()
+        self.availability.fetch = FailingCalendar()
+
+    def test_fresh_lookups_are_not_stale(self):
+        lookup = self.availability.lookup(*self.window)
+        self.assertFalse(lookup.stale)
+        self.assertEqual(len(lookup.busy), 1)
+
+    def test_last_known_busy_time_is_served_when_google_fails(self):
+        self.availability.lookup(*self.window)
+        self.expire()
+        lookup = self.availability.lookup(*self.window)
+        self.assertTrue(lookup.stale)
+        self.assertEqual(
+            list(lookup.busy),
+            [(self.meeting_start, self.meeting_start + timedelta(hours=1))],
+        )
+        self.assertEqual(stale_days.value(), 1)
+
+    def test_unavailable_without_stale_busy_time(self):
+        self.availability.fetch = FailingCalendar()
+        with self.assertRaises(CalendarUnavailable):
+            self.availability.lookup(*self.window)
+
+    def test_stale_busy_time_can_be_refused(self):
+        self.availability.lookup(*self.window)
+        self.expire()
+        with self.assertRaises(CalendarUnavailable):
+            self.availability.get_busy(*self.window, allow_stale=False)
+
+    @override_settings(CALENDAR_BREAKER_FAILURES=2)
+    def test_open_circuit_skips_google(self):
+        self.availability.lookup(*self.window)
+        self.expire()
+        for _ in range(4):
+            self.assertTrue(self.availability.lookup(*self.window).stale)
+        self.assertEqual(self.availability.fetch.calls, 2)
+
+    @override_settings(CALENDAR_BREAKER_FAILURES=1)
+    def test_bugs_are_not_mistaken_for_an_unhealthy_calendar(self):
+        self.availability.lookup(*self.window)
+        self.availability.clear()
+        self.availability.fetch = lambda *window: {}["items"]
+        with self.assertRaises(KeyError):
+            self.availability.lookup(*self.window)
+        self.assertFalse(calendar_breaker.is_open)
+
+    @override_settings(CALENDAR_FETCH_DEADLINE=0.05)
+    def test_slow_async_fetches_hit_the_deadline(self):
+        async def slow_fetch(time_lower, time_upper):
+            await asyncio.sleep(1)
+
+        self.availability.lookup(*self.window)
+        self.availability.clear()
+        self.availability.afetch = slow_fetch
+        lookup = async_to_sync(self.availability.alookup)(*self.window)
+        self.assertTrue(lookup.stale)
+        self.assertEqual(len(lookup.busy), 1)
+
+
+async def unreachable_calendar(time_lower, time_upper):
+    raise ConnectionError("Connection refused")
+
+
+# the async lookups of the pickers, on the cache the project ships with
+@override_settings(CACHES=settings.SHIPPED_CACHES, CALENDAR_BREAKER_FAILURES=1)
+class AsyncOutageTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        calendar_breaker.reset()
+        self.addCleanup(calendar_breaker.reset)
+        start = datetime(2022, 1, 10, 9, tzinfo=pytz.utc)
+        self.availability = AvailabilityCache(
+            FakeCalendar([busy_event(start, start + timedelta(hours=1))])
+        )
+        self.window = (
+            datetime(2022, 1, 10, tzinfo=pytz.utc),
+            datetime(2022, 1, 11, tzinfo=pytz.utc),
+        )
+
+    def alookup(self):
+        return async_to_sync(self.availability.alookup)(*self.window)
+
+    def test_unavailable_while_google_is_down(self):
+        self.availability.afetch = unreachable_calendar
+        # the failure opens the circuit, the second lookup is rejected
+        for _ in range(2):
+            with self.assertRaises(CalendarUnavailable):
+                self.alookup()
+        self.assertTrue(calendar_breaker.is_open)
+        self.assertEqual(unavailable_days.value(), 2)
+
+    def test_stale_busy_time_while_google_is_down(self):
+        self.assertFalse(self.alookup().stale)
+        self.availability.clear()
+        self.availability.afetch = unreachable_calendar
+        for _ in range(2):
+            lookup = self.alookup()
+            self.assertTrue(lookup.stale)
+            self.assertEqual(len(lookup.busy), 1)
+        self.assertEqual(stale_days.value(), 2)
@@ -0,0 +1,214 @@
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..lib.availability import availability
+from ..lib.booking import SlotUnavailable, book_event
+from ..lib.weekly import compiled_schedule
+from ..models import Event
+from .factories import create_schedule
+from .test_views import NOW, FakeCalendar, PickerTestCase
+
+
+class BookingViewTest(PickerTestCase):
+    def url(self, date="20220111"):
+        return reverse(
+            "scheduler:book",
+            kwargs={"event": "google-meet-30-min", "date": date},
+        )
+
+    def post(self, start, date="20220111"):
+        return self.client.post(
+            self.url(date),
+            {
+                "start_time": start.isoformat(),
+                "booker_name": "Ada",
+                "booker_email": "ada@example.com",
+            },
+        )
+
+    def test_form_carries_the_selected_time(self):
+        response = self.client.get(
+            self.url(), {"start": "2022-01-11T10:00:00+00:00"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Tuesday 11 Jan, 10:00")
+
+    def test_booking_a_free_slot(self):
+        start = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+        response = self.post(start)
+        self.assertEqual(response.status_code, 201)
+
+        event = Event.objects.get()
+        self.assertEqual(event.start_time, start)
+        self.assertEqual(event.end_time, start + timedelta(minutes=30))
+        self.assertEqual(event.location_type, Event.LocationType.GOOGLE_MEET)
+        self.assertEqual(event.booker_email, "ada@example.com")
+
+    def test_overlapping_booking_is_rejected(self):
+        start = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+        self.post(start)
+        response = self.post(start)
+        # local bookings are busy time as soon as they are saved
+        self.assertContains(
+            response, "This time is no longer available.", status_code=409
+        )
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_stale_busy_time_is_not_booked_against(self):
+        start = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+        self.client.get(self.url(), {"start": start.isoformat()})
+        availability.get_busy(start, start + timedelta(minutes=30))
+        availability.clear()
+        with mock.patch.object(
+            availability, "fetch", side_effect=TimeoutError("timed out")
+        ):
+            response = self.post(start)
+        self.assertContains(
+            response, "Please try again shortly.", status_code=503
+        )
+        self.assertFalse(Event.objects.exists())
+
+    def test_busy_and_unscheduled_times_are_rejected(self):
+        for start in (
+            # busy in the calendar
+            datetime(2022, 1, 12, 10, tzinfo=pytz.utc),
+            # outside of the schedule
+            datetime(2022, 1, 11, 17, tzinfo=pytz.utc),
+            # in the past
+            datetime(2022, 1, 10, 7, tzinfo=pytz.utc),
+        ):
+            with self.subTest(start=start):
+                response = self.post(start, date=start.strftime("%Y%m%d"))
+                self.assertEqual(response.status_code, 409)
+        self.assertFalse(Event.objects.exists())
+
+    def test_times_the_pickers_do_not_offer_are_rejected(self):
+        for start in (
+            # beyond the booking horizon
+            datetime(2022, 3, 14, 10, tzinfo=pytz.utc),
+            # off the 30 minute grid
+            datetime(2022, 1, 11, 10, 10, tzinfo=pytz.utc),
+        ):
+            with self.subTest(start=start):
+                response = self.post(start, date=start.strftime("%Y%m%d"))
+                self.assertEqual(response.status_code, 409)
+        self.assertFalse(Event.objects.exists())
+        # the calendar was not asked about them
+        self.assertEqual(self.calendar.calls, [])
+
+    def test_phone_call_without_owner_number_is_a_client_error(self):
+        # the owner's phone number comes from their profile
+        response = self.client.post(
+            reverse(
+                "scheduler:book",
+                kwargs={"event": "phone-call-30-min", "date": "20220111"},
+            ),
+            {
+                "start_time": "2022-01-11T10:00:00+00:00",
+                "booker_name": "Ada",
+                "booker_email": "ada@example.com",
+            },
+        )
+        self.assertContains(
+            response, "Required for phone call location type", status_code=400
+        )
+        self.assertFalse(Event.objects.exists())
+
+    @override_settings(SCHEDULE_TIME_ZONE="America/Los_Angeles")
+    def test_schedule_is_checked_in_its_own_time_zone(self):
+        compiled_schedule.invalidate()
+        self.addCleanup(compiled_schedule.invalidate)
+        # Mon 23:00 in Los Angeles, a UTC working day (Tue 07:00)
+        start = datetime(2022, 1, 11, 7, tzinfo=pytz.utc)
+        response = self.post(start)
+        self.assertContains(
+            response, "This time is no longer available.", status_code=409
+        )
+        # Tue 9:00 in Los Angeles
+        response = self.post(datetime(2022, 1, 11, 17, tzinfo=pytz.utc))
+        self.assertEqual(response.status_code, 201)
+
+    def test_invalid_form(self):
+        response = self.client.post(
+            self.url(), {"start_time": "2022-01-11T10:00:00+00:00"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.context["form"].errors)
+        self.assertFalse(Event.objects.exists())
+
+
+# parallel bookers on separate connections, against the configured database
+# and the cache the project ships with
+@override_settings(CACHES=settings.SHIPPED_CACHES)
+class BookingConcurrencyTest(TransactionTestCase):
+    BOOKERS = 16
+
+    def setUp(self):
+        cache.clear()
+        availability.local.clear()
+        create_schedule()
+        for target, value in (
+            ("django.utils.timezone.now", mock.Mock(return_value=NOW)),
+            ("scheduler.lib.availability.availability.fetch", FakeCalendar()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def book_in_parallel(self, starts):
+        barrier = threading.Barrier(len(starts))
+        results = [None] * len(starts)
+
+        def book(index, start):
+            try:
+                barrier.wait()
+                book_event(
+                    Event(
+                        location_type=Event.LocationType.GOOGLE_MEET,
+                        duration=30,
+                        start_time=start,
+                        booker_name=f"Booker {index}",
+                    )
+                )
+                results[index] = "booked"
+            except SlotUnavailable:
+                results[index] = "unavailable"
+            except Exception as error:
+                results[index] = error
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=book, args=(index, start))
+            for index, start in enumerate(starts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_a_slot_is_booked_only_once(self):
+        start = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+        results = self.book_in_parallel([start] * self.BOOKERS)
+
+        self.assertEqual(results.count("booked"), 1)
+        self.assertEqual(results.count("unavailable"), self.BOOKERS - 1)
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_distinct_slots_are_all_booked(self):
+        first = datetime(2022, 1, 11, 9, tzinfo=pytz.utc)
+        results = self.book_in_parallel(
+            [first + timedelta(minutes=30 * n) for n in range(self.BOOKERS)]
+        )
+
+        self.assertEqual(results, ["booked"] * self.BOOKERS)
+        self.assertEqual(Event.objects.count(), self.BOOKERS)
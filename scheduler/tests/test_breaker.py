@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..lib import metrics
+from ..lib.breaker import CircuitBreaker, CircuitOpen, opened, rejected
+
+
+@override_settings(CALENDAR_BREAKER_FAILURES=2, CALENDAR_BREAKER_RESET=30)
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.breaker = CircuitBreaker()
+        patcher = mock.patch("time.monotonic", return_value=100.0)
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail(self, times=1):
+        for _ in range(times):
+            self.breaker.check()
+            self.breaker.failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail()
+        self.breaker.check()
+        self.fail()
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.assertEqual(opened.value(), 1)
+        self.assertEqual(rejected.value(), 1)
+
+    def test_success_resets_the_failure_count(self):
+        self.fail()
+        self.breaker.success()
+        self.fail()
+        self.assertFalse(self.breaker.is_open)
+
+    def test_single_trial_call_after_the_reset_timeout(self):
+        self.fail(2)
+        self.monotonic.return_value = 130.0
+        self.breaker.check()
+        # only one call goes through while the trial is pending
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.breaker.success()
+        self.breaker.check()
+        self.assertFalse(self.breaker.is_open)
+
+    def test_failed_trial_opens_the_circuit_again(self):
+        self.fail(2)
+        self.monotonic.return_value = 130.0
+        self.fail()
+        self.monotonic.return_value = 150.0
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.assertEqual(opened.value(), 2)
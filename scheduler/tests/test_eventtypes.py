@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytz
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..lib.booking import SlotUnavailable, book_event
+from ..lib.eventtypes import event_types, get_event_type
+from ..lib.intervals import IntervalSet
+from ..models import Event, EventType
+from .test_views import PickerTestCase
+
+
+def utc(hour, minute=0):
+    return pytz.utc.localize(datetime(2022, 1, 11, hour, minute))
+
+
+class EventTypeRegistryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_default_event_types(self):
+        self.assertEqual(len(event_types()), 8)
+        phone = get_event_type("phone-call-45-min")
+        self.assertEqual(phone.location_type, Event.LocationType.PHONE_CALL)
+        self.assertEqual(phone.duration, 45)
+        self.assertIsNone(get_event_type("phone-call-90-min"))
+
+    def test_lookups_are_served_from_memory(self):
+        event_types()
+        with self.assertNumQueries(0):
+            get_event_type("google-meet-30-min")
+
+    def test_changes_recompile_the_registry(self):
+        event_types()
+        event_type = EventType.objects.get(slug="google-meet-30-min")
+        event_type.buffer_after = 15
+        with self.captureOnCommitCallbacks() as callbacks:
+            event_type.save()
+        # not before the change is committed
+        self.assertEqual(
+            get_event_type("google-meet-30-min").buffer_after, timedelta(0)
+        )
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            get_event_type("google-meet-30-min").buffer_after,
+            timedelta(minutes=15),
+        )
+
+        event_type.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            event_type.save()
+        self.assertIsNone(get_event_type("google-meet-30-min"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EventType.objects.create(
+                slug="intro-call", name="Intro call", duration=15
+            )
+        self.assertEqual(get_event_type("intro-call").duration, 15)
+
+    def test_buffers_pad_busy_time(self):
+        EventType.objects.filter(slug="google-meet-30-min").update(
+            buffer_before=10, buffer_after=5
+        )
+        cache.clear()
+        busy = IntervalSet([(utc(10), utc(11))])
+        self.assertEqual(
+            list(get_event_type("google-meet-30-min").buffered(busy)),
+            [(utc(9, 55), utc(11, 10))],
+        )
+
+
+class EventTypeBufferTest(PickerTestCase):
+    def setUp(self):
+        super().setUp()
+        EventType.objects.filter(slug="google-meet-30-min").update(
+            buffer_before=15, buffer_after=15
+        )
+        Event.objects.create(
+            location_type=Event.LocationType.GOOGLE_MEET,
+            duration=30,
+            start_time=utc(12),
+        )
+
+    def test_time_picker_keeps_buffers_free(self):
+        response = self.client.get(
+            reverse(
+                "scheduler:time_picker",
+                kwargs={"event": "google-meet-30-min", "date": "20220111"},
+            )
+        )
+        times = response.context["available_times"]
+        self.assertIn(utc(11), times)
+        self.assertNotIn(utc(11, 30), times)
+        self.assertNotIn(utc(12, 30), times)
+        self.assertIn(utc(13), times)
+
+    def test_bookings_keep_buffers_free(self):
+        booking = Event(
+            location_type=Event.LocationType.GOOGLE_MEET,
+            duration=30,
+            start_time=utc(12, 30),
+        )
+        buffer = timedelta(minutes=15)
+        with self.assertRaises(SlotUnavailable):
+            book_event(booking, buffer, buffer)
+        book_event(booking)
@@ -0,0 +1,150 @@
+import random
+from datetime import datetime, timedelta
+
+import pytz
+from django.test import SimpleTestCase
+
+from ..lib.intervals import IntervalSet, iter_available_slots, parse_datetime
+
+
+def dt(hour, minute=0, day=10):
+    return datetime(2022, 1, day, hour, minute, tzinfo=pytz.utc)
+
+
+def scan_available_times(start, end, duration, events, now):
+    # reference implementation: a per-slot scan over every event
+    available_times = []
+    current_start = start
+    current_end = current_start + timedelta(minutes=duration)
+    while current_end <= end:
+        skip = False
+        if current_start > now:
+            for event in events:
+                event_start = datetime.fromisoformat(
+                    event["start"]["dateTime"]
+                )
+                event_end = datetime.fromisoformat(event["end"]["dateTime"])
+                if current_start < event_end and event_start < current_end:
+                    skip = True
+                    break
+            if not skip:
+                available_times.append(current_start)
+        current_start = current_start + timedelta(minutes=duration)
+        current_end = current_start + timedelta(minutes=duration)
+    return available_times
+
+
+class IntervalSetTest(SimpleTestCase):
+    def test_overlapping_and_touching_intervals_are_merged(self):
+        intervals = IntervalSet(
+            [
+                (dt(9), dt(10)),
+                (dt(12), dt(13)),
+                (dt(10), dt(11)),
+                (dt(9), dt(9, 30)),
+            ]
+        )
+        self.assertEqual(list(intervals), [(dt(9), dt(11)), (dt(12), dt(13))])
+
+    def test_empty_intervals_are_dropped(self):
+        self.assertFalse(IntervalSet([(dt(9), dt(9)), (dt(10), dt(9))]))
+
+    def test_union(self):
+        left = IntervalSet([(dt(9), dt(10))])
+        right = IntervalSet([(dt(9, 30), dt(11)), (dt(14), dt(15))])
+        self.assertEqual(
+            list(left.union(right)), [(dt(9), dt(11)), (dt(14), dt(15))]
+        )
+
+    def test_intersect(self):
+        left = IntervalSet([(dt(8), dt(10)), (dt(12), dt(16))])
+        right = IntervalSet([(dt(9), dt(13)), (dt(15), dt(17))])
+        self.assertEqual(
+            list(left.intersect(right)),
+            [(dt(9), dt(10)), (dt(12), dt(13)), (dt(15), dt(16))],
+        )
+
+    def test_subtract(self):
+        left = IntervalSet([(dt(8), dt(17))])
+        right = IntervalSet(
+            [(dt(7), dt(9)), (dt(12), dt(13)), (dt(16), dt(18))]
+        )
+        self.assertEqual(
+            list(left.subtract(right)), [(dt(9), dt(12)), (dt(13), dt(16))]
+        )
+
+    def test_boundary_lookups(self):
+        intervals = IntervalSet([(dt(9), dt(10))])
+        self.assertTrue(intervals.covers_start(dt(9)))
+        self.assertFalse(intervals.covers_start(dt(10)))
+        self.assertFalse(intervals.covers_end(dt(9)))
+        self.assertTrue(intervals.covers_end(dt(10)))
+        self.assertTrue(intervals.overlaps(dt(9, 30), dt(11)))
+        self.assertFalse(intervals.overlaps(dt(10), dt(11)))
+
+    def test_all_day_events_do_not_block_time(self):
+        intervals = IntervalSet.from_events(
+            [
+                {
+                    "start": {"date": "2022-01-10"},
+                    "end": {"date": "2022-01-11"},
+                },
+                {
+                    "start": {"dateTime": "2022-01-10T09:00:00+00:00"},
+                    "end": {"dateTime": "2022-01-10T10:00:00+00:00"},
+                },
+            ]
+        )
+        self.assertEqual(list(intervals), [(dt(9), dt(10))])
+
+    def test_parse_datetime_accepts_zulu_suffix(self):
+        self.assertEqual(parse_datetime("2022-01-10T09:00:00Z"), dt(9))
+
+
+class AvailableSlotsTest(SimpleTestCase):
+    def test_slots_conflicting_with_busy_time_are_skipped(self):
+        busy = IntervalSet([(dt(9, 15), dt(10))])
+        slots = iter_available_slots(dt(9), dt(10, 30), 15, busy)
+        self.assertEqual(list(slots), [dt(9), dt(10), dt(10, 15)])
+
+    def test_slots_containing_busy_time_are_skipped(self):
+        busy = IntervalSet([(dt(10, 15), dt(10, 30))])
+        slots = iter_available_slots(dt(9), dt(12), 60, busy)
+        self.assertEqual(list(slots), [dt(9), dt(11)])
+        self.assertTrue(busy.overlaps(dt(10), dt(11)))
+
+    def test_slots_before_now_are_skipped(self):
+        slots = iter_available_slots(
+            dt(9), dt(10), 30, IntervalSet(), now=dt(9)
+        )
+        self.assertEqual(list(slots), [dt(9, 30)])
+
+    def test_matches_per_slot_scan(self):
+        rng = random.Random(1234)
+        start = pytz.timezone("America/New_York").localize(
+            datetime(2022, 1, 10)
+        )
+        end = start + timedelta(days=1)
+        for _ in range(50):
+            events = []
+            for _ in range(rng.randint(0, 25)):
+                event_start = start + timedelta(
+                    minutes=rng.randrange(-120, 24 * 60, 5)
+                )
+                event_end = event_start + timedelta(
+                    minutes=rng.randrange(5, 180, 5)
+                )
+                events.append(
+                    {
+                        "start": {"dateTime": event_start.isoformat()},
+                        "end": {"dateTime": event_end.isoformat()},
+                    }
+                )
+            duration = rng.choice([15, 30, 45, 60])
+            now = start + timedelta(minutes=rng.randrange(-60, 600))
+
+            busy = IntervalSet.from_events(events)
+            self.assertEqual(
+                list(iter_available_slots(start, end, duration, busy, now)),
+                scan_available_times(start, end, duration, events, now),
+            )
@@ -0,0 +1,48 @@
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from ..lib import metrics
+from ..lib.transport import requests_sent as counter
+
+
+@override_settings(CACHES=settings.SHIPPED_CACHES)
+class CounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_counting_stays_in_process_memory(self):
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                counter.incr()
+        self.assertEqual(counter.value(), 10)
+
+    def test_concurrent_increments_all_count(self):
+        def count():
+            for _ in range(5):
+                counter.incr()
+
+        threads = [threading.Thread(target=count) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value(), 80)
+
+    def test_counts_survive_a_failed_flush(self):
+        counter.incr(2)
+        with mock.patch.object(metrics, "_add", side_effect=DatabaseError):
+            with self.assertLogs(metrics.logger, "ERROR"):
+                metrics.flush()
+        counter.incr()
+        self.assertEqual(counter.value(), 3)
+
+    def test_reset_drops_unflushed_counts(self):
+        counter.incr(2)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["calendar_http_requests"], 0)
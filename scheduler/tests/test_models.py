@@ -1,8 +1,12 @@
 from datetime import timedelta
-from django.test import TestCase
+from django.db import connection
+from django.forms import inlineformset_factory
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.utils import timezone
-from ..models import Profile, Schedule, Event
+from ..admin import ScheduleWindowFormSet
+from ..models import Profile, Schedule, ScheduleWindow, Event
+from .factories import create_schedule
 
 
 class ProfileTest(TestCase):
@@ -32,91 +36,89 @@ class ProfileTest(TestCase):
 class ScheduleTest(TestCase):
     @classmethod
     def setUpTestData(cls):
-        cls.schedule = Schedule.objects.create(
-            mon_start="9:00:00",
-            mon_end="17:00:00",
-            tue_start="9:00:00",
-            tue_end="17:00:00",
-            wed_start="9:00:00",
-            wed_end="17:00:00",
-            thu_start="9:00:00",
-            thu_end="17:00:00",
-            fri_start="9:00:00",
-            fri_end="17:00:00",
-        )
+        cls.schedule = create_schedule()
 
     def test_only_one_instance_is_allowed(self):
         with self.assertRaisesRegex(ValidationError, r"one instance allowed"):
-            Schedule.objects.create(
-                mon_start="9:00:00",
-                mon_end="17:00:00",
-                tue_start="9:00:00",
-                tue_end="17:00:00",
-                wed_start="9:00:00",
-                wed_end="17:00:00",
-                thu_start="9:00:00",
-                thu_end="17:00:00",
-                fri_start="9:00:00",
-                fri_end="17:00:00",
-            )
+            Schedule.objects.create()
 
     def test_deleting_instance_is_not_allowed(self):
         with self.assertRaises(PermissionDenied):
             self.schedule.delete()
 
     def test_monday_time_range_is_respected(self):
+        window = self.schedule.windows.get(weekday=1)
         with self.assertRaisesRegex(
-            ValidationError, r"mon_start(.*?)low bounded"
+            ValidationError, r"start_time(.*?)low bounded"
         ):
-            self.schedule.mon_start = "18:00:00"
-            self.schedule.save()
+            window.start_time = "18:00:00"
+            window.save()
 
-    def test_tuesday_time_range_is_respected(self):
-        with self.assertRaisesRegex(
-            ValidationError, r"tue_start(.*?)low bounded"
-        ):
-            self.schedule.tue_start = "18:00:00"
-            self.schedule.save()
-
-    def test_wednesday_time_range_is_respected(self):
-        with self.assertRaisesRegex(
-            ValidationError, r"wed_start(.*?)low bounded"
-        ):
-            self.schedule.wed_start = "18:00:00"
-            self.schedule.save()
-
-    def test_thursday_time_range_is_respected(self):
+    def test_friday_time_range_is_respected(self):
+        window = self.schedule.windows.get(weekday=5)
         with self.assertRaisesRegex(
-            ValidationError, r"thu_end(.*?)high bounded"
+            ValidationError, r"end_time(.*?)high bounded"
         ):
-            self.schedule.thu_start = "18:00:00"
-            self.schedule.save()
+            window.end_time = "8:00:00"
+            window.save()
 
-    def test_friday_time_range_is_respected(self):
+    def test_empty_time_range_is_not_allowed(self):
         with self.assertRaisesRegex(
-            ValidationError, r"fri_end(.*?)high bounded"
+            ValidationError, r"start_time(.*?)low bounded"
         ):
-            self.schedule.fri_start = "18:00:00"
-            self.schedule.save()
+            ScheduleWindow.objects.create(
+                schedule=self.schedule,
+                weekday=ScheduleWindow.Weekday.SUNDAY,
+                start_time="9:00:00",
+                end_time="9:00:00",
+            )
 
-    def test_sunday_time_range_required_if_day_is_on(self):
-        self.assertIsNone(self.schedule.sun_start)
-        self.assertIsNone(self.schedule.sun_end)
+    def test_multiple_windows_per_day_are_allowed(self):
+        ScheduleWindow.objects.create(
+            schedule=self.schedule,
+            weekday=ScheduleWindow.Weekday.MONDAY,
+            start_time="18:00:00",
+            end_time="20:00:00",
+        )
+        self.assertEqual(self.schedule.windows.filter(weekday=1).count(), 2)
 
-        with self.assertRaisesRegex(
-            ValidationError, r"sun_start(.*?)required"
-        ):
-            self.schedule.sun_off = False
-            self.schedule.save()
+    def test_days_without_windows_are_off(self):
+        self.assertFalse(self.schedule.windows.filter(weekday=0).exists())
+        self.assertFalse(self.schedule.windows.filter(weekday=6).exists())
 
-    def test_saturday_time_range_required_if_day_is_on(self):
-        self.assertIsNone(self.schedule.sat_start)
-        self.assertIsNone(self.schedule.sat_end)
 
-        with self.assertRaisesRegex(ValidationError, r"sat_end(.*?)required"):
-            self.schedule.sat_off = False
-            self.schedule.sat_start = "9:00:00"
-            self.schedule.save()
+class ScheduleWindowFormSetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.schedule = Schedule.objects.create()
+
+    def formset(self, *rows):
+        FormSet = inlineformset_factory(
+            Schedule,
+            ScheduleWindow,
+            formset=ScheduleWindowFormSet,
+            fields=("weekday", "start_time", "end_time"),
+        )
+        data = {
+            "windows-TOTAL_FORMS": str(len(rows)),
+            "windows-INITIAL_FORMS": "0",
+        }
+        for index, (weekday, start, end) in enumerate(rows):
+            data[f"windows-{index}-weekday"] = weekday
+            data[f"windows-{index}-start_time"] = start
+            data[f"windows-{index}-end_time"] = end
+        return FormSet(data, instance=self.schedule)
+
+    def test_overlapping_windows_of_a_day_are_rejected(self):
+        formset = self.formset(("0", "9:00", "12:00"), ("0", "11:00", "13:00"))
+        self.assertFalse(formset.is_valid())
+        self.assertIn("must not overlap", formset.non_form_errors()[0])
+
+    def test_missing_weekday_is_a_field_error(self):
+        formset = self.formset(("", "9:00", "12:00"), ("1", "9:00", "12:00"))
+        self.assertFalse(formset.is_valid())
+        self.assertIn("weekday", formset.forms[0].errors)
+        self.assertFalse(formset.non_form_errors())
 
 
 class EventTest(TestCase):
@@ -142,3 +144,35 @@ class EventTest(TestCase):
             booker_email="neo@matrix.io",
         )
         self.assertEqual(event.end_time, now + timedelta(minutes=30))
+
+    def test_overlapping_events(self):
+        now = timezone.now()
+        for minutes, duration in ((0, 60), (90, 15), (120, 30)):
+            Event.objects.create(
+                location_type="GMEET",
+                duration=duration,
+                start_time=now + timedelta(minutes=minutes),
+            )
+
+        def overlapping(start, end):
+            return sorted(
+                (event.start_time - now).seconds // 60
+                for event in Event.objects.overlapping(
+                    now + timedelta(minutes=start),
+                    now + timedelta(minutes=end),
+                )
+            )
+
+        self.assertEqual(overlapping(30, 100), [0, 90])
+        # touching events do not overlap
+        self.assertEqual(overlapping(60, 90), [])
+        self.assertEqual(overlapping(105, 125), [120])
+
+    @override_settings(SQLITE_RTREE=False)
+    def test_overlapping_events_use_the_range_index(self):
+        now = timezone.now()
+        plan = Event.objects.overlapping(
+            now, now + timedelta(hours=1)
+        ).explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("event_range_idx", plan)
@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+import pytz
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..lib import notifications
+from ..lib.availability import availability
+from ..lib.notifications import ChannelManager, NotificationSyncs
+from ..lib.sync import SyncResult
+from ..models import NotificationChannel
+from .stubs import CalendarStubServer
+
+
+# runs each sync on a thread of its own, like the pool, and waits for it
+class ThreadExecutor:
+    def submit(self, fn, *args):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fn, *args)
+        future.result()
+        return future
+
+
+# keeps submitted syncs until `run` is called
+class QueuedExecutor(ThreadExecutor):
+    def __init__(self):
+        self.queue = []
+
+    def submit(self, fn, *args):
+        self.queue.append((fn, args))
+
+    def run(self):
+        while self.queue:
+            fn, args = self.queue.pop(0)
+            super().submit(fn, *args)
+
+
+class FakeNotifier:
+    # posts notifications the way Google does, with the details in headers
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+        self.message_number = 0
+
+    def notify(self, state="exists", **overrides):
+        self.message_number += 1
+        headers = {
+            "HTTP_X_GOOG_CHANNEL_ID": self.channel.channel_id,
+            "HTTP_X_GOOG_CHANNEL_TOKEN": self.channel.token,
+            "HTTP_X_GOOG_RESOURCE_ID": self.channel.resource_id,
+            "HTTP_X_GOOG_RESOURCE_STATE": state,
+            "HTTP_X_GOOG_MESSAGE_NUMBER": str(self.message_number),
+        }
+        headers.update(overrides)
+        return self.client.post(
+            reverse("scheduler:calendar_notification"), **headers
+        )
+
+
+class CalendarNotificationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.local.clear()
+        self.channel = NotificationChannel.objects.create(
+            channel_id="channel-1",
+            resource_id="resource-1",
+            token="secret-token",
+            expiration=timezone.now() + timedelta(days=7),
+        )
+        self.notifier = FakeNotifier(self.client, self.channel)
+
+        self.fetches = []
+        patcher = mock.patch.object(
+            availability,
+            "fetch",
+            lambda *window: self.fetches.append(window) or [],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sync = mock.Mock()
+        patcher = mock.patch.object(
+            notifications, "CalendarSync", return_value=self.sync
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.use_executor(ThreadExecutor())
+
+    def use_executor(self, executor):
+        patcher = mock.patch.object(
+            notifications,
+            "notification_syncs",
+            NotificationSyncs(executor),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def warm(self, *days):
+        for day in days:
+            start = pytz.utc.localize(datetime(2022, 1, day))
+            availability.get_busy(start, start + timedelta(days=1))
+
+    def test_sync_message_is_acknowledged_without_syncing(self):
+        response = self.notifier.notify(state="sync")
+        self.assertEqual(response.status_code, 200)
+        self.sync.run.assert_not_called()
+
+    def test_invalid_token_is_rejected(self):
+        response = self.notifier.notify(HTTP_X_GOOG_CHANNEL_TOKEN="forged")
+        self.assertEqual(response.status_code, 403)
+        self.sync.run.assert_not_called()
+
+    def test_unknown_channel_is_rejected(self):
+        response = self.notifier.notify(HTTP_X_GOOG_CHANNEL_ID="unknown")
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_affected_day_buckets_are_invalidated(self):
+        self.warm(10, 11, 12)
+        self.sync.run.return_value = SyncResult(
+            False,
+            [
+                (
+                    datetime(2022, 1, 11, 9, tzinfo=pytz.utc),
+                    datetime(2022, 1, 11, 10, tzinfo=pytz.utc),
+                )
+            ],
+        )
+        response = self.notifier.notify()
+        self.assertEqual(response.status_code, 200)
+
+        self.warm(10, 11, 12)
+        self.assertEqual(len(self.fetches), 4)
+        self.assertEqual(self.fetches[-1][0], "2022-01-11T00:00:00+00:00")
+
+    def test_notifications_are_acknowledged_before_syncing(self):
+        executor = QueuedExecutor()
+        self.use_executor(executor)
+        for _ in range(3):
+            response = self.notifier.notify()
+            self.assertEqual(response.status_code, 200)
+        self.sync.run.assert_not_called()
+
+        # the sync still queued covers the later notifications
+        self.assertEqual(len(executor.queue), 1)
+        executor.run()
+        self.sync.run.assert_called_once_with()
+
+        # once it started, a new notification needs another sync
+        self.notifier.notify()
+        executor.run()
+        self.assertEqual(self.sync.run.call_count, 2)
+
+    def test_failed_sync_drops_every_bucket(self):
+        self.warm(10)
+        self.sync.run.side_effect = RuntimeError("boom")
+        self.notifier.notify()
+        self.warm(10)
+        self.assertEqual(len(self.fetches), 2)
+
+
+class CalendarWatchCommandTest(TestCase):
+    def setUp(self):
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.stub.route(
+            "POST",
+            "/calendars/primary/events/watch",
+            lambda query, body: (
+                200,
+                {
+                    "id": body["id"],
+                    "resourceId": "resource-1",
+                    "expiration": "1700000000000",
+                },
+            ),
+        )
+        self.stub.route(
+            "POST", "/channels/stop", lambda query, body: (200, {})
+        )
+        self.manager = ChannelManager(service=self.stub.build_service())
+        patcher = mock.patch(
+            "scheduler.management.commands.calendarwatch.ChannelManager",
+            return_value=self.manager,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, *args):
+        out = StringIO()
+        call_command(
+            "calendarwatch",
+            *args,
+            "--address",
+            "https://bookme.example.com/notifications/calendar/",
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_register_stores_channel(self):
+        self.call("register")
+        channel = NotificationChannel.objects.get()
+        self.assertEqual(channel.resource_id, "resource-1")
+        self.assertEqual(channel.expiration.date(), date(2023, 11, 14))
+        _, _, _, body = self.stub.requests[0]
+        self.assertEqual(body["token"], channel.token)
+        self.assertEqual(body["type"], "web_hook")
+
+    def test_renew_replaces_expiring_channels(self):
+        self.call("register")
+        old = NotificationChannel.objects.get()
+        self.assertIn("1 channel(s) renewed", self.call("renew"))
+        new = NotificationChannel.objects.get()
+        self.assertNotEqual(new.channel_id, old.channel_id)
+        self.assertEqual(self.stub.requests[-1][1], "/channels/stop")
+
+    def test_stop_removes_channels(self):
+        self.call("register")
+        self.call("stop")
+        self.assertFalse(NotificationChannel.objects.exists())
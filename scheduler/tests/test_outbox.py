@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+import pytz
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..lib.availability import AvailabilityCache
+from ..lib.booking import reserve
+from ..lib.outbox import OutboxWorker, retry_delay
+from ..lib.planner import EventPlanner
+from ..models import Event, OutboxMessage, Profile
+from .stubs import CalendarStubServer
+from .test_availability import FakeCalendar
+
+START = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+
+
+class OutboxWorkerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.status = 200
+        self.stub.route(
+            "POST",
+            "/calendars/primary/events",
+            lambda query, body: (self.status, {"id": body["id"]}),
+        )
+        self.worker = OutboxWorker(
+            planner=EventPlanner(service=self.stub.build_service())
+        )
+
+        Profile.objects.create(
+            username="owner",
+            email="owner@example.com",
+            phone_number="+12025550123",
+        )
+        self.event = reserve(
+            Event(
+                location_type=Event.LocationType.GOOGLE_MEET,
+                duration=30,
+                start_time=START,
+                booker_name="Ada",
+                booker_email="ada@example.com",
+            )
+        )
+
+    def test_booking_queues_a_message(self):
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.event, self.event)
+        self.assertIsNone(message.sent_at)
+
+    def test_event_ids_make_inserts_idempotent(self):
+        result = self.worker.run_once()
+        self.assertEqual((result.sent, result.failed), (1, 0))
+
+        method, path, query, body = self.stub.requests[0]
+        self.assertEqual(body["id"], self.event.id.hex)
+        self.assertEqual(
+            body["conferenceData"]["createRequest"]["requestId"],
+            str(self.event.id),
+        )
+        self.assertEqual(body["start"]["dateTime"], START.isoformat())
+        self.assertEqual(
+            [guest["email"] for guest in body["attendees"]],
+            ["owner@example.com", "ada@example.com"],
+        )
+        self.assertEqual(body["summary"], "Google Meet with Ada")
+        self.assertIsNotNone(OutboxMessage.objects.get().sent_at)
+
+        # sent messages are not delivered again
+        self.assertEqual(self.worker.run_once().sent, 0)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_existing_event_counts_as_sent(self):
+        self.status = 409
+        self.assertEqual(self.worker.run_once().sent, 1)
+        self.assertIsNotNone(OutboxMessage.objects.get().sent_at)
+
+    def test_failures_are_retried_with_backoff(self):
+        self.status = 500
+        with self.assertLogs("scheduler.lib.outbox", "WARNING"):
+            result = self.worker.run_once()
+        self.assertEqual(result.failed, 1)
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("500", message.last_error)
+        self.assertGreater(message.available_at, timezone.now())
+
+        # nothing is claimed before the retry delay
+        self.assertEqual(self.worker.run_once().failed, 0)
+
+        self.status = 200
+        later = timezone.now() + timedelta(minutes=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(self.worker.run_once().sent, 1)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    def test_gives_up_after_max_attempts(self):
+        self.status = 500
+        with self.assertLogs("scheduler.lib.outbox", "ERROR"):
+            self.worker.run_once()
+        self.assertFalse(
+            self.worker.pending(timezone.now() + timedelta(days=1))
+        )
+
+    def test_claimed_messages_are_hidden_from_other_workers(self):
+        now = timezone.now()
+        self.assertEqual(len(self.worker.claim(now)), 1)
+        self.assertEqual(len(OutboxWorker().claim(now)), 0)
+
+    def test_retry_delay(self):
+        self.assertEqual(
+            [retry_delay(n).total_seconds() for n in range(1, 5)],
+            [30, 60, 120, 240],
+        )
+        self.assertEqual(retry_delay(20), timedelta(hours=1))
+
+    def test_command(self):
+        out = StringIO()
+        with mock.patch(
+            "scheduler.management.commands.processoutbox.OutboxWorker",
+            lambda batch_size: self.worker,
+        ):
+            call_command("processoutbox", stdout=out)
+        self.assertEqual(out.getvalue(), "1 event(s) sent, 0 failed.\n")
+
+    def test_command_invalidates_the_buckets_of_every_worker(self):
+        # a web worker, sharing nothing with the command but the cache
+        worker = AvailabilityCache(FakeCalendar([]))
+        window = (START, START + timedelta(minutes=30))
+        worker.get_busy(*window)
+
+        with mock.patch(
+            "scheduler.management.commands.processoutbox.OutboxWorker",
+            lambda batch_size: self.worker,
+        ):
+            call_command("processoutbox", stdout=StringIO())
+        worker.get_busy(*window)
+        self.assertEqual(len(worker.fetch.calls), 2)
@@ -0,0 +1,161 @@
+from datetime import date, datetime
+from io import StringIO
+from unittest import mock
+
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..lib import metrics
+from ..lib.availability import AvailabilityCache
+from ..lib.prefetch import Prefetcher, neighbour_days, prefetcher
+from .stubs import ImmediateExecutor
+from .test_availability import FakeCalendar, busy_event
+from .test_views import PickerTestCase
+
+
+def utc_window(first_day, last_day):
+    time_min = pytz.utc.localize(datetime(2022, 1, first_day))
+    return time_min, pytz.utc.localize(datetime(2022, 1, last_day + 1))
+
+
+class NeighbourDaysTest(SimpleTestCase):
+    def test_adjacent_days_and_rest_of_the_week(self):
+        # Tuesday, in the week from Sunday the 9th to Saturday the 15th
+        self.assertEqual(
+            neighbour_days(date(2022, 1, 11)),
+            (date(2022, 1, 9), date(2022, 1, 15)),
+        )
+        # Saturday still includes the following Sunday
+        self.assertEqual(
+            neighbour_days(date(2022, 1, 15)),
+            (date(2022, 1, 9), date(2022, 1, 16)),
+        )
+
+    @override_settings(
+        AVAILABILITY_PREFETCH_WEEK=False, AVAILABILITY_PREFETCH_AHEAD=3
+    )
+    def test_without_the_week(self):
+        self.assertEqual(
+            neighbour_days(date(2022, 1, 11)),
+            (date(2022, 1, 10), date(2022, 1, 14)),
+        )
+
+
+# prefetches release their database connection when done
+class PrefetcherTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.calendar = FakeCalendar(
+            [
+                busy_event(
+                    datetime(2022, 1, 11, 9, tzinfo=pytz.utc),
+                    datetime(2022, 1, 11, 10, tzinfo=pytz.utc),
+                )
+            ]
+        )
+        self.availability = AvailabilityCache(self.calendar)
+        self.prefetcher = Prefetcher(self.availability, ImmediateExecutor())
+
+    def test_missing_days_are_warmed_in_a_single_fetch(self):
+        self.availability.get_busy(*utc_window(11, 11))
+        self.prefetcher.schedule(*utc_window(10, 13))
+
+        self.assertEqual(
+            self.calendar.calls[-1],
+            ("2022-01-10T00:00:00+00:00", "2022-01-14T00:00:00+00:00"),
+        )
+        self.availability.get_busy(*utc_window(10, 13))
+        self.assertEqual(len(self.calendar.calls), 2)
+
+        values = metrics.snapshot()
+        self.assertEqual(values["prefetch_scheduled"], 3)
+        self.assertEqual(values["prefetch_skipped"], 1)
+        self.assertEqual(values["prefetch_completed"], 3)
+
+    def test_cached_days_are_not_scheduled(self):
+        self.availability.get_busy(*utc_window(10, 13))
+        self.assertIsNone(self.prefetcher.schedule(*utc_window(10, 13)))
+        self.assertEqual(len(self.calendar.calls), 1)
+
+    def test_hits_are_counted_once_per_prefetched_day(self):
+        self.prefetcher.schedule(*utc_window(10, 12))
+        self.prefetcher.record_hits(*utc_window(11, 11))
+        self.prefetcher.record_hits(*utc_window(11, 11))
+        self.prefetcher.record_hits(*utc_window(13, 13))
+        self.assertEqual(metrics.snapshot()["prefetch_hits"], 1)
+
+    @override_settings(AVAILABILITY_PREFETCH_MAX_PENDING=2)
+    def test_full_queue_drops_prefetches(self):
+        self.assertIsNone(self.prefetcher.schedule(*utc_window(10, 12)))
+        self.assertEqual(self.calendar.calls, [])
+        self.assertEqual(metrics.snapshot()["prefetch_dropped"], 3)
+
+    def test_failures_are_counted_and_released(self):
+        self.calendar.events = None
+        with self.assertLogs("scheduler.lib.prefetch", "ERROR"):
+            self.prefetcher.schedule(*utc_window(10, 10))
+        self.assertEqual(metrics.snapshot()["prefetch_failed"], 1)
+        self.assertEqual(self.prefetcher._pending, set())
+
+    @override_settings(AVAILABILITY_PREFETCH_WORKERS=0)
+    def test_disabled_without_workers(self):
+        prefetcher = Prefetcher(self.availability)
+        self.assertIsNone(prefetcher.schedule(*utc_window(10, 10)))
+        self.assertEqual(self.calendar.calls, [])
+
+
+class TimePickerPrefetchTest(PickerTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            prefetcher, "_executor", ImmediateExecutor()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def url(self, day):
+        return reverse(
+            "scheduler:time_picker",
+            kwargs={"event": "google-meet-60-min", "date": day},
+        )
+
+    def test_next_day_is_served_from_the_prefetch(self):
+        self.client.get(self.url("20220111"))
+        # the selected day, then the rest of its week from today on
+        self.assertEqual(
+            self.calendar.calls,
+            [
+                ("2022-01-11T00:00:00+00:00", "2022-01-12T00:00:00+00:00"),
+                ("2022-01-10T00:00:00+00:00", "2022-01-16T00:00:00+00:00"),
+            ],
+        )
+
+        self.client.get(self.url("20220112"))
+        self.assertEqual(len(self.calendar.calls), 2)
+        self.assertEqual(metrics.snapshot()["prefetch_hits"], 1)
+
+    def test_stats_command_reports_the_hit_rate(self):
+        self.client.get(self.url("20220111"))
+        self.client.get(self.url("20220112"))
+
+        out, err = StringIO(), StringIO()
+        call_command("schedulerstats", "--reset", stdout=out, stderr=err)
+        self.assertIn("prefetch hit rate: 20.0%", out.getvalue())
+        self.assertEqual(metrics.snapshot()["prefetch_hits"], 0)
+        # the test cache is process-local
+        self.assertIn("local to this process", err.getvalue())
+
+    @override_settings(CACHES=settings.SHIPPED_CACHES)
+    def test_stats_command_reads_counters_from_the_shared_cache(self):
+        # as incremented by a web worker
+        metrics.REGISTRY["prefetch_hits"].incr(3)
+
+        out, err = StringIO(), StringIO()
+        call_command("schedulerstats", stdout=out, stderr=err)
+        self.assertRegex(out.getvalue(), r"prefetch_hits +3 ")
+        self.assertEqual(err.getvalue(), "")
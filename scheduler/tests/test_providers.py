@@ -0,0 +1,113 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..lib.providers import (
+    EVENTS_FIELDS,
+    CalendarProviderError,
+    EventListProvider,
+    FreeBusyProvider,
+    get_provider,
+)
+from .stubs import CalendarStubServer
+
+TIME_MIN = "2022-01-10T00:00:00+00:00"
+TIME_MAX = "2022-01-11T00:00:00+00:00"
+
+
+class ProviderTest(SimpleTestCase):
+    def setUp(self):
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.service = self.stub.build_service()
+
+    def test_freebusy_provider_returns_busy_blocks(self):
+        self.stub.route(
+            "POST",
+            "/freeBusy",
+            lambda query, body: (
+                200,
+                {
+                    "calendars": {
+                        "primary": {
+                            "busy": [
+                                {
+                                    "start": "2022-01-10T09:00:00Z",
+                                    "end": "2022-01-10T10:00:00Z",
+                                }
+                            ]
+                        }
+                    }
+                },
+            ),
+        )
+        busy = FreeBusyProvider(service=self.service).fetch(TIME_MIN, TIME_MAX)
+        self.assertEqual(
+            busy,
+            [
+                {
+                    "start": {"dateTime": "2022-01-10T09:00:00Z"},
+                    "end": {"dateTime": "2022-01-10T10:00:00Z"},
+                }
+            ],
+        )
+        _, _, _, body = self.stub.requests[0]
+        self.assertEqual(body["items"], [{"id": "primary"}])
+        self.assertEqual(body["timeMin"], TIME_MIN)
+
+    def test_freebusy_provider_raises_calendar_errors(self):
+        self.stub.route(
+            "POST",
+            "/freeBusy",
+            lambda query, body: (
+                200,
+                {
+                    "calendars": {
+                        "primary": {"errors": [{"reason": "notFound"}]}
+                    }
+                },
+            ),
+        )
+        with self.assertRaises(CalendarProviderError):
+            FreeBusyProvider(service=self.service).fetch(TIME_MIN, TIME_MAX)
+
+    def test_event_list_provider_uses_lean_paged_requests(self):
+        pages = {
+            None: {
+                "items": [
+                    {
+                        "start": {"dateTime": "2022-01-10T09:00:00Z"},
+                        "end": {"dateTime": "2022-01-10T10:00:00Z"},
+                    }
+                ],
+                "nextPageToken": "page-2",
+            },
+            "page-2": {
+                "items": [
+                    {
+                        "start": {"dateTime": "2022-01-10T12:00:00Z"},
+                        "end": {"dateTime": "2022-01-10T13:00:00Z"},
+                    }
+                ]
+            },
+        }
+        self.stub.route(
+            "GET",
+            "/calendars/primary/events",
+            lambda query, body: (200, pages[query.get("pageToken")]),
+        )
+        events = EventListProvider(service=self.service).fetch(
+            TIME_MIN, TIME_MAX
+        )
+        self.assertEqual(len(events), 2)
+
+        _, _, query, _ = self.stub.requests[0]
+        self.assertEqual(query["fields"], EVENTS_FIELDS)
+        self.assertEqual(query["singleEvents"], "true")
+        self.assertEqual(query["maxResults"], "2500")
+        self.assertEqual(len(self.stub.requests), 2)
+
+    @override_settings(CALENDAR_AVAILABILITY_PROVIDER="events")
+    def test_provider_is_selected_from_settings(self):
+        self.assertIsInstance(get_provider(), EventListProvider)
+        self.assertIsInstance(get_provider("freebusy"), FreeBusyProvider)
+        with self.assertRaises(ValueError):
+            get_provider("carrier-pigeon")
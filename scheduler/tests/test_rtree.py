@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
+
+import pytz
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..lib import rtree
+from ..models import BusyInterval, Event
+
+START = datetime(2022, 1, 11, 10, tzinfo=pytz.utc)
+TABLE = BusyInterval._meta.db_table
+
+
+def at(minutes, seconds=0):
+    return START + timedelta(minutes=minutes, seconds=seconds)
+
+
+# runs the statements of `rtree.create` and `rtree.drop` in the test's
+# transaction
+class CursorEditor:
+    connection = connection
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite only")
+class IntervalRTreeTest(TestCase):
+    def setUp(self):
+        rtree.reset()
+        self.addCleanup(rtree.reset)
+
+    def busy(self, start, end):
+        return BusyInterval.objects.create(
+            event_id=f"{start}-{end}", start_time=start, end_time=end
+        )
+
+    def overlapping(self, start, end):
+        return sorted(
+            BusyInterval.objects.overlapping(start, end).values_list(
+                "event_id", flat=True
+            )
+        )
+
+    def assertSameAsIndexed(self, start, end):
+        found = self.overlapping(start, end)
+        with override_settings(SQLITE_RTREE=False):
+            self.assertEqual(found, self.overlapping(start, end))
+        return found
+
+    def test_lookups_go_through_the_rtree(self):
+        self.assertTrue(
+            rtree.rtree_enabled("default", "scheduler_busyinterval")
+        )
+        plan = BusyInterval.objects.overlapping(START, at(60)).explain()
+        self.assertIn("scheduler_busyinterval_rtree", plan)
+        # events are bounded in length, so they keep their B-tree index
+        plan = Event.objects.overlapping(START, at(60)).explain()
+        self.assertIn("event_range_idx", plan)
+
+    def test_statistics_favour_the_rtree_over_the_calendar_index(self):
+        for day in range(100):
+            self.busy(at(day * 1440), at(day * 1440 + 60))
+        rtree.analyze("default", "scheduler_busyinterval")
+        plan = (
+            BusyInterval.objects.filter(calendar_id="primary")
+            .overlapping(START, at(60))
+            .explain()
+        )
+        self.assertIn("scheduler_busyinterval_rtree", plan)
+
+    def test_same_results_as_indexed_lookups(self):
+        # a long interval and boundaries within the same minute
+        self.busy(at(-3 * 1440), at(3 * 1440))
+        self.busy(at(30, 15.5), at(30, 45))
+        self.busy(at(60), at(90))
+
+        for start, end, expected in (
+            (at(0), at(30, 15.5), 1),
+            (at(0), at(30, 15.6), 2),
+            (at(30, 45), at(60), 1),
+            (at(30, 44.9), at(60, 0.1), 3),
+            (at(2 * 1440), at(2 * 1440 + 1), 1),
+            (at(4 * 1440), at(5 * 1440), 0),
+        ):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(
+                    len(self.assertSameAsIndexed(start, end)), expected
+                )
+
+    def test_triggers_follow_updates_and_deletes(self):
+        interval = self.busy(at(0), at(30))
+        interval.start_time, interval.end_time = at(120), at(150)
+        interval.save()
+        self.assertEqual(self.overlapping(at(0), at(60)), [])
+        self.assertEqual(len(self.overlapping(at(120), at(121))), 1)
+
+        interval.delete()
+        self.assertEqual(self.overlapping(at(120), at(121)), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM scheduler_busyinterval_rtree")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_sqlite_without_the_rtree_module(self):
+        rtree.drop(CursorEditor(), TABLE)
+        with mock.patch.object(rtree, "compile_options", return_value=set()):
+            self.assertFalse(rtree.supported(connection))
+            rtree.create(CursorEditor(), TABLE)
+        self.assertFalse(rtree.rtree_enabled("default", TABLE))
+
+        self.busy(at(0), at(60))
+        self.assertEqual(len(self.overlapping(at(30), at(90))), 1)
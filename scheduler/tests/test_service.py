@@ -0,0 +1,206 @@
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from ..lib import service as service_module
+from ..lib.service import CalendarService, utcnow
+
+
+class FakeCredentials:
+    def __init__(self, expires_in):
+        self.expiry = utcnow() + expires_in
+        self.refresh_token = "refresh-token"
+        self.refresh_calls = 0
+
+    @property
+    def valid(self):
+        return self.expiry > utcnow()
+
+    def refresh(self, request):
+        self.refresh_calls += 1
+        self.expiry = utcnow() + timedelta(hours=1)
+
+    def to_json(self):
+        return "{}"
+
+
+class CalendarServiceTest(SimpleTestCase):
+    def setUp(self):
+        secrets = tempfile.TemporaryDirectory()
+        self.addCleanup(secrets.cleanup)
+        self.secrets_path = Path(secrets.name)
+        settings = override_settings(SECRETS_PATH=self.secrets_path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.holder = CalendarService()
+        patcher = mock.patch.object(service_module, "build")
+        self.build = patcher.start()
+        self.build.side_effect = lambda *args, **kwargs: object()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(CalendarService, "_save")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_credentials(self, creds):
+        patcher = mock.patch.object(
+            CalendarService, "_load_credentials", return_value=creds
+        )
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_service_is_built_once_per_thread_from_static_discovery(self):
+        self.use_credentials(FakeCredentials(timedelta(hours=1)))
+        first = self.holder.get()
+        self.assertIs(self.holder.get(), first)
+        self.assertEqual(self.build.call_count, 1)
+        self.assertTrue(self.build.call_args.kwargs["static_discovery"])
+        self.assertEqual(self.load.call_count, 1)
+
+        services = []
+        thread = threading.Thread(
+            target=lambda: services.append(self.holder.get())
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(services[0], first)
+        self.assertEqual(self.load.call_count, 1)
+
+    def test_fresh_credentials_are_not_refreshed(self):
+        creds = FakeCredentials(timedelta(hours=1))
+        self.use_credentials(creds)
+        self.holder.get()
+        self.holder.get()
+        self.assertEqual(creds.refresh_calls, 0)
+
+    def test_credentials_near_expiry_are_refreshed_once(self):
+        creds = FakeCredentials(timedelta(seconds=30))
+        self.use_credentials(creds)
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            self.holder.credentials()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(creds.refresh_calls, 1)
+
+    def write_token(self, mtime):
+        token_file = self.secrets_path / "token.json"
+        token_file.write_text("{}")
+        os.utime(token_file, ns=(mtime, mtime))
+
+    def test_rewritten_token_is_reloaded(self):
+        self.use_credentials(FakeCredentials(timedelta(hours=1)))
+        self.write_token(1_000_000_000)
+        first = self.holder.get()
+        self.holder.get()
+        self.assertEqual(self.load.call_count, 1)
+
+        self.load.return_value = FakeCredentials(timedelta(hours=1))
+        self.write_token(2_000_000_000)
+        service = self.holder.get()
+        self.assertEqual(self.load.call_count, 2)
+        self.assertIs(self.holder.credentials(), self.load.return_value)
+        # the service is rebuilt around the new credentials
+        self.assertIsNot(service, first)
+
+    @override_settings(CALENDAR_TOKEN_DAEMON=True)
+    def test_daemon_refreshes_valid_tokens(self):
+        creds = FakeCredentials(timedelta(seconds=30))
+        self.use_credentials(creds)
+        self.holder.credentials()
+        self.assertEqual(creds.refresh_calls, 0)
+
+        # expired, the daemon is not keeping up
+        creds.expiry = utcnow() - timedelta(seconds=1)
+        self.holder.credentials()
+        self.assertEqual(creds.refresh_calls, 1)
+
+    def test_refresh_stored(self):
+        creds = FakeCredentials(timedelta(minutes=5))
+        self.write_token(1_000_000_000)
+        with mock.patch.object(
+            service_module.Credentials,
+            "from_authorized_user_file",
+            return_value=creds,
+        ), mock.patch.object(
+            service_module.tokenstore,
+            "write_atomic",
+            wraps=service_module.tokenstore.write_atomic,
+        ) as write:
+            self.holder.refresh_stored(timedelta(minutes=1))
+            self.assertEqual(creds.refresh_calls, 0)
+
+            expiry = self.holder.refresh_stored(timedelta(minutes=10))
+        self.assertEqual(creds.refresh_calls, 1)
+        self.assertEqual(expiry, creds.expiry)
+        write.assert_called_once()
+        self.assertEqual(
+            sorted(path.name for path in self.secrets_path.iterdir()),
+            ["token.json", "token.json.lock"],
+        )
+
+    def test_token_without_expiry_is_refreshed(self):
+        creds = FakeCredentials(timedelta(hours=1))
+        creds.expiry = None
+        self.write_token(1_000_000_000)
+        with mock.patch.object(
+            FakeCredentials, "valid", True
+        ), mock.patch.object(
+            service_module.Credentials,
+            "from_authorized_user_file",
+            return_value=creds,
+        ):
+            expiry = self.holder.refresh_stored(timedelta(minutes=10))
+        self.assertEqual(creds.refresh_calls, 1)
+        self.assertIsNotNone(expiry)
+
+    def test_daemon_waits_for_a_missing_token(self):
+        out, err = StringIO(), StringIO()
+        with mock.patch(
+            "time.sleep", side_effect=[None, KeyboardInterrupt]
+        ) as sleep:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "calendartoken",
+                    "daemon",
+                    "--interval",
+                    "30",
+                    stdout=out,
+                    stderr=err,
+                )
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(out.getvalue(), "")
+        self.assertIn("Token not found", err.getvalue())
+
+    def test_daemon_command(self):
+        out = StringIO()
+        expiry = datetime(2022, 1, 10, 9)
+        with mock.patch.object(
+            service_module.calendar_service,
+            "refresh_stored",
+            return_value=expiry,
+        ) as refresh, mock.patch(
+            "time.sleep", side_effect=KeyboardInterrupt
+        ) as sleep:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "calendartoken", "daemon", "--interval", "30", stdout=out
+                )
+        refresh.assert_called_once_with(timedelta(minutes=10))
+        sleep.assert_called_once_with(30)
+        self.assertEqual(
+            out.getvalue(), "Token valid until 2022-01-10 09:00:00 UTC.\n"
+        )
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from datetime import date, datetime
+from io import StringIO
+
+import pytz
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from ..lib import metrics
+from ..lib.availability import AvailabilityCache
+from ..lib.breaker import calendar_breaker
+from ..lib.singleflight import SingleFlight
+from .test_availability import busy_event
+
+WINDOW = (
+    datetime(2022, 1, 10, tzinfo=pytz.utc),
+    datetime(2022, 1, 11, tzinfo=pytz.utc),
+)
+EVENTS = [busy_event(datetime(2022, 1, 10, 9, tzinfo=pytz.utc), WINDOW[1])]
+
+
+class BlockingCalendar:
+    # answers once released, so that callers pile up in the meantime
+    def __init__(self, events=EVENTS):
+        self.events = events
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, time_lower, time_upper):
+        self.calls.append((time_lower, time_upper))
+        self.release.wait(5)
+        return self.events
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.flights = SingleFlight()
+
+    def test_concurrent_calls_share_one_execution(self):
+        calendar = BlockingCalendar()
+        results = []
+
+        def call():
+            results.append(self.flights.do("key", calendar, "a", "b"))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # the other callers join the call in flight, or the test fails
+        deadline = time.monotonic() + 5
+        while metrics.snapshot()["singleflight_collapsed"] < 4:
+            if time.monotonic() > deadline:
+                calendar.release.set()
+                self.fail("Concurrent calls did not join the one in flight")
+            time.sleep(0.001)
+        calendar.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calendar.calls), 1)
+        self.assertEqual(results, [EVENTS] * 5)
+
+    def test_errors_are_shared_and_not_remembered(self):
+        def fail():
+            raise TimeoutError("timed out")
+
+        with self.assertRaises(TimeoutError):
+            self.flights.do("key", fail)
+        self.assertEqual(self.flights.do("key", lambda: 1), 1)
+
+    def test_async_calls_share_one_task(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return EVENTS
+
+        async def run():
+            return await asyncio.gather(
+                *(self.flights.ado("key", fetch) for _ in range(5))
+            )
+
+        self.assertEqual(async_to_sync(run)(), [EVENTS] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(metrics.snapshot()["singleflight_collapsed"], 4)
+
+    def test_async_caller_giving_up_does_not_cancel_the_call(self):
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return EVENTS
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.flights.ado("key", fetch), 0.01)
+            return await self.flights.ado("key", fetch)
+
+        self.assertEqual(async_to_sync(run)(), EVENTS)
+        self.assertEqual(metrics.snapshot()["singleflight_collapsed"], 1)
+
+
+class CoalescedAvailabilityTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        calendar_breaker.reset()
+        self.addCleanup(calendar_breaker.reset)
+
+    def test_identical_async_lookups_share_one_fetch(self):
+        calls = []
+
+        async def afetch(time_lower, time_upper):
+            calls.append((time_lower, time_upper))
+            await asyncio.sleep(0.01)
+            return EVENTS
+
+        availability = AvailabilityCache(None, afetch)
+
+        async def run():
+            return await asyncio.gather(
+                *(availability.alookup(*WINDOW) for _ in range(10))
+            )
+
+        lookups = async_to_sync(run)()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({len(lookup.busy) for lookup in lookups}, {1})
+        values = metrics.snapshot()
+        self.assertEqual(values["singleflight_collapsed"], 9)
+        self.assertEqual(values["availability_fetches"], 1)
+
+        out = StringIO()
+        call_command("schedulerstats", stdout=out, stderr=StringIO())
+        self.assertIn("collapsed fetch rate: 90.0%", out.getvalue())
+
+    def test_other_calendars_and_windows_are_not_shared(self):
+        availability = AvailabilityCache(None)
+        other = AvailabilityCache(None, calendar_id="other")
+        key = availability._flight_key(0, [date(2022, 1, 10)])
+        self.assertNotEqual(key, other._flight_key(0, [date(2022, 1, 10)]))
+        self.assertNotEqual(
+            key, availability._flight_key(0, [date(2022, 1, 11)])
+        )
+
+    @override_settings(AVAILABILITY_SHARED_FLIGHTS=True)
+    def test_workers_wait_for_a_fetch_in_another_worker(self):
+        calendar = BlockingCalendar()
+        worker = AvailabilityCache(calendar)
+        # a second worker, with its own process-local state
+        other = AvailabilityCache(BlockingCalendar())
+
+        thread = threading.Thread(target=worker.lookup, args=WINDOW)
+        thread.start()
+        while not calendar.calls:
+            pass
+        waiter = threading.Thread(target=other.lookup, args=WINDOW)
+        waiter.start()
+        calendar.release.set()
+        thread.join()
+        waiter.join()
+
+        self.assertEqual(other.fetch.calls, [])
+        self.assertEqual(len(other.lookup(*WINDOW).busy), 1)
+        self.assertEqual(
+            metrics.snapshot()["availability_collapsed_shared"], 1
+        )
+        # the lock is released once the buckets are stored
+        self.assertIsNone(cache.get(worker._flight_key(0, [WINDOW[0].date()])))
+
+    @override_settings(AVAILABILITY_SHARED_FLIGHTS=True)
+    def test_failed_fetch_in_another_worker_is_retried(self):
+        calendar = BlockingCalendar()
+        availability = AvailabilityCache(calendar)
+        calendar.release.set()
+        key = availability._flight_key(
+            availability._generation(), [WINDOW[0].date()]
+        )
+        # held by a worker that gives up without storing anything
+        cache.add(key, True)
+        threading.Timer(0.1, cache.delete, args=[key]).start()
+
+        self.assertEqual(len(availability.lookup(*WINDOW).busy), 1)
+        self.assertEqual(len(calendar.calls), 1)
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta
+from unittest import mock, skipIf
+
+import pytz
+from django.test import SimpleTestCase
+
+from ..lib import slotgrid
+from ..lib.intervals import IntervalSet, iter_available_slots
+
+
+def random_busy(rng, start, days):
+    intervals = []
+    for _ in range(rng.randint(0, 40 * days)):
+        busy_start = start + timedelta(
+            minutes=rng.randrange(-120, days * 24 * 60, 5)
+        )
+        busy_end = busy_start + timedelta(minutes=rng.randrange(5, 240, 5))
+        intervals.append((busy_start, busy_end))
+    return IntervalSet(intervals)
+
+
+@skipIf(slotgrid.np is None, "numpy is not installed")
+class NumpySlotGridTest(SimpleTestCase):
+    def test_matches_pure_python_sweep_over_many_days(self):
+        rng = random.Random(42)
+        start = pytz.timezone("Asia/Kolkata").localize(datetime(2022, 3, 1))
+        for days in (1, 7, 60):
+            end = start + timedelta(days=days)
+            busy = random_busy(rng, start, days)
+            for duration in (15, 30, 45, 60):
+                now = start + timedelta(minutes=rng.randrange(-60, 900))
+                self.assertEqual(
+                    slotgrid.find_available_slots(
+                        start, end, duration, busy, now
+                    ),
+                    list(
+                        iter_available_slots(start, end, duration, busy, now)
+                    ),
+                )
+
+    def test_slots_containing_busy_time_are_skipped(self):
+        start = datetime(2022, 3, 1, 9, tzinfo=pytz.utc)
+        busy = IntervalSet(
+            [(start + timedelta(minutes=75), start + timedelta(minutes=90))]
+        )
+        self.assertEqual(
+            slotgrid.find_available_slots(
+                start, start + timedelta(hours=3), 60, busy
+            ),
+            [start, start + timedelta(hours=2)],
+        )
+
+    def test_windows_are_evaluated_together(self):
+        rng = random.Random(7)
+        zone = pytz.timezone("America/New_York")
+        # local days around the spring DST transition
+        days = [
+            (
+                zone.localize(datetime(2022, 3, day)),
+                zone.localize(datetime(2022, 3, day + 1)),
+            )
+            for day in range(10, 17)
+        ]
+        busy = random_busy(rng, days[0][0], 7)
+        for duration in (15, 30, 45, 60):
+            now = days[0][0] + timedelta(minutes=rng.randrange(0, 3000))
+            self.assertEqual(
+                slotgrid.has_available_slots(days, duration, busy, now),
+                [
+                    bool(
+                        slotgrid.find_available_slots(
+                            start, end, duration, busy, now
+                        )
+                    )
+                    for start, end in days
+                ],
+            )
+
+    def test_window_shorter_than_duration_has_no_slots(self):
+        start = datetime(2022, 3, 1, 9, tzinfo=pytz.utc)
+        self.assertEqual(
+            slotgrid.find_available_slots(
+                start, start + timedelta(minutes=10), 15, IntervalSet()
+            ),
+            [],
+        )
+
+
+class PurePythonFallbackTest(SimpleTestCase):
+    def test_falls_back_when_numpy_is_missing(self):
+        start = datetime(2022, 3, 1, 9, tzinfo=pytz.utc)
+        end = start + timedelta(hours=1)
+        busy = IntervalSet([(start, start + timedelta(minutes=30))])
+        with mock.patch.object(slotgrid, "np", None):
+            slots = slotgrid.find_available_slots(start, end, 15, busy)
+        self.assertEqual(
+            slots,
+            [start + timedelta(minutes=30), start + timedelta(minutes=45)],
+        )
+
+    def test_windows_fall_back_when_numpy_is_missing(self):
+        start = datetime(2022, 3, 1, 9, tzinfo=pytz.utc)
+        hour = timedelta(hours=1)
+        busy = IntervalSet([(start, start + hour)])
+        windows = [(start, start + hour), (start + hour, start + 2 * hour)]
+        with mock.patch.object(slotgrid, "np", None):
+            self.assertEqual(
+                slotgrid.has_available_slots(windows, 30, busy), [False, True]
+            )
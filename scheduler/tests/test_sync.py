@@ -0,0 +1,181 @@
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+import pytz
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..lib.availability import AvailabilityCache
+from ..lib.providers import get_provider
+from ..lib.sync import CalendarSync
+from ..models import BusyInterval, CalendarSyncState
+from .stubs import CalendarStubServer
+from .test_availability import FakeCalendar
+
+
+def item(event_id, start, end, **extra):
+    return {
+        "id": event_id,
+        "start": {"dateTime": start},
+        "end": {"dateTime": end},
+        **extra,
+    }
+
+
+class CalendarSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.full = [
+            item("a", "2022-01-10T09:00:00Z", "2022-01-10T10:00:00Z"),
+            item(
+                "free",
+                "2022-01-10T11:00:00Z",
+                "2022-01-10T12:00:00Z",
+                transparency="transparent",
+            ),
+            {"id": "all-day", "start": {"date": "2022-01-11"}},
+        ]
+        self.changes = [
+            item("a", "2022-01-10T13:00:00Z", "2022-01-10T14:00:00Z"),
+            item("b", "2022-01-12T09:00:00Z", "2022-01-12T09:30:00Z"),
+        ]
+        self.stub.route("GET", "/calendars/primary/events", self.events)
+        self.sync = CalendarSync(service=self.stub.build_service())
+
+    def events(self, query, body):
+        token = query.get("syncToken")
+        if token is None:
+            return 200, {"items": self.full, "nextSyncToken": "token-1"}
+        if token == "token-1":
+            return 200, {"items": self.changes, "nextSyncToken": "token-2"}
+        if token == "token-2":
+            return 200, {"items": [], "nextSyncToken": "token-3"}
+        return 410, {"error": {"code": 410, "message": "Gone"}}
+
+    def mirrored(self):
+        return sorted(
+            BusyInterval.objects.values_list(
+                "event_id", "start_time", "end_time"
+            )
+        )
+
+    def test_first_run_is_a_full_sync(self):
+        result = self.sync.run()
+        self.assertTrue(result.full)
+        self.assertEqual(
+            self.mirrored(),
+            [
+                (
+                    "a",
+                    datetime(2022, 1, 10, 9, tzinfo=pytz.utc),
+                    datetime(2022, 1, 10, 10, tzinfo=pytz.utc),
+                )
+            ],
+        )
+        state = CalendarSyncState.objects.get(calendar_id="primary")
+        self.assertEqual(state.sync_token, "token-1")
+
+    def test_incremental_sync_applies_changes(self):
+        self.sync.run()
+        self.changes.append(item("gone", "", "", status="cancelled"))
+        result = self.sync.run()
+
+        self.assertFalse(result.full)
+        self.assertEqual(
+            [event_id for event_id, _, _ in self.mirrored()], ["a", "b"]
+        )
+        self.assertIn(
+            (
+                datetime(2022, 1, 10, 9, tzinfo=pytz.utc),
+                datetime(2022, 1, 10, 10, tzinfo=pytz.utc),
+            ),
+            result.changed,
+        )
+        _, _, query, _ = self.stub.requests[-1]
+        self.assertEqual(query["syncToken"], "token-1")
+
+    def test_invalidated_sync_token_triggers_full_resync(self):
+        CalendarSyncState.objects.create(
+            calendar_id="primary", sync_token="expired"
+        )
+        result = self.sync.run()
+        self.assertTrue(result.full)
+        self.assertEqual(CalendarSyncState.objects.get().sync_token, "token-1")
+
+    def test_google_is_paged_outside_transactions(self):
+        pages = self.sync._pages
+        depths = []
+
+        def paged(**params):
+            depths.append(len(connection.savepoint_ids))
+            return pages(**params)
+
+        outside = len(connection.savepoint_ids)
+        with mock.patch.object(self.sync, "_pages", paged):
+            self.sync.run()
+            self.sync.run()
+        self.assertEqual(depths, [outside, outside])
+
+    def test_changes_are_fetched_again_after_a_concurrent_sync(self):
+        self.sync.run()
+        pages = self.sync._pages
+
+        def paged(**params):
+            if params.get("syncToken") == "token-1":
+                # another sync saves its token while this one fetches
+                CalendarSyncState.objects.update(sync_token="token-2")
+            return pages(**params)
+
+        with mock.patch.object(self.sync, "_pages", paged):
+            result = self.sync.run()
+        self.assertFalse(result.full)
+        self.assertEqual(CalendarSyncState.objects.get().sync_token, "token-3")
+        self.assertEqual(
+            [query.get("syncToken") for _, _, query, _ in self.stub.requests],
+            [None, "token-1", "token-2"],
+        )
+
+    @override_settings(CALENDAR_AVAILABILITY_PROVIDER="mirror")
+    def test_mirror_provider_reads_local_table(self):
+        self.sync.run()
+        requests = len(self.stub.requests)
+        events = get_provider().fetch(
+            "2022-01-10T00:00:00+00:00", "2022-01-11T00:00:00+00:00"
+        )
+        self.assertEqual(len(events), 1)
+        self.assertEqual(len(self.stub.requests), requests)
+
+    def test_management_command(self):
+        out = StringIO()
+        with mock.patch(
+            "scheduler.management.commands.syncbusy.CalendarSync",
+            return_value=self.sync,
+        ):
+            call_command("syncbusy", stdout=out)
+        self.assertIn("Full sync done", out.getvalue())
+        self.assertEqual(BusyInterval.objects.count(), 1)
+
+    def test_command_invalidates_the_buckets_of_every_worker(self):
+        # a web worker, sharing nothing with the command but the cache
+        worker = AvailabilityCache(FakeCalendar([]))
+        window = (
+            datetime(2022, 1, 10, tzinfo=pytz.utc),
+            datetime(2022, 1, 13, tzinfo=pytz.utc),
+        )
+        self.sync.run()
+        worker.get_busy(*window)
+        worker.get_busy(*window)
+        self.assertEqual(len(worker.fetch.calls), 1)
+
+        with mock.patch(
+            "scheduler.management.commands.syncbusy.CalendarSync",
+            return_value=self.sync,
+        ):
+            call_command("syncbusy", stdout=StringIO())
+        worker.get_busy(*window)
+        self.assertEqual(len(worker.fetch.calls), 2)
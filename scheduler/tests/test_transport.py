@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from googleapiclient.errors import HttpError
+
+from ..lib import metrics
+from ..lib.transport import PooledHttp
+from .stubs import CalendarStubServer
+
+
+class PooledHttpTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.stub = CalendarStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.stub.route(
+            "GET",
+            "/calendars/primary/events",
+            lambda query, body: (200, {"items": []}),
+        )
+        self.http = PooledHttp()
+        self.addCleanup(self.http.close)
+        self.service = self.stub.build_service(http=self.http)
+
+    def test_connections_are_kept_alive(self):
+        for _ in range(5):
+            response = (
+                self.service.events().list(calendarId="primary").execute()
+            )
+            self.assertEqual(response, {"items": []})
+
+        values = metrics.snapshot()
+        self.assertEqual(values["calendar_http_requests"], 5)
+        self.assertEqual(values["calendar_http_connections"], 1)
+        self.assertEqual(values["calendar_http_tls_handshakes"], 0)
+
+    @override_settings(CACHES=settings.SHIPPED_CACHES)
+    def test_requests_are_counted_without_cache_round_trips(self):
+        # database queries, and so the database cache, fail in this test
+        for _ in range(3):
+            self.service.events().list(calendarId="primary").execute()
+
+    def test_errors_keep_their_status(self):
+        with self.assertRaises(HttpError) as raised:
+            self.service.events().get(
+                calendarId="primary", eventId="missing"
+            ).execute()
+        self.assertEqual(raised.exception.status_code, 404)
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timedelta
+
+import pytz
+from django.test import SimpleTestCase
+
+from ..lib.tz import UnknownTimeZone, day_window, days_window, get_zone
+
+
+def utc(*args):
+    return pytz.utc.localize(datetime(*args))
+
+
+class TimeZoneTest(SimpleTestCase):
+    def test_zones_are_cached(self):
+        self.assertIs(get_zone("Europe/Paris"), get_zone("Europe/Paris"))
+
+    def test_unknown_zones(self):
+        for name in ("Mars/Olympus_Mons", "../etc/passwd", ""):
+            with self.subTest(name=name):
+                with self.assertRaises(UnknownTimeZone):
+                    get_zone(name)
+
+    def test_day_window(self):
+        tokyo = get_zone("Asia/Tokyo")
+        self.assertEqual(
+            day_window(tokyo, date(2022, 1, 11)),
+            (utc(2022, 1, 10, 15), utc(2022, 1, 11, 15)),
+        )
+        self.assertEqual(
+            days_window(tokyo, date(2022, 1, 11), date(2022, 1, 12)),
+            (utc(2022, 1, 10, 15), utc(2022, 1, 12, 15)),
+        )
+
+    def test_day_window_across_dst_transitions(self):
+        paris = get_zone("Europe/Paris")
+        for day, hours in ((date(2022, 3, 27), 23), (date(2022, 10, 30), 25)):
+            with self.subTest(day=day):
+                start, end = day_window(paris, day)
+                self.assertEqual(end - start, timedelta(hours=hours))
+
+    def test_skipped_midnight_starts_the_day_at_the_transition(self):
+        # clocks went from 00:00 to 01:00 in Havana on 13 March 2022
+        start, end = day_window(get_zone("America/Havana"), date(2022, 3, 13))
+        self.assertEqual(start, utc(2022, 3, 13, 5))
+        self.assertEqual(end - start, timedelta(hours=23))
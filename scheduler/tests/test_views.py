@@ -0,0 +1,446 @@
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..lib.availability import availability
+from ..lib.breaker import calendar_breaker
+from ..lib.prefetch import prefetcher
+from ..models import Event, EventType, ScheduleWindow
+from .factories import create_schedule
+from .stubs import ImmediateExecutor
+
+NOW = datetime(2022, 1, 10, 8, tzinfo=pytz.utc)
+
+
+class FakeCalendar:
+    def __init__(self, events=()):
+        self.events = list(events)
+        self.calls = []
+
+    def __call__(self, time_lower, time_upper):
+        self.calls.append((time_lower, time_upper))
+        return self.events
+
+
+def picker_urls():
+    return (
+        reverse("scheduler:calendar", kwargs={"event": "phone-call-30-min"}),
+        reverse(
+            "scheduler:time_picker",
+            kwargs={"event": "phone-call-30-min", "date": "20220111"},
+        ),
+    )
+
+
+# prefetching is covered in `test_prefetch`
+@override_settings(AVAILABILITY_PREFETCH_WORKERS=0)
+class PickerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_schedule()
+
+    def setUp(self):
+        cache.clear()
+        availability.local.clear()
+        calendar_breaker.reset()
+        self.addCleanup(calendar_breaker.reset)
+        self.calendar = FakeCalendar(
+            [
+                {
+                    "start": {"dateTime": "2022-01-12T00:00:00+00:00"},
+                    "end": {"dateTime": "2022-01-13T00:00:00+00:00"},
+                }
+            ]
+        )
+        # async views fall back to the patched sync fetch
+        for name, value in (("fetch", self.calendar), ("afetch", None)):
+            patcher = mock.patch.object(availability, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("django.utils.timezone.now", return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class DayPickerTest(PickerTestCase):
+    def test_only_days_with_free_slots_are_bookable(self):
+        response = self.client.get(
+            reverse(
+                "scheduler:calendar", kwargs={"event": "phone-call-30-min"}
+            ),
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertEqual(
+            sorted(response.context["bookable_days"]),
+            [
+                date(2022, 1, day)
+                for day in (10, 11, 13, 14, 17, 18, 19, 20, 21)
+                + (24, 25, 26, 27, 28, 31)
+            ],
+        )
+        # the whole visible month comes from a single fetch
+        self.assertEqual(len(self.calendar.calls), 1)
+
+    def test_month_navigation_reuses_cached_busy_time(self):
+        url = reverse(
+            "scheduler:calendar", kwargs={"event": "phone-call-30-min"}
+        )
+        self.client.get(f"{url}?day=20220201", HTTP_HX_REQUEST="true")
+        self.client.get(url, HTTP_HX_REQUEST="true")
+        self.client.get(f"{url}?day=20220201", HTTP_HX_REQUEST="true")
+        self.assertEqual(len(self.calendar.calls), 2)
+
+    def test_unknown_event_redirects_to_index(self):
+        response = self.client.get(
+            reverse("scheduler:calendar", kwargs={"event": "carrier-pigeon"})
+        )
+        self.assertRedirects(
+            response,
+            reverse("scheduler:index"),
+            fetch_redirect_response=False,
+        )
+
+
+class TimePickerTest(PickerTestCase):
+    def url(self, date):
+        return reverse(
+            "scheduler:time_picker",
+            kwargs={"event": "google-meet-60-min", "date": date},
+        )
+
+    def test_available_times_follow_schedule_and_busy_time(self):
+        response = self.client.get(self.url("20220111"))
+        self.assertEqual(
+            response.context["available_times"],
+            [
+                datetime(2022, 1, 11, hour, tzinfo=pytz.utc)
+                for hour in range(9, 17)
+            ],
+        )
+        response = self.client.get(self.url("20220112"))
+        self.assertEqual(response.context["available_times"], [])
+
+    def test_user_timezone_window(self):
+        response = self.client.get(
+            self.url("20220111"), {"timezone": "Asia/Tokyo"}
+        )
+        # 15:00 to 17:00 UTC on the 10th, and 09:00 UTC on the 11th up to
+        # midnight in Tokyo
+        tokyo = pytz.timezone("Asia/Tokyo")
+        self.assertEqual(
+            response.context["available_times"],
+            [tokyo.localize(datetime(2022, 1, 11, hour)) for hour in (0, 1)]
+            + [
+                tokyo.localize(datetime(2022, 1, 11, hour))
+                for hour in range(18, 24)
+            ],
+        )
+        self.assertEqual(response.context["user_tz"], "Asia/Tokyo")
+
+    def test_local_bookings_are_busy(self):
+        Event.objects.create(
+            location_type=Event.LocationType.GOOGLE_MEET,
+            duration=60,
+            start_time=datetime(2022, 1, 11, 10, tzinfo=pytz.utc),
+        )
+        response = self.client.get(self.url("20220111"))
+        self.assertEqual(
+            response.context["available_times"],
+            [
+                datetime(2022, 1, 11, hour, tzinfo=pytz.utc)
+                for hour in (9, 11, 12, 13, 14, 15, 16)
+            ],
+        )
+
+
+# the user's day spans three local days of the schedule, 26 hours ahead
+@override_settings(SCHEDULE_TIME_ZONE="Pacific/Kiritimati")
+class DistantTimezonesTest(PickerTestCase):
+    params = {"timezone": "Etc/GMT+12"}
+
+    def test_time_picker_only_offers_scheduled_slots(self):
+        self.calendar.events = []
+        response = self.client.get(
+            picker_urls()[1], self.params, HTTP_HX_REQUEST="true"
+        )
+        # 9:00 to 17:00 on Wednesday in Kiritimati, and nothing from the
+        # early hours of Thursday there
+        self.assertEqual(
+            response.context["available_times"],
+            [
+                datetime(2022, 1, 11, 19, tzinfo=pytz.utc)
+                + timedelta(minutes=30 * n)
+                for n in range(16)
+            ],
+        )
+
+    def test_day_picker_only_offers_scheduled_days(self):
+        response = self.client.get(
+            picker_urls()[0], self.params, HTTP_HX_REQUEST="true"
+        )
+        # Monday to Friday in Kiritimati are Sunday to Thursday here
+        self.assertEqual(
+            sorted(response.context["bookable_days"])[:5],
+            [date(2022, 1, day) for day in (10, 11, 12, 13, 16)],
+        )
+
+
+class UserTimezoneTest(PickerTestCase):
+    def test_cookie_remembers_the_timezone(self):
+        url = picker_urls()[1]
+        self.client.get(url, {"timezone": "Asia/Tokyo"})
+        response = self.client.get(url)
+        self.assertEqual(response.context["user_tz"], "Asia/Tokyo")
+
+    def test_tampered_or_unknown_timezones_fall_back_to_utc(self):
+        url = picker_urls()[1]
+        self.client.cookies["user_tz"] = "Asia/Tokyo"
+        self.assertEqual(self.client.get(url).context["user_tz"], "UTC")
+        response = self.client.get(url, {"timezone": "Mars/Olympus_Mons"})
+        self.assertEqual(response.context["user_tz"], "UTC")
+
+    def test_set_user_tz(self):
+        url = reverse("scheduler:set_user_tz")
+        response = self.client.post(
+            url, {"timezone": "Europe/Paris"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(picker_urls()[1])
+        self.assertEqual(response.context["user_tz"], "Europe/Paris")
+
+        response = self.client.post(
+            url, {"timezone": "Nowhere"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalPickerTest(PickerTestCase):
+    def get(self, url, **extra):
+        return self.client.get(url, HTTP_HX_REQUEST="true", **extra)
+
+    def etags(self):
+        return [self.get(url)["ETag"] for url in picker_urls()]
+
+    def test_unchanged_partials_are_not_modified(self):
+        for url in picker_urls():
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("must-revalidate", response["Cache-Control"])
+                self.assertIn("HX-Request", response["Vary"])
+
+                response = self.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_not_modified_skips_the_busy_time(self):
+        for url in picker_urls():
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                with mock.patch.object(
+                    availability, "alookup", side_effect=AssertionError
+                ):
+                    response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_etags_follow_the_busy_time(self):
+        before = self.etags()
+        availability.invalidate(date(2022, 1, 11))
+        after = self.etags()
+        self.assertTrue(all(a != b for a, b in zip(before, after)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(
+                location_type=Event.LocationType.GOOGLE_MEET,
+                duration=30,
+                start_time=datetime(2022, 1, 11, 10, tzinfo=pytz.utc),
+            )
+        self.assertTrue(all(a != b for a, b in zip(after, self.etags())))
+
+    def test_etags_follow_the_schedule(self):
+        before = self.etags()
+        window = ScheduleWindow.objects.first()
+        window.end_time = time(12)
+        with self.captureOnCommitCallbacks(execute=True):
+            window.save()
+        self.assertTrue(all(a != b for a, b in zip(before, self.etags())))
+
+    def test_etags_expire_with_the_cache_ttl(self):
+        before = self.etags()
+        later = NOW.replace(minute=10)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertTrue(all(a != b for a, b in zip(before, self.etags())))
+
+    @override_settings(AVAILABILITY_CACHE_TTL=3600)
+    def test_etags_expire_when_a_slot_starts(self):
+        # 08:00, then 08:14 and 08:15 within the same cache TTL
+        before = self.etags()
+        for minute, changed in ((14, False), (15, True)):
+            later = NOW.replace(minute=minute)
+            with mock.patch(
+                "django.utils.timezone.now", return_value=later
+            ), self.subTest(minute=minute):
+                etags = self.etags()
+                self.assertEqual(etags != before, changed)
+
+    def test_etags_depend_on_the_timezone(self):
+        for url in picker_urls():
+            with self.subTest(url=url):
+                self.client.cookies.clear()
+                utc = self.get(url)["ETag"]
+                tokyo = self.get(url, data={"timezone": "Asia/Tokyo"})
+                self.assertNotEqual(tokyo["ETag"], utc)
+                self.assertIn("private", tokyo["Cache-Control"])
+
+    @override_settings(
+        STATICFILES_STORAGE=(
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+        )
+    )
+    def test_full_pages_carry_no_validators(self):
+        response = self.client.get(picker_urls()[0])
+        self.assertFalse(response.has_header("ETag"))
+
+
+class DegradedPickerTest(PickerTestCase):
+    def get(self, url):
+        return self.client.get(url, HTTP_HX_REQUEST="true")
+
+    def fail(self):
+        availability.clear()
+        patcher = mock.patch.object(
+            availability, "fetch", side_effect=TimeoutError("timed out")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_last_known_busy_time_is_served_and_flagged(self):
+        fresh = [self.get(url) for url in picker_urls()]
+        self.fail()
+        for url, response in zip(picker_urls(), fresh):
+            with self.subTest(url=url):
+                stale = self.get(url)
+                self.assertEqual(stale.status_code, 200)
+                self.assertContains(stale, "Showing availability as of 08:00")
+                self.assertIn("X-Availability-Stale-Since", stale)
+                self.assertIn("no-store", stale["Cache-Control"])
+                self.assertNotIn("ETag", stale)
+                for key in ("bookable_days", "available_times"):
+                    if key in response.context:
+                        self.assertEqual(
+                            stale.context[key], response.context[key]
+                        )
+
+    def test_unavailable_without_stale_busy_time(self):
+        self.fail()
+        for url in picker_urls():
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertContains(
+                    response, "can't be loaded", status_code=503
+                )
+                self.assertNotContains(
+                    response, "No times available", status_code=503
+                )
+                self.assertNotIn("ETag", response)
+
+
+class TimezoneListTest(PickerTestCase):
+    def test_list_is_cacheable(self):
+        url = reverse("scheduler:timezone_list")
+        response = self.client.get(url)
+        self.assertEqual(response.json(), list(pytz.common_timezones))
+        self.assertIn("public", response["Cache-Control"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_partials_only_render_the_selected_zone(self):
+        for url in picker_urls():
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, {"timezone": "Asia/Tokyo"}, HTTP_HX_REQUEST="true"
+                )
+                self.assertContains(response, "<option", count=1)
+                self.assertContains(
+                    response, '<option value="Asia/Tokyo" selected>'
+                )
+
+
+@contextmanager
+def capture_all_queries():
+    # the SQL of every thread, where `CaptureQueriesContext` only sees the
+    # connection of the calling one; the periodic flush of the counters is
+    # not part of any request
+    queries = []
+    execute = CursorWrapper._execute
+
+    def capture(cursor, sql, *args):
+        if threading.current_thread().name != "metrics-flush":
+            queries.append(sql)
+        return execute(cursor, sql, *args)
+
+    with mock.patch.object(CursorWrapper, "_execute", capture):
+        yield queries
+
+
+# the pickers as deployed: cache I/O on the shipped cache, in worker
+# threads, with prefetching on
+@override_settings(CACHES=settings.SHIPPED_CACHES)
+class ReadOnlyPickerTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        availability.local.clear()
+        calendar_breaker.reset()
+        self.addCleanup(calendar_breaker.reset)
+        create_schedule()
+        # the tables are emptied between these tests
+        EventType.objects.get_or_create(
+            slug="phone-call-30-min",
+            defaults={"name": "Phone call (30 min)", "duration": 30},
+        )
+        for target, name, value in (
+            (availability, "fetch", FakeCalendar()),
+            (availability, "afetch", None),
+            (prefetcher, "_executor", ImmediateExecutor()),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("django.utils.timezone.now", return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_picker_requests_do_not_write(self):
+        for url in picker_urls():
+            with self.subTest(url=url):
+                self.client.cookies.clear()
+                first = self.client.get(
+                    url, {"timezone": "Asia/Tokyo"}, HTTP_HX_REQUEST="true"
+                )
+                with capture_all_queries() as queries:
+                    second = self.client.get(
+                        url, {"timezone": "Asia/Tokyo"}, HTTP_HX_REQUEST="true"
+                    )
+                self.assertTrue(
+                    any("scheduler_cache" in sql for sql in queries)
+                )
+                writes = [
+                    sql
+                    for sql in queries
+                    if sql.split()[0] in ("INSERT", "UPDATE", "DELETE")
+                ]
+                self.assertEqual(writes, [])
+                # the cookie is only sent when the zone changes
+                self.assertIn("user_tz", first.cookies)
+                self.assertNotIn("user_tz", second.cookies)
@@ -0,0 +1,119 @@
+from datetime import date, datetime, time
+
+import pytz
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..lib.intervals import IntervalSet
+from ..lib.tz import get_zone
+from ..lib.weekly import WeeklySchedule, weekly_schedule
+from ..models import ScheduleWindow
+from .factories import create_schedule
+
+
+def utc(day, hour=0):
+    return pytz.utc.localize(datetime(2022, 1, day, hour))
+
+
+class WeeklyScheduleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.schedule = create_schedule()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_schedule_is_compiled_into_second_offsets(self):
+        weekly = WeeklySchedule.from_schedule(self.schedule)
+        working_day = ((9 * 3600, 17 * 3600),)
+        self.assertEqual(weekly.windows, ((),) + (working_day,) * 5 + ((),))
+
+    def test_missing_schedule_has_no_availability(self):
+        weekly = WeeklySchedule.from_schedule(None)
+        self.assertEqual(
+            list(weekly.busy_between(date(2022, 1, 10), date(2022, 1, 10))),
+            [(utc(10), utc(11))],
+        )
+
+    def test_busy_time_is_everything_outside_of_the_schedule(self):
+        # Sun 9th to Tue 11th
+        busy = weekly_schedule().busy_between(
+            date(2022, 1, 9), date(2022, 1, 11)
+        )
+        self.assertEqual(
+            busy,
+            IntervalSet(
+                [
+                    (utc(9), utc(10, 9)),
+                    (utc(10, 17), utc(11, 9)),
+                    (utc(11, 17), utc(12)),
+                ]
+            ),
+        )
+
+    def test_compiled_schedule_is_reused_without_queries(self):
+        weekly_schedule()
+        with self.assertNumQueries(0):
+            weekly_schedule()
+
+    def test_saving_a_window_recompiles_the_schedule(self):
+        weekly_schedule()
+        window = self.schedule.windows.get(weekday=1)
+        window.start_time = time(10)
+        with self.captureOnCommitCallbacks() as callbacks:
+            window.save()
+        # not before the change is committed
+        self.assertEqual(
+            weekly_schedule().windows[1], ((9 * 3600, 17 * 3600),)
+        )
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            weekly_schedule().windows[1], ((10 * 3600, 17 * 3600),)
+        )
+
+    def test_multiple_windows_per_day(self):
+        self.schedule.windows.filter(weekday=1).delete()
+        for start, end in (("13:00", "17:00"), ("8:00", "12:00")):
+            ScheduleWindow.objects.create(
+                schedule=self.schedule,
+                weekday=1,
+                start_time=start,
+                end_time=end,
+            )
+
+        self.assertEqual(
+            weekly_schedule().windows[1],
+            ((8 * 3600, 12 * 3600), (13 * 3600, 17 * 3600)),
+        )
+        # lunch break on Mon 10th
+        self.assertEqual(
+            list(
+                weekly_schedule().available_between(
+                    date(2022, 1, 10), date(2022, 1, 10)
+                )
+            ),
+            [(utc(10, 8), utc(10, 12)), (utc(10, 13), utc(10, 17))],
+        )
+
+    @override_settings(SCHEDULE_TIME_ZONE="America/New_York")
+    def test_windows_follow_the_schedule_time_zone(self):
+        weekly = weekly_schedule()
+        self.assertEqual(weekly.zone, get_zone("America/New_York"))
+        # 9:00 to 17:00 before and after the switch to daylight saving time
+        # on Sun 13 March
+        self.assertEqual(
+            list(
+                weekly.available_between(date(2022, 3, 11), date(2022, 3, 14))
+            ),
+            [
+                (
+                    pytz.utc.localize(datetime(2022, 3, 11, 14)),
+                    pytz.utc.localize(datetime(2022, 3, 11, 22)),
+                ),
+                (
+                    pytz.utc.localize(datetime(2022, 3, 14, 13)),
+                    pytz.utc.localize(datetime(2022, 3, 14, 21)),
+                ),
+            ],
+        )
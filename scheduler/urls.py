@@ -18,6 +18,13 @@ app_name = "scheduler"
 urlpatterns = [
     path("", views.index, name="index"),
     path("set-user-tz/", views.set_user_tz, name="set_user_tz"),
+    path("timezones.json", views.timezone_list, name="timezone_list"),
+    path(
+        "notifications/calendar/",
+        views.calendar_notification,
+        name="calendar_notification",
+    ),
+    path("<slug:event>/<yyyymmdd:date>/book", views.book, name="book"),
     path(
         "<slug:event>/<yyyymmdd:date>", views.time_picker, name="time_picker"
     ),
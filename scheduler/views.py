@@ -1,202 +1,201 @@
 import calendar
 import json
-from datetime import datetime, time, timedelta
-from itertools import product
-
-import pytz
-from django.http import HttpResponse, HttpResponseNotAllowed
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+)
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.shortcuts import redirect, render
 from django.utils import timezone
-from django.utils.text import slugify
-
-from .lib.planner import EventPlanner
-from .models import Event, Schedule
-
-WEEKDAY_MAP = {
-    "0": {
-        "previous": ["sat_off", "sat_start", "sat_end"],
-        "now": ["sun_off", "sun_start", "sun_end"],
-        "next": ["mon_off", "mon_start", "mon_end"],
-    },
-    "1": {
-        "previous": ["sun_off", "sun_start", "sun_end"],
-        "now": ["mon_off", "mon_start", "mon_end"],
-        "next": ["tue_off", "tue_start", "tue_end"],
-    },
-    "2": {
-        "previous": ["mon_off", "mon_start", "mon_end"],
-        "now": ["tue_off", "tue_start", "tue_end"],
-        "next": ["wed_off", "wed_start", "wed_end"],
-    },
-    "3": {
-        "previous": ["tue_off", "tue_start", "tue_end"],
-        "now": ["wed_off", "wed_start", "wed_end"],
-        "next": ["thu_off", "thu_start", "thu_end"],
-    },
-    "4": {
-        "previous": ["wed_off", "wed_start", "wed_end"],
-        "now": ["thu_off", "thu_start", "thu_end"],
-        "next": ["fri_off", "fri_start", "fri_end"],
-    },
-    "5": {
-        "previous": ["thu_off", "thu_start", "thu_end"],
-        "now": ["fri_off", "fri_start", "fri_end"],
-        "next": ["sat_off", "sat_start", "sat_end"],
-    },
-    "6": {
-        "previous": ["fri_off", "fri_start", "fri_end"],
-        "now": ["sat_off", "sat_start", "sat_end"],
-        "next": ["sun_off", "sun_start", "sun_end"],
-    },
-}
-
-
-def join_slugs(iterable):
-    return "-".join(iterable)
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag, require_GET
+
+from .forms import BookingForm
+from .lib.availability import CalendarUnavailable, availability
+from .lib.booking import SlotUnavailable, book_event, booked_between
+from .lib.conditional import add_validators, not_modified, picker_etag
+from .lib.eventtypes import event_types, get_event_type
+from .lib.intervals import IntervalSet
+from .lib.notifications import InvalidNotification, handle_notification
+from .lib.prefetch import neighbour_days, prefetcher
+from .lib.slotgrid import find_available_slots, has_available_slots
+from .lib.tz import (
+    COMMON_TIMEZONES,
+    COMMON_TIMEZONES_VERSION,
+    UnknownTimeZone,
+    day_window,
+    days_window,
+    get_zone,
+    local_today,
+)
+from .lib.weekly import weekly_schedule
+from .models import Event, Profile
+
+USER_TZ_COOKIE = "user_tz"
+USER_TZ_SALT = "scheduler.user_tz"
+USER_TZ_MAX_AGE = 365 * 24 * 60 * 60
+# days ahead of today (in the user's timezone) that can be booked
+BOOKING_HORIZON = timedelta(days=60)
 
 
 def add_availability_to_week(week, availability):
     return zip(week, availability)
 
 
-def parse_event(event):
-    split_string = event.split("-")
-    event_type = "phone" if split_string[0] == "phone" else "gmeet"
-    duration = int(split_string[-2])
-    return event_type, duration
-
-
-def build_dt_to_iso(date, time):
-    return pytz.utc.localize(datetime.combine(date, time)).isoformat()
-
-
-def build_artificial_events(selected_date, prev_day, next_day):
-    DAY_MAP = {
-        "previous": prev_day,
-        "now": selected_date,
-        "next": next_day,
-    }
-
-    # get the weekday of the date as number
-    # 0=Sun, 1=Mon, ..., 5=Fri, 6=Sat
-    weekday = selected_date.strftime("%w")
-
-    # use a buffer of a day from the selected date due to timezone differences
-    artificial_events = []
-    schedule = Schedule.objects.first()
-    for day in ["previous", "now", "next"]:
-        if getattr(schedule, WEEKDAY_MAP[weekday][day][0]):
-            artificial_events.append(
-                {
-                    "start": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(), time(0, 0, 0)
-                        )
-                    },
-                    "end": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(), time(23, 59, 59)
-                        )
-                    },
-                }
-            )
-        else:
-            artificial_events.append(
-                {
-                    "start": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(), time(0, 0, 0)
-                        )
-                    },
-                    "end": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(),
-                            getattr(schedule, WEEKDAY_MAP[weekday][day][1]),
-                        )
-                    },
-                }
-            )
-            artificial_events.append(
-                {
-                    "start": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(),
-                            getattr(schedule, WEEKDAY_MAP[weekday][day][2]),
-                        )
-                    },
-                    "end": {
-                        "dateTime": build_dt_to_iso(
-                            DAY_MAP[day].date(), time(23, 59, 59)
-                        )
-                    },
-                }
-            )
+def padded_window(event_type, time_min, time_max):
+    # busy time within the buffers around the window matters too
+    return (
+        time_min - event_type.buffer_before,
+        time_max + event_type.buffer_after,
+    )
 
-    return artificial_events
 
+def flag_degraded(response, stale_since):
+    # stale or missing availability must not be revalidated against an
+    # ETag, which does not change when Google recovers
+    patch_cache_control(response, no_store=True)
+    if stale_since is not None:
+        response["X-Availability-Stale-Since"] = stale_since.isoformat()
+    return response
 
-def build_available_times(start, end, duration, events):
-    available_times = []
-    now = timezone.now()
-    current_start = start
-    current_end = current_start + timedelta(minutes=duration)
-    while current_end <= end:
-        skip = False
 
-        if current_start > now:
-            # TODO: fix error when all-day events are in the calendar
-            # iterate through events
-            for event in events:
-                event_start = datetime.fromisoformat(
-                    event["start"]["dateTime"]
-                )
-                event_end = datetime.fromisoformat(event["end"]["dateTime"])
-                # break out of loop due to time conflicts with event
-                if (
-                    current_start >= event_start and current_start < event_end
-                ) or (current_end > event_start and current_end <= event_end):
-                    skip = True
-                    break
+def build_bookable_days(
+    first_day, last_day, duration, user_tz, calendar_busy, weekly
+):
+    # dates between `first_day` and `last_day` (inclusive, in the user's
+    # timezone) that have at least one available time slot
 
-            # only add to available times if `skip=False`
-            if not skip:
-                available_times.append(current_start)
+    # schedule busy time over the days of the schedule's zone that the
+    # user's days touch, however far apart the two zones are
+    schedule_busy = weekly.busy_during(
+        *days_window(user_tz, first_day, last_day)
+    )
+    busy = schedule_busy.union(calendar_busy)
+
+    # every day's slot grid is evaluated at once
+    days = [
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days + 1)
+    ]
+    free = has_available_slots(
+        [day_window(user_tz, day) for day in days],
+        duration,
+        busy,
+        now=timezone.now(),
+    )
+    return {day for day, has_slots in zip(days, free) if has_slots}
+
+
+def check_bookable(start, duration, user_tz):
+    # only the slots the pickers offer can be booked: within the horizon
+    # and on the grid of `duration` minutes from the user's local midnight
+    day = start.astimezone(user_tz).date()
+    if day > local_today(user_tz) + BOOKING_HORIZON:
+        raise SlotUnavailable("This time is too far ahead.")
+    time_min, time_max = day_window(user_tz, day)
+    if start not in find_available_slots(
+        time_min, time_max, duration, IntervalSet()
+    ):
+        raise SlotUnavailable("This time is not available.")
 
-        # add duration to `current_start` and `current_end`
-        current_start = current_start + timedelta(minutes=duration)
-        current_end = current_start + timedelta(minutes=duration)
-    return available_times
+
+def get_user_tz(request):
+    # get timezone optional param, if passed into url
+    # this param is passed via htmx, otherwise the zone remembered in a
+    # signed cookie is used, so the pickers never write to the database
+    name = request.GET.get("timezone") or request.get_signed_cookie(
+        USER_TZ_COOKIE, default="UTC", salt=USER_TZ_SALT
+    )
+    try:
+        return get_zone(name)
+    except UnknownTimeZone:
+        return get_zone("UTC")
+
+
+def remember_user_tz(request, response, user_tz):
+    # only send the cookie again when the zone actually changed
+    current = request.get_signed_cookie(
+        USER_TZ_COOKIE, default=None, salt=USER_TZ_SALT
+    )
+    if current != user_tz.key:
+        response.set_signed_cookie(
+            USER_TZ_COOKIE,
+            user_tz.key,
+            salt=USER_TZ_SALT,
+            max_age=USER_TZ_MAX_AGE,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+@lru_cache(maxsize=None)
+def timezone_list_json():
+    return json.dumps(COMMON_TIMEZONES)
+
+
+@require_GET
+@etag(lambda request: f"timezones-{COMMON_TIMEZONES_VERSION}")
+def timezone_list(request):
+    # the pickers only render the selected zone; the full list is fetched
+    # once by the browser and only changes with the timezone database
+    response = HttpResponse(
+        timezone_list_json(), content_type="application/json"
+    )
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(settings, "TIMEZONE_LIST_MAX_AGE", 86400),
+    )
+    return response
 
 
 def index(request):
-    return render(request, "scheduler/index.html")
+    return render(
+        request,
+        "scheduler/index.html",
+        {"event_types": event_types().values()},
+    )
 
 
 def set_user_tz(request):
     if request.method == "POST":
         payload = json.loads(request.body)
-        request.session["user_tz"] = payload["timezone"]
-        return HttpResponse("Timezone set for session")
+        try:
+            user_tz = get_zone(payload["timezone"])
+        except UnknownTimeZone:
+            return HttpResponseBadRequest("Unknown timezone")
+        return remember_user_tz(request, HttpResponse("Timezone set"), user_tz)
     return HttpResponseNotAllowed(["GET"])
 
 
-def day_picker(request, event):
-    # get timezone optional param, if passed into url
-    # this param is passed via htmx
-    tz_param = request.GET.get("timezone", None)
-    # if param was passed, update session variable
-    if tz_param:
-        request.session["user_tz"] = tz_param
+@csrf_exempt
+def calendar_notification(request):
+    # receiver for Google Calendar push notifications
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    try:
+        handle_notification(request.headers)
+    except InvalidNotification:
+        return HttpResponseForbidden()
+    return HttpResponse()
 
-    user_tz = pytz.timezone(request.session.get("user_tz", "UTC"))
 
-    # dynamically generate cartesian product of location type and duration
-    LOCATIONS = list(map(slugify, Event.LocationType.labels))
-    DURATIONS = list(map(slugify, Event.Duration.labels))
-    PRODUCT_RESULT = list(product(LOCATIONS, DURATIONS))
-    EVENT_CHOICES = list(map(join_slugs, PRODUCT_RESULT))
+async def day_picker(request, event):
+    user_tz = get_user_tz(request)
 
-    if event not in EVENT_CHOICES:
+    event_type = await sync_to_async(get_event_type)(event)
+    if event_type is None:
         return redirect("scheduler:index")
 
     if request.htmx:
@@ -216,11 +215,63 @@ def day_picker(request, event):
         request.GET.get("day", today.strftime("%Y%m%d")), "%Y%m%d"
     )
 
+    # the partial only depends on these inputs and on the busy time, so the
+    # browser can revalidate it without anything being recomputed
+    etag = None
+    if request.htmx:
+        etag = await sync_to_async(picker_etag, thread_sensitive=False)(
+            "day_picker",
+            event,
+            calendar_day.strftime("%Y%m"),
+            user_tz.key,
+            today.date(),
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return remember_user_tz(request, response, user_tz)
+
     # build calendar of available days for current month
     cal = calendar.Calendar(firstweekday=calendar.SUNDAY)
     weeks = cal.monthdatescalendar(calendar_day.year, calendar_day.month)
+    horizon_date = today + BOOKING_HORIZON
+
+    # only days of the displayed month within the booking horizon can be
+    # clicked, and only if they have at least one free slot
+    month_days = [
+        day
+        for week in weeks
+        for day in week
+        if day.month == calendar_day.month
+    ]
+    first_day = max(month_days[0], today.date())
+    last_day = min(month_days[-1], horizon_date.date())
+    bookable_days = set()
+    stale_since = None
+    calendar_unavailable = False
+    if first_day <= last_day:
+        # one batched fetch covering every visible day
+        window = padded_window(
+            event_type, *days_window(user_tz, first_day, last_day)
+        )
+        try:
+            lookup = await availability.alookup(*window)
+        except CalendarUnavailable:
+            calendar_unavailable = True
+        else:
+            stale_since = lookup.stale_since
+            calendar_busy = lookup.busy.union(
+                await sync_to_async(booked_between)(*window)
+            )
+            bookable_days = build_bookable_days(
+                first_day,
+                last_day,
+                event_type.duration,
+                user_tz,
+                event_type.buffered(calendar_busy),
+                await sync_to_async(weekly_schedule)(),
+            )
 
-    return render(
+    response = await sync_to_async(render)(
         request,
         template,
         {
@@ -230,47 +281,97 @@ def day_picker(request, event):
             "previous": weeks[0][0] + timedelta(days=-1),
             "next": weeks[-1][-1] + timedelta(days=1),
             "current_date": today,
-            "horizon_date": today + timedelta(days=60),
+            "horizon_date": horizon_date,
+            "bookable_days": bookable_days,
             "weekdays": ["Su", "Mo", "Tu", "We", "Th", "Fr", "Sa"],
-            "user_tz": user_tz.zone,
-            "timezones": pytz.common_timezones,
+            "user_tz": user_tz.key,
+            "stale_since": stale_since,
+            "calendar_unavailable": calendar_unavailable,
         },
+        status=503 if calendar_unavailable else 200,
     )
+    remember_user_tz(request, response, user_tz)
+    if stale_since or calendar_unavailable:
+        flag_degraded(response, stale_since)
+    elif etag:
+        add_validators(response, etag)
+    return response
 
 
-def time_picker(request, event, date):
-    # get timezone optional param, if passed into url
-    # this param is passed via htmx
-    tz_param = request.GET.get("timezone", None)
-    # if param was passed, update session variable
-    if tz_param:
-        request.session["user_tz"] = tz_param
+async def time_picker(request, event, date):
+    user_tz = get_user_tz(request)
+
+    event_type = await sync_to_async(get_event_type)(event)
+    if event_type is None:
+        return redirect("scheduler:index")
 
     template = "scheduler/partials/time_picker.html"
 
-    planner = EventPlanner()
     selected_date = datetime.strptime(date, "%Y%m%d")
     prev_day = selected_date + timedelta(days=-1)
     next_day = selected_date + timedelta(days=1)
-    user_tz = pytz.timezone(request.session.get("user_tz", "UTC"))
-    time_min = user_tz.localize(selected_date)
-    time_max = time_min + timedelta(days=1)
-
-    # artificially build unavailable time slots based on schedule
-    unavailable = build_artificial_events(selected_date, prev_day, next_day)
+    time_min, time_max = day_window(user_tz, selected_date.date())
 
-    # get the calendar events for that day
-    calendar_events = planner.get_events(
-        time_min.isoformat(), time_max.isoformat()
+    etag = await sync_to_async(picker_etag, thread_sensitive=False)(
+        "time_picker", event, date, user_tz.key
     )
+    response = not_modified(request, etag)
+    if response is not None:
+        return remember_user_tz(request, response, user_tz)
+
+    # unavailable time based on the schedule, over the days of its zone
+    # that the (padded) selected day touches
+    window = padded_window(event_type, time_min, time_max)
+    weekly = await sync_to_async(weekly_schedule)()
+    unavailable = weekly.busy_during(*window)
+
+    # get the busy time for that day, served from cached UTC-day buckets,
+    # or from the last known ones while Google is failing
+    try:
+        lookup = await availability.alookup(*window)
+    except CalendarUnavailable:
+        response = await sync_to_async(render)(
+            request,
+            template,
+            {
+                "event": event,
+                "selected_date": selected_date.date(),
+                "previous": prev_day.date(),
+                "next": next_day.date(),
+                "available_times": [],
+                "user_tz": user_tz.key,
+                "calendar_unavailable": True,
+            },
+            status=503,
+        )
+        remember_user_tz(request, response, user_tz)
+        return flag_degraded(response, None)
+
+    # warm the days the user is likely to open next in the background, and
+    # count this day as a hit if it was warmed that way
+    today = local_today(user_tz)
+    first_day, last_day = neighbour_days(selected_date.date())
+    first_day = max(first_day, today)
+    last_day = min(last_day, today + BOOKING_HORIZON)
+
+    def prefetch():
+        prefetcher.record_hits(time_min, time_max)
+        if first_day <= last_day:
+            prefetcher.schedule(*days_window(user_tz, first_day, last_day))
+
+    await sync_to_async(prefetch, thread_sensitive=False)()
+
+    # normalize all busy time, including local bookings, into a single
+    # interval set
+    booked = await sync_to_async(booked_between)(*window)
+    busy = unavailable.union(event_type.buffered(lookup.busy.union(booked)))
 
     # build available time slots
-    _, event_duration = parse_event(event)
-    available_times = build_available_times(
-        time_min, time_max, event_duration, unavailable + calendar_events
+    available_times = find_available_slots(
+        time_min, time_max, event_type.duration, busy, now=timezone.now()
     )
 
-    return render(
+    response = await sync_to_async(render)(
         request,
         template,
         {
@@ -279,7 +380,73 @@ def time_picker(request, event, date):
             "previous": prev_day.date(),
             "next": next_day.date(),
             "available_times": available_times,
-            "user_tz": user_tz.zone,
-            "timezones": pytz.common_timezones,
+            "user_tz": user_tz.key,
+            "stale_since": lookup.stale_since,
+        },
+    )
+    remember_user_tz(request, response, user_tz)
+    if lookup.stale:
+        return flag_degraded(response, lookup.stale_since)
+    return add_validators(response, etag)
+
+
+def book(request, event, date):
+    event_type = get_event_type(event)
+    if event_type is None:
+        return redirect("scheduler:index")
+
+    booking = Event(
+        location_type=event_type.location_type,
+        duration=event_type.duration,
+    )
+    if booking.location_type == Event.LocationType.PHONE_CALL:
+        # the owner's number is shared with the booker
+        owner = Profile.objects.first()
+        booking.phone_number = owner.phone_number if owner else ""
+
+    user_tz = get_user_tz(request)
+    template = "scheduler/partials/booking_form.html"
+    status = 200
+    if request.method == "POST":
+        form = BookingForm(request.POST, instance=booking)
+        if form.is_valid():
+            try:
+                check_bookable(
+                    form.instance.start_time, event_type.duration, user_tz
+                )
+                book_event(
+                    form.instance,
+                    event_type.buffer_before,
+                    event_type.buffer_after,
+                )
+            except SlotUnavailable as error:
+                form.add_error(None, str(error))
+                status = 409
+            except CalendarUnavailable as error:
+                form.add_error(None, f"{error} Please try again shortly.")
+                status = 503
+            except ValidationError as error:
+                # e.g. a phone call without the owner's number
+                form.add_error(None, error.messages)
+                status = 400
+            else:
+                template = "scheduler/partials/booking_confirmed.html"
+                status = 201
+        else:
+            status = 400
+    else:
+        booking.start_time = parse_datetime(request.GET.get("start", ""))
+        form = BookingForm(instance=booking)
+
+    return render(
+        request,
+        template,
+        {
+            "event": event,
+            "date": date,
+            "form": form,
+            "booking": form.instance,
+            "user_tz": user_tz.key,
         },
+        status=status,
     )